@@ -0,0 +1,92 @@
+"""
+编码档位基准测试
+
+对每种导出格式和编码档位，测量编码耗时和输出字节数，用于根据数据选择默认档位。
+
+用法:
+    python benchmarks/bench_encoders.py [图片路径 ...] [--repeat N] [--json 输出文件]
+
+不指定图片时使用一张合成的 24MP 测试图。
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from src.core.encoder import get_output_formats, get_profile_names
+from src.core.image_processor import ImageProcessor
+
+
+def make_test_image(width: int = 6000, height: int = 4000) -> Image.Image:
+    """生成带渐变和噪声的合成测试图，压缩难度接近真实照片"""
+    gradient = Image.linear_gradient('L').resize((width, height))
+    noise = Image.effect_noise((width, height), 40)
+    blurred = noise.filter(ImageFilter.GaussianBlur(2))
+    image = Image.merge('RGB', (gradient, blurred, gradient.rotate(90).resize((width, height))))
+    draw = ImageDraw.Draw(image)
+    for i in range(0, width, width // 12):
+        draw.ellipse((i, height // 3, i + width // 10, height // 3 + width // 10), fill=(200, 80, 40))
+    return image
+
+
+def bench_image(processor: ImageProcessor, repeat: int, quality: int):
+    """对当前图片测量所有格式和档位的编码耗时与大小"""
+    rows = []
+    for format in get_output_formats():
+        for profile in get_profile_names():
+            best = None
+            size = 0
+            for _ in range(repeat):
+                buffer = io.BytesIO()
+                start = time.perf_counter()
+                processor.encode_image(buffer, format, quality, profile)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+                size = buffer.tell()
+            rows.append({'format': format, 'profile': profile,
+                         'seconds': best, 'bytes': size})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="编码档位基准测试")
+    parser.add_argument('images', nargs='*', help="测试图片路径")
+    parser.add_argument('--repeat', type=int, default=3, help="每项重复次数，取最快一次")
+    parser.add_argument('--quality', type=int, default=95, help="有损格式的质量")
+    parser.add_argument('--json', help="将结果另存为 JSON 文件")
+    args = parser.parse_args()
+
+    processor = ImageProcessor()
+    sources = args.images or [None]
+    results = []
+    for path in sources:
+        if path is None:
+            processor.set_image(make_test_image())
+            name = 'synthetic-24MP'
+        elif not processor.load_image(path):
+            print(f"跳过无法加载的图片: {path}")
+            continue
+        else:
+            name = os.path.basename(path)
+
+        print(f"\n{name} ({processor.get_image_size()[0]}x{processor.get_image_size()[1]})")
+        print(f"{'格式':<6}{'档位':<10}{'耗时(ms)':>10}{'大小(KB)':>12}")
+        for row in bench_image(processor, args.repeat, args.quality):
+            row['image'] = name
+            results.append(row)
+            print(f"{row['format']:<6}{row['profile']:<10}"
+                  f"{row['seconds'] * 1000:>10.1f}{row['bytes'] / 1024:>12.1f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
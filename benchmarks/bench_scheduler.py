@@ -0,0 +1,131 @@
+"""
+批处理调度基准测试
+
+在一个大小混杂的文件夹上分别按列表顺序和按预计耗时从长到短（LPT）导出，
+比较整批完成时间，并输出调度器预计与实际耗时的对比。
+
+用法:
+    python benchmarks/bench_scheduler.py [图片路径 ...] [--workers N] [--json 输出文件]
+    python benchmarks/bench_scheduler.py --calibrate [--model cost_model.json]
+
+不指定图片时生成一组合成测试图：大量小图，列表末尾放几张大图。
+--calibrate 单线程导出这些图片，用各阶段实测耗时拟合成本模型并保存。
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bench_encoders import make_test_image
+
+from src.core.batch import ExportSettings, iter_export
+from src.core.scheduler import DEFAULT_COST_MODEL_FILE, CostModel, ScheduleReport, probe_job
+
+WATERMARK = {'text': 'Benchmark', 'font_size': 64, 'color': (255, 255, 255),
+             'opacity': 160, 'position': (0.95, 0.95)}
+
+
+def make_mixed_folder(directory: str, small: int = 24, large: int = 2):
+    """生成大小混杂的测试图片，大图放在列表末尾"""
+    paths = []
+    # 小图用几种尺寸，标定时各系数才能区分开
+    bases = [make_test_image(*size) for size in ((1200, 900), (2000, 1500), (3000, 2000))]
+    for i in range(small):
+        path = os.path.join(directory, f"small_{i:03d}.jpg")
+        bases[i % len(bases)].save(path, quality=90)
+        paths.append(path)
+    big = make_test_image(8000, 6000)
+    for i in range(large):
+        path = os.path.join(directory, f"large_{i}.png")
+        big.save(path, compress_level=1)
+        paths.append(path)
+    # 未压缩的大 TIFF：像素多但不需要解码
+    path = os.path.join(directory, "large_raw.tif")
+    big.save(path)
+    paths.append(path)
+    return paths
+
+
+def run_export(paths, output_dir, workers, schedule, model=None):
+    """导出一次，返回 (整批耗时, 结果列表, 调度报告)"""
+    settings = ExportSettings.from_dict(WATERMARK, output_dir, format='JPEG')
+    report = ScheduleReport() if schedule else None
+    start = time.perf_counter()
+    results = list(iter_export(paths, settings, workers=workers, schedule=schedule,
+                               cost_model=model, schedule_report=report))
+    return time.perf_counter() - start, results, report
+
+
+def calibrate(paths, output_dir):
+    """单线程导出，收集各阶段耗时并拟合成本模型"""
+    _, results, _ = run_export(paths, output_dir, workers=1, schedule=False)
+    samples = []
+    for result in results:
+        job = probe_job(result.input_path, 0, CostModel())
+        if result.ok and job.width:
+            samples.append((job.width, job.height, job.data_size, result.timings))
+    return CostModel.calibrate(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批处理调度基准测试")
+    parser.add_argument('images', nargs='*', help="测试图片路径（按此顺序作为列表顺序）")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="工作线程数")
+    parser.add_argument('--calibrate', action='store_true', help="标定成本模型并保存")
+    parser.add_argument('--model', default=DEFAULT_COST_MODEL_FILE, help="成本模型文件")
+    parser.add_argument('--json', help="将结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    temp_dir = tempfile.mkdtemp(prefix='bench_scheduler_')
+    try:
+        paths = args.images
+        if not paths:
+            input_dir = os.path.join(temp_dir, 'input')
+            os.makedirs(input_dir)
+            paths = make_mixed_folder(input_dir)
+        output_dir = os.path.join(temp_dir, 'output')
+        os.makedirs(output_dir)
+
+        if args.calibrate:
+            model = calibrate(paths, output_dir)
+            model.save(args.model)
+            for stage, values in model.coefficients.items():
+                print(f"{stage:10s} {values[0]:.5f} s/MP  {values[1]:.5f} s/MB  {values[2]:.5f} s")
+            print(f"Saved cost model to {args.model}")
+            return
+
+        model = CostModel.load(args.model)
+        fifo_time, _, _ = run_export(paths, output_dir, args.workers, schedule=False)
+        lpt_time, _, report = run_export(paths, output_dir, args.workers, schedule=True, model=model)
+        summary = report.summary()
+        stats = {
+            'files': len(paths),
+            'workers': args.workers,
+            'fifo_makespan': fifo_time,
+            'lpt_makespan': lpt_time,
+            'speedup': fifo_time / lpt_time if lpt_time > 0 else 0.0,
+            'schedule': summary,
+        }
+        print(f"{len(paths)} files, {args.workers} workers")
+        print(f"list order: {fifo_time:.2f} s   LPT: {lpt_time:.2f} s   "
+              f"({stats['speedup']:.2f}x)")
+        print(f"makespan predicted {summary['predicted_makespan']:.2f} s "
+              f"(list order {summary['unscheduled_makespan']:.2f} s), "
+              f"actual {summary['actual_makespan']:.2f} s")
+        print(f"per-file total predicted {summary['predicted_total']:.2f} s, "
+              f"actual {summary['actual_total']:.2f} s, "
+              f"mean error {summary['mean_error'] * 100:.0f}%")
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(stats, f, indent=2)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
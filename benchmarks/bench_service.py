@@ -0,0 +1,162 @@
+"""
+水印服务压力测试
+
+启动一个本地服务实例（或连接已运行的实例），用多个并发连接持续发送图片，
+统计 p50/p99 延迟和每秒请求数。
+
+用法:
+    python benchmarks/bench_service.py [图片路径] [--concurrency 16] [--requests 500]
+                                       [--template 模板名] [--port 8765] [--no-spawn]
+                                       [--workers N] [--json 输出文件]
+
+不指定图片时使用一张合成的 12MP 测试图。
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bench_encoders import make_test_image
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+async def _request(reader, writer, target: str, body: bytes) -> int:
+    """在 keep-alive 连接上发送一个请求，返回状态码"""
+    writer.write(
+        f"POST {target} HTTP/1.1\r\nHost: localhost\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1') + body
+    )
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ')[1])
+    length = 0
+    for line in lines[1:]:
+        if line.lower().startswith('content-length:'):
+            length = int(line.split(':', 1)[1])
+    await reader.readexactly(length)
+    return status
+
+
+async def _client(host, port, target, body, counter, latencies, errors):
+    """一个并发连接，不断取任务直到总请求数用完"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while counter[0] > 0:
+            counter[0] -= 1
+            start = time.perf_counter()
+            status = await _request(reader, writer, target, body)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def _wait_for_server(host, port, timeout=60.0):
+    """等待服务开始监听"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+async def run_load(args, body: bytes):
+    """执行一轮压力测试，返回统计结果"""
+    params = {'format': args.format}
+    if args.template:
+        params['template'] = args.template
+    target = f"/watermark?{urlencode(params)}"
+
+    # 预热：每个工作进程至少处理一次，避免把字体和图层首次渲染计入统计
+    warm = [max(args.concurrency, 4)]
+    await asyncio.gather(*(_client(args.host, args.port, target, body, warm, [], [])
+                           for _ in range(min(args.concurrency, 4))))
+
+    counter = [args.requests]
+    latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(_client(args.host, args.port, target, body, counter, latencies, errors)
+                           for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'concurrency': args.concurrency,
+        'elapsed': elapsed,
+        'requests_per_sec': len(latencies) / elapsed if elapsed > 0 else 0.0,
+        'p50_ms': _percentile(latencies, 0.50) * 1000,
+        'p99_ms': _percentile(latencies, 0.99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="水印服务压力测试")
+    parser.add_argument('image', nargs='?', help="测试图片路径")
+    parser.add_argument('--host', default='127.0.0.1', help="服务地址")
+    parser.add_argument('--port', type=int, default=8765, help="服务端口")
+    parser.add_argument('--concurrency', type=int, default=16, help="并发连接数")
+    parser.add_argument('--requests', type=int, default=500, help="总请求数")
+    parser.add_argument('--template', help="水印模板名称")
+    parser.add_argument('--format', default='JPEG', help="输出格式")
+    parser.add_argument('--workers', type=int, default=None, help="启动服务时的工作进程数")
+    parser.add_argument('--max-batch', type=int, default=8, help="启动服务时的每批最多请求数")
+    parser.add_argument('--no-spawn', action='store_true', help="连接已运行的服务，不自行启动")
+    parser.add_argument('--json', help="将结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    if args.image:
+        with open(args.image, 'rb') as f:
+            body = f.read()
+    else:
+        buffer = io.BytesIO()
+        make_test_image(4000, 3000).save(buffer, format='JPEG', quality=90)
+        body = buffer.getvalue()
+
+    server = None
+    if not args.no_spawn:
+        command = [sys.executable, '-m', 'src.server', '--host', args.host,
+                   '--port', str(args.port), '--max-batch', str(args.max_batch)]
+        if args.workers:
+            command += ['--workers', str(args.workers)]
+        server = subprocess.Popen(command, cwd=ROOT)
+    try:
+        asyncio.run(_wait_for_server(args.host, args.port))
+        stats = asyncio.run(run_load(args, body))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print(f"{stats['requests']} requests ({stats['errors']} errors), "
+          f"concurrency {stats['concurrency']}")
+    print(f"{stats['requests_per_sec']:.1f} req/s  "
+          f"p50 {stats['p50_ms']:.1f} ms  p99 {stats['p99_ms']:.1f} ms")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(stats, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+会话保存/加载基准测试
+
+生成一个大会话（默认 10 万张图片，大多数设置相同，部分图片改了位置或文字），
+统计保存、加载（只解析文件头）和逐张读取全部设置的耗时，并检查读回的设置与原设置一致。
+
+用法:
+    python benchmarks/bench_session.py [--entries 100000] [--output 会话文件] [--json 输出文件]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.core.session import SESSION_EXTENSION, load_session, save_session
+
+BASE_SETTINGS = {
+    'text': '© Studio', 'font_name': 'Arial', 'font_size': 36, 'color': (255, 255, 255),
+    'auto_color': False, 'opacity': 200, 'rotation': 0, 'scale': 1.0,
+    'position': (0.95, 0.95), 'relative_size': None, 'image_path': None,
+    'layers': [{'type': 'text', 'text': 'logo', 'font_size': 20, 'position': [0.1, 0.1]}],
+}
+
+
+def make_session(entries: int, seed: int = 0):
+    """生成路径列表和设置：约 1/7 的图片没有设置，1/5 改了位置，1/11 改了文字"""
+    rng = random.Random(seed)
+    paths = [f"/photos/shoot{i // 500:04d}/IMG_{i:06d}.jpg" for i in range(entries)]
+    settings = {}
+    for i, path in enumerate(paths):
+        if i % 7 == 3:
+            continue
+        entry = dict(BASE_SETTINGS)
+        entry['layers'] = [dict(layer) for layer in BASE_SETTINGS['layers']]
+        if i % 5 == 0:
+            entry['position'] = (rng.choice([0.05, 0.5, 0.95]), rng.choice([0.05, 0.95]))
+        if i % 11 == 0:
+            entry['text'] = f"Client {i % 13}"
+        settings[path] = entry
+    return paths, settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="会话保存/加载基准测试")
+    parser.add_argument('--entries', type=int, default=100000, help="图片数")
+    parser.add_argument('--output', help="会话文件路径，默认写入临时目录")
+    parser.add_argument('--json', help="将结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    paths, settings = make_session(args.entries)
+    session_path = args.output or os.path.join(tempfile.mkdtemp(), 'bench' + SESSION_EXTENSION)
+
+    start = time.perf_counter()
+    if not save_session(session_path, paths, settings, paths[0]):
+        sys.exit(1)
+    save_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    session = load_session(session_path)
+    load_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    decoded = {path: session.settings[path] for path in session.paths if path in session.settings}
+    decode_time = time.perf_counter() - start
+
+    # 元组按 JSON 读回为列表，按 JSON 形式比较
+    mismatches = sum(1 for path in paths
+                     if json.dumps(settings.get(path), sort_keys=True)
+                     != json.dumps(decoded.get(path), sort_keys=True))
+    stats = {
+        'entries': len(paths),
+        'file_size': os.path.getsize(session_path),
+        'save_sec': save_time,
+        'load_sec': load_time,
+        'decode_all_sec': decode_time,
+        'mismatches': mismatches,
+    }
+
+    print(f"{stats['entries']} entries, {stats['file_size'] / 1024:.0f} KB")
+    print(f"save {save_time:.3f} s  load {load_time:.3f} s  "
+          f"decode all {decode_time:.3f} s  mismatches {mismatches}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(stats, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""
+工作进程启动基准测试
+
+1. 检查 src.core（以及命令行、服务入口）在没有安装 PyQt6 时可以导入，任一模块失败时退出码为 1
+   （测试见 tests/test_core_imports.py）；
+2. 在新的解释器中分别导入各入口模块，统计导入耗时和导入后的内存占用；
+3. 启动一组工作进程（与批量导出相同的进程池），统计全部工作进程就绪的耗时、
+   每个工作进程的 RSS 和私有内存，以及工作进程中是否加载了 PyQt6。
+   --gui-parent 先在本进程中创建主窗口，模拟从界面发起导出。
+
+用法:
+    python benchmarks/bench_worker_startup.py [--workers 4] [--start-method spawn|fork|forkserver]
+                                              [--gui-parent] [--repeats 5] [--json 输出文件]
+
+内存数据读取自 /proc，只在 Linux 上可用。
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+# 不依赖 Qt 的模块：工作进程和命令行工具只会用到这些
+QT_FREE_MODULES = ('src.core', 'src.main', 'src.watch', 'src.server')
+
+# 在子解释器中把 PyQt6 标记为不可导入，模拟没有安装 PyQt6 的环境
+_IMPORT_CHECK = """
+import importlib, pkgutil, sys
+sys.modules['PyQt6'] = None
+import {module}
+if {module!r} == 'src.core':
+    import src.core
+    for info in pkgutil.iter_modules(src.core.__path__):
+        importlib.import_module('src.core.' + info.name)
+    missing = [name for name in src.core.__all__ if not hasattr(src.core, name)]
+    assert not missing, missing
+"""
+
+_IMPORT_TIMING = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+rss = 0
+with open('/proc/self/status') as f:
+    for line in f:
+        if line.startswith('VmRSS:'):
+            rss = int(line.split()[1]) * 1024
+print(elapsed, rss, int(any(name.startswith('PyQt6') for name in sys.modules)))
+"""
+
+
+def _memory(pid: str = 'self'):
+    """(RSS, 私有内存) 字节数，无法读取时为 0"""
+    rss = private = 0
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    rss = int(line.split()[1]) * 1024
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                if line.startswith(('Private_Clean:', 'Private_Dirty:')):
+                    private += int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return rss, private
+
+
+def _worker_info(delay: float):
+    """在工作进程中运行：导入批量导出模块（与解封 _process_export 时相同），返回内存信息"""
+    import src.core.batch  # noqa: F401
+    time.sleep(delay)
+    rss, private = _memory()
+    qt_loaded = any(name.startswith('PyQt6') for name in sys.modules)
+    return os.getpid(), rss, private, qt_loaded
+
+
+def check_qt_free():
+    """在没有 PyQt6 的子解释器中逐个导入 QT_FREE_MODULES，返回 模块名 -> 错误（成功为空）"""
+    failures = {}
+    for module in QT_FREE_MODULES:
+        completed = subprocess.run([sys.executable, '-c', _IMPORT_CHECK.format(module=module)],
+                                   cwd=ROOT, capture_output=True, text=True)
+        if completed.returncode != 0:
+            lines = completed.stderr.strip().splitlines()
+            failures[module] = lines[-1] if lines else f"exit code {completed.returncode}"
+    return failures
+
+
+def measure_import(module: str, repeats: int):
+    """在新的解释器中导入模块，返回 (导入耗时中位数, RSS 中位数, 是否加载了 PyQt6)"""
+    times, sizes, qt_loaded = [], [], False
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, '-c', _IMPORT_TIMING.format(module=module)],
+                                cwd=ROOT, capture_output=True, text=True, check=True).stdout
+        elapsed, rss, qt = output.split()
+        times.append(float(elapsed))
+        sizes.append(int(rss))
+        qt_loaded = qt_loaded or qt == '1'
+    return statistics.median(times), statistics.median(sizes), qt_loaded
+
+
+def measure_workers(workers: int, start_method: str, delay: float = 0.2):
+    """启动进程池，返回全部工作进程就绪的耗时和各工作进程的内存"""
+    context = multiprocessing.get_context(start_method)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        # 每个任务都等待 delay，任务会分散到不同的工作进程
+        results = list(executor.map(_worker_info, [delay] * workers))
+    elapsed = time.perf_counter() - start - delay
+    return {
+        'start_method': start_method,
+        'workers': len({pid for pid, *_ in results}),
+        'ready_sec': elapsed,
+        'rss': statistics.median(rss for _, rss, _, _ in results),
+        'private': statistics.median(private for _, _, private, _ in results),
+        'qt_loaded': any(qt for *_, qt in results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="工作进程启动基准测试")
+    parser.add_argument('--workers', type=int, default=4, help="工作进程数")
+    parser.add_argument('--start-method', default=None,
+                        help="进程启动方式，默认与界面导出相同（见 src.main.configure_multiprocessing）")
+    parser.add_argument('--gui-parent', action='store_true', help="先创建主窗口，模拟从界面发起导出")
+    parser.add_argument('--repeats', type=int, default=5, help="导入计时的重复次数")
+    parser.add_argument('--json', help="将结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    failures = check_qt_free()
+    for module in QT_FREE_MODULES:
+        status = f"FAILED: {failures[module]}" if module in failures else "ok"
+        print(f"import {module} without PyQt6: {status}")
+
+    imports = {}
+    for module in ('src.core.batch', 'src.main'):
+        elapsed, rss, qt_loaded = measure_import(module, args.repeats)
+        imports[module] = {'sec': elapsed, 'rss': rss, 'qt_loaded': qt_loaded}
+        print(f"import {module}: {elapsed * 1000:.0f} ms, RSS {rss / 2**20:.0f} MB"
+              f"{', loads PyQt6' if qt_loaded else ''}")
+
+    if args.start_method is None:
+        # 与界面导出相同的启动方式
+        from src.main import configure_multiprocessing
+        configure_multiprocessing()
+    if args.gui_parent:
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        from PyQt6.QtWidgets import QApplication
+        from src.ui.main_window import MainWindow
+        app = QApplication(sys.argv)
+        window = MainWindow()  # noqa: F841
+    start_method = args.start_method or multiprocessing.get_start_method()
+    pool = measure_workers(args.workers, start_method)
+    parent_rss, parent_private = _memory()
+    print(f"{pool['workers']} workers ({pool['start_method']}"
+          f"{', GUI parent' if args.gui_parent else ''}): ready in {pool['ready_sec'] * 1000:.0f} ms, "
+          f"RSS {pool['rss'] / 2**20:.0f} MB, private {pool['private'] / 2**20:.0f} MB per worker"
+          f"{', loads PyQt6' if pool['qt_loaded'] else ''}")
+    print(f"parent RSS {parent_rss / 2**20:.0f} MB")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'qt_free_failures': failures, 'imports': imports, 'pool': pool,
+                       'gui_parent': args.gui_parent, 'parent_rss': parent_rss}, f, indent=2)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
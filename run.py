@@ -1,5 +1,7 @@
+import multiprocessing
 import sys
 from src.main import main
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()  # 打包后的程序启动导出工作进程时需要
     sys.exit(main())
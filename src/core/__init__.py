@@ -1,3 +1,52 @@
 """
 核心模块初始化文件
-"""
\ No newline at end of file
+
+与界面无关的处理引擎，不依赖 PyQt6，工作进程、命令行工具和服务只需导入这里：
+
+    from src.core import ImageProcessor
+
+    processor = ImageProcessor()
+    processor.load_image('photo.jpg')
+    processor.apply_settings({'text': '© 2024', 'position': (0.95, 0.95)})
+    processor.save_image('photo_watermarked.jpg')
+
+- ImageProcessor: 加载图片、合成水印、编码保存
+- ExportSettings / Rendition: 不可变的导出设置和输出尺寸
+- BatchingRenderer / render_batch: 把请求合并成批次交给常驻工作进程渲染
+- iter_export / export_file / resume_export: 流式批量导出引擎
+
+这些名称在第一次访问时才导入对应模块，只用到 src.core.encoder 等单个模块的进程不必加载整个引擎。
+"""
+import importlib
+
+# 公开名称 -> 所在模块
+_EXPORTS = {
+    'ImageProcessor': 'image_processor',
+    'ExportResult': 'batch',
+    'ExportSettings': 'batch',
+    'Rendition': 'batch',
+    'export_file': 'batch',
+    'iter_export': 'batch',
+    'resume_export': 'batch',
+    'BatchingRenderer': 'service',
+    'WatermarkRequest': 'service',
+    'WatermarkResponse': 'service',
+    'render_batch': 'service',
+    'TemplateManager': 'template_manager',
+    'ConfigManager': 'config_manager',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,272 @@
+"""
+多帧图片模块
+
+动图 GIF 和多页 TIFF 的每一帧都加上水印：水印叠加层只渲染一次（同尺寸的帧共用），
+帧按顺序逐个解码，分块交给线程池并行合成，合成好的帧按原顺序交给写入器。
+同时在处理中的帧数有上限，长动画不需要一次解码所有帧。
+
+GIF 的帧时长、处置方式、循环次数、透明色和全局调色板都会保留；只用全局调色板的帧
+合成后按原调色板重新索引，水印颜色会被映射到调色板中最接近的颜色。
+
+Pillow 的 GIF 写入器需要在写出前比较相邻帧，会在内部保留所有帧（调色板模式，每像素 1 字节）；
+WebP 和 APNG 写入器需要先拿到所有帧；TIFF 则通过 AppendingTiffWriter 逐页写出。
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+from PIL import Image, ImageSequence, TiffImagePlugin
+import numpy as np
+import os
+
+from .encoder import normalize_format
+
+ANIMATED_FORMATS = ('GIF', 'TIFF', 'WEBP', 'PNG')  # 可以写出多帧的格式
+MULTI_FRAME_EXTENSIONS = ('.gif', '.tif', '.tiff')  # 会检查帧数的输入扩展名
+FRAME_CHUNK = 8  # 每个并行任务合成的帧数
+
+# TIFF 写出时可以沿用的压缩方式，其他压缩方式改用 LZW
+_TIFF_COMPRESSIONS = ('raw', 'tiff_lzw', 'tiff_adobe_deflate', 'packbits')
+
+# 叠加层: (RGBA 叠加层, 左上角坐标)，None 表示该尺寸上没有可见水印
+Overlay = Optional[Tuple[Image.Image, Tuple[int, int]]]
+
+# 帧信息: duration（毫秒）和 disposal（GIF 处置方式）
+FrameInfo = Dict[str, Any]
+
+
+def count_frames(image_path: str) -> int:
+    """获取图片的帧数，无法识别时返回 1"""
+    try:
+        with Image.open(image_path) as image:
+            return getattr(image, 'n_frames', 1)
+    except Exception:
+        return 1
+
+
+def is_multi_frame(image_path: str) -> bool:
+    """是否为多帧图片（动图 GIF、多页 TIFF）"""
+    if os.path.splitext(image_path)[1].lower() not in MULTI_FRAME_EXTENSIONS:
+        return False
+    return count_frames(image_path) > 1
+
+
+def output_format_for(source_format: str, requested: str) -> str:
+    """多帧图片的输出格式
+
+    多页 TIFF 的各页尺寸可以不同，只能保存为 TIFF；动图可以保存为任一 ANIMATED_FORMATS，
+    所选格式不支持多帧时沿用源文件格式。
+    """
+    source_format = normalize_format(source_format or '')
+    if source_format == 'TIFF':
+        return 'TIFF'
+    requested = normalize_format(requested)
+    if requested in ANIMATED_FORMATS:
+        return requested
+    return source_format if source_format in ANIMATED_FORMATS else 'GIF'
+
+
+def fit_size(size: Tuple[int, int], max_size: int) -> Tuple[int, int]:
+    """缩小到最长边不超过 max_size 后的尺寸（不放大，0 表示原尺寸），与 ImageProcessor.downscale_original 一致"""
+    width, height = size
+    factor = max_size / max(width, height) if max_size else 1.0
+    if factor >= 1:
+        return size
+    return max(1, round(width * factor)), max(1, round(height * factor))
+
+
+def _working_mode(frame: Image.Image) -> Image.Image:
+    """转换为合成用的模式：带透明的帧为 RGBA，其余为 RGB"""
+    has_alpha = frame.mode in ('RGBA', 'LA', 'PA') or 'transparency' in frame.info
+    mode = 'RGBA' if has_alpha else 'RGB'
+    return frame if frame.mode == mode else frame.convert(mode)
+
+
+def composite_frame(frame: Image.Image, overlay: Overlay) -> Image.Image:
+    """在一帧（RGB 或 RGBA）上原地合成叠加层"""
+    if overlay is not None:
+        canvas, (left, top) = overlay
+        region = frame.crop((left, top, left + canvas.size[0], top + canvas.size[1]))
+        if region.mode != 'RGBA':
+            region = region.convert('RGBA')
+        region.alpha_composite(canvas)
+        frame.paste(region if frame.mode == 'RGBA' else region.convert(frame.mode), (left, top))
+    return frame
+
+
+class PaletteMapper:
+    """把合成后的帧按源 GIF 第一帧的（全局）调色板重新索引，保留透明色
+
+    源帧的颜色全部在全局调色板中时，水印颜色被映射到调色板中最接近的颜色，
+    各帧共用一个调色板；使用局部调色板的帧原样交给写入器重新量化。
+    """
+
+    def __init__(self, first_frame: Image.Image):
+        """
+        Args:
+            first_frame: 源 GIF 的第一帧（调色板模式）
+        """
+        palette = first_frame.getpalette() or []
+        self._palette_image = Image.new('P', (1, 1))
+        self._palette_image.putpalette(palette)
+        rgb = np.asarray(palette, dtype=np.uint32).reshape(-1, 3)
+        self._colors = np.unique((rgb[:, 0] << 16) | (rgb[:, 1] << 8) | rgb[:, 2])
+        transparency = first_frame.info.get('transparency')
+        self.transparency = transparency if isinstance(transparency, int) else None
+
+    def fits(self, frame: Image.Image) -> bool:
+        """帧中不透明像素的颜色是否都在全局调色板中"""
+        colors = frame.getcolors(len(self._colors) + 1)
+        if colors is None:
+            return False
+        packed = [(c[0] << 16) | (c[1] << 8) | c[2] for _, c in colors
+                  if len(c) < 4 or c[3] >= 128]
+        return bool(np.isin(packed, self._colors).all())
+
+    def __call__(self, frame: Image.Image, source: Image.Image) -> Image.Image:
+        """
+        Args:
+            frame: 合成后的帧
+            source: 合成前的帧
+        """
+        if not self.fits(source):
+            return frame
+        indexed = frame.convert('RGB').quantize(palette=self._palette_image,
+                                                dither=Image.Dither.NONE)
+        if self.transparency is not None:
+            if frame.mode == 'RGBA':
+                transparent = np.asarray(frame.getchannel('A')) < 128
+                if transparent.any():
+                    pixels = np.array(indexed)
+                    pixels[transparent] = self.transparency
+                    indexed = Image.fromarray(pixels, 'P')
+                    indexed.putpalette(self._palette_image.getpalette())
+            indexed.info['transparency'] = self.transparency
+        return indexed
+
+
+def iter_watermarked_frames(image: Image.Image,
+                            overlay_for: Callable[[Image.Image, float], Overlay],
+                            target_size: Optional[Callable[[Tuple[int, int]], Tuple[int, int]]] = None,
+                            finish: Optional[Callable[[Image.Image, Image.Image], Image.Image]] = None,
+                            workers: Optional[int] = None,
+                            chunk_size: int = FRAME_CHUNK
+                            ) -> Iterator[Tuple[Image.Image, FrameInfo]]:
+    """按顺序产出加好水印的帧
+
+    帧在调用方线程中按顺序解码；缩放、合成和后处理分块在线程池中并行，
+    最多 workers + 1 个块同时在处理中。每种尺寸的叠加层只渲染一次，
+    且总是在该尺寸的第一帧上于调用方线程中渲染（自动颜色等结果与线程调度无关）。
+
+    Args:
+        image: 已打开的多帧图片
+        overlay_for: 根据一帧（已缩放到目标尺寸）和它相对原帧的宽度比例渲染叠加层，
+            只在调用方线程中调用
+        target_size: 根据帧的原尺寸返回输出尺寸，None 表示不缩放
+        finish: 合成后对每帧的后处理（如按调色板重新索引），参数为合成后和合成前的帧
+        workers: 合成线程数，默认为 CPU 核数
+        chunk_size: 每个并行任务的帧数
+
+    Yields:
+        Tuple[Image.Image, FrameInfo]: (帧, 帧信息)
+    """
+    workers = max(1, workers or os.cpu_count() or 1)
+    overlays: Dict[Tuple[int, int], Overlay] = {}
+
+    def prepare(frame: Image.Image, size: Tuple[int, int]) -> Image.Image:
+        frame = _working_mode(frame)
+        if frame.size != size:
+            frame = frame.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+        return frame
+
+    def process(chunk):
+        done = []
+        for frame, size, info in chunk:
+            source = prepare(frame, size)
+            if finish is None:
+                done.append((composite_frame(source, overlays[size]), info))
+            else:
+                frame = composite_frame(source.copy(), overlays[size])
+                done.append((finish(frame, source), info))
+        return done
+
+    def decoded():
+        for frame in ImageSequence.Iterator(image):
+            info = {'duration': frame.info.get('duration', 0),
+                    'disposal': getattr(frame, 'disposal_method', 0)}
+            # seek 会复用解码缓冲，交给其他线程前先复制
+            frame = frame.copy()
+            size = target_size(frame.size) if target_size else frame.size
+            if size not in overlays:
+                scale = size[0] / frame.size[0]
+                frame = prepare(frame, size)
+                overlays[size] = overlay_for(frame, scale)
+            yield frame, size, info
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        chunk = []
+        for item in decoded():
+            chunk.append(item)
+            if len(chunk) >= chunk_size:
+                pending.append(executor.submit(process, chunk))
+                chunk = []
+                while len(pending) > workers:
+                    yield from pending.popleft().result()
+        if chunk:
+            pending.append(executor.submit(process, chunk))
+        while pending:
+            yield from pending.popleft().result()
+
+
+def save_frames(frames: Iterator[Tuple[Image.Image, FrameInfo]], fp,
+                format: str, source: Image.Image, quality: int = 95) -> int:
+    """把帧流写入多帧文件
+
+    Args:
+        frames: iter_watermarked_frames 的结果
+        fp: 文件路径或可写的二进制文件对象
+        format: 输出格式（ANIMATED_FORMATS 之一）
+        source: 源图片，用于读取循环次数、背景色和 TIFF 压缩方式
+        quality: 有损格式的质量
+
+    Returns:
+        int: 写出的帧数
+    """
+    format = normalize_format(format)
+    if format == 'TIFF':
+        compression = source.info.get('compression', 'raw')
+        if compression not in _TIFF_COMPRESSIONS:
+            compression = 'tiff_lzw'
+        count = 0
+        with TiffImagePlugin.AppendingTiffWriter(fp, new=True) as writer:
+            for frame, _ in frames:
+                frame.save(writer, format='TIFF', compression=compression)
+                writer.newFrame()
+                count += 1
+        return count
+
+    first, first_info = next(frames)
+    durations = [first_info['duration']]
+    disposals = [first_info['disposal']]
+
+    def rest():
+        # 写入器按帧号读取 duration / disposal 列表，每取出一帧时补上它的信息
+        for frame, info in frames:
+            durations.append(info['duration'])
+            disposals.append(info['disposal'])
+            yield frame
+
+    # WebP 和 APNG 写入器会先遍历一遍 append_images，需要传入列表
+    append_images = rest() if format == 'GIF' else list(rest())
+    options: Dict[str, Any] = {'save_all': True, 'append_images': append_images,
+                               'duration': durations, 'loop': source.info.get('loop', 0)}
+    if format == 'GIF':
+        options['disposal'] = disposals
+        if 'background' in source.info:
+            options['background'] = source.info['background']
+        if 'transparency' in first.info:
+            options['transparency'] = first.info['transparency']
+    elif format == 'WEBP':
+        options['quality'] = quality
+    first.save(fp, format=format, **options)
+    return len(durations)
@@ -0,0 +1,180 @@
+"""
+归档输出模块
+
+导出结果直接以内存中的编码数据写入一个 ZIP 或 TAR 文件，不再先写出图片文件再打包。
+多个工作线程/进程并行编码，由单个写入线程按到达顺序写入归档；排队等待写入的数据
+总量有上限，写入跟不上时提交方会阻塞，内存占用不随图片数量增长。
+"""
+from typing import Optional, Set
+from datetime import datetime
+import os
+import queue
+import tarfile
+import threading
+import time
+import zipfile
+
+ARCHIVE_FORMATS = ('zip', 'tar')
+DEFAULT_ARCHIVE_NAME = 'watermarked'  # 输出目录中归档的文件名（不含扩展名）
+
+# 已经压缩过的格式在 ZIP 中直接存储，再做 deflate 只会浪费 CPU
+_STORED_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.avif')
+
+
+class ArchiveWriter:
+    """单写入线程的流式归档
+
+    归档先写入同目录下的临时文件，close() 时再原子地重命名为目标文件。
+
+    用法:
+        writer = ArchiveWriter('/out/watermarked.zip')
+        writer.add('a.jpeg', data)   # 可在多个线程中调用
+        writer.close()
+    """
+    DEFAULT_MAX_PENDING_BYTES = 256 * 1024 * 1024
+
+    def __init__(self, archive_path: str, kind: Optional[str] = None,
+                 max_pending_bytes: int = DEFAULT_MAX_PENDING_BYTES):
+        """
+        Args:
+            archive_path: 归档路径
+            kind: 'zip' 或 'tar'，默认按扩展名判断
+            max_pending_bytes: 等待写入的数据上限（字节）
+        """
+        kind = (kind or os.path.splitext(archive_path)[1].lstrip('.')).lower()
+        if kind not in ARCHIVE_FORMATS:
+            raise ValueError(f"Unsupported archive format: {kind}")
+        self.archive_path = archive_path
+        self.kind = kind
+        self.max_pending_bytes = max(1, max_pending_bytes)
+
+        archive_dir, archive_name = os.path.split(os.path.abspath(archive_path))
+        self._temp_path = os.path.join(archive_dir, f".{archive_name}.{os.getpid()}.tmp")
+        if kind == 'zip':
+            self._archive = zipfile.ZipFile(self._temp_path, 'w', allowZip64=True)
+        else:
+            self._archive = tarfile.open(self._temp_path, 'w')
+
+        self._queue: queue.Queue = queue.Queue()
+        self._pending_bytes = 0
+        self._condition = threading.Condition()
+        self._names: Set[str] = set()
+        self._error: Optional[BaseException] = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='ArchiveWriter', daemon=True)
+        self._thread.start()
+
+    def _unique_name(self, name: str) -> str:
+        """同名条目加上序号，如 'a.jpeg' -> 'a (2).jpeg'"""
+        if name not in self._names:
+            return name
+        stem, ext = os.path.splitext(name)
+        index = 2
+        while f"{stem} ({index}){ext}" in self._names:
+            index += 1
+        return f"{stem} ({index}){ext}"
+
+    def add(self, name: str, data: bytes) -> str:
+        """提交一个条目，排队的数据超过上限时阻塞
+
+        Args:
+            name: 归档中的文件名
+            data: 文件内容
+
+        Returns:
+            str: 实际使用的条目名（重名时会加序号）
+
+        Raises:
+            Exception: 写入线程此前已失败时抛出其异常
+        """
+        size = len(data)
+        with self._condition:
+            # 单个超过上限的条目在队列为空时放行
+            while (self._error is None and self._pending_bytes > 0
+                   and self._pending_bytes + size > self.max_pending_bytes):
+                self._condition.wait()
+            if self._error is not None:
+                raise self._error
+            if self._closed:
+                raise ValueError("Archive is closed")
+            name = self._unique_name(name)
+            self._names.add(name)
+            self._pending_bytes += size
+        self._queue.put((name, data))
+        return name
+
+    def _run(self) -> None:
+        """写入线程：按提交顺序写入条目"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            name, data = item
+            try:
+                if self._error is None:
+                    self._write_entry(name, data)
+            except BaseException as e:
+                self._error = e
+            finally:
+                with self._condition:
+                    self._pending_bytes -= len(data)
+                    self._condition.notify_all()
+
+    def _write_entry(self, name: str, data: bytes) -> None:
+        now = time.time()
+        if self.kind == 'zip':
+            info = zipfile.ZipInfo(name, datetime.fromtimestamp(now).timetuple()[:6])
+            info.compress_type = (zipfile.ZIP_STORED
+                                  if name.lower().endswith(_STORED_EXTENSIONS)
+                                  else zipfile.ZIP_DEFLATED)
+            info.external_attr = 0o644 << 16
+            self._archive.writestr(info, data)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(now)
+            info.mode = 0o644
+            self._archive.addfile(info, _BytesReader(data))
+
+    def close(self) -> bool:
+        """等待所有条目写完并完成归档
+
+        Returns:
+            bool: 是否成功；失败时不会留下不完整的归档
+        """
+        with self._condition:
+            if self._closed:
+                return self._error is None
+            self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        try:
+            self._archive.close()
+        except Exception as e:
+            self._error = self._error or e
+        if self._error is None:
+            os.replace(self._temp_path, self.archive_path)
+            return True
+        print(f"Error writing archive: {self._error}")
+        if os.path.exists(self._temp_path):
+            os.remove(self._temp_path)
+        return False
+
+    def get_error(self) -> Optional[str]:
+        """获取写入错误信息"""
+        return str(self._error) if self._error else None
+
+
+class _BytesReader:
+    """tarfile.addfile 需要的最小文件对象，避免再复制一份数据到 BytesIO"""
+
+    def __init__(self, data: bytes):
+        self._view = memoryview(data)
+        self._position = 0
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = len(self._view) - self._position
+        chunk = self._view[self._position:self._position + size]
+        self._position += len(chunk)
+        return bytes(chunk)
@@ -0,0 +1,49 @@
+"""
+原子写入模块
+
+输出文件先写入同目录下的临时文件，落盘后再原子地重命名为目标文件。
+导出日志只在输出文件落盘之后才记录完成，崩溃后日志中标记为完成的文件一定完整。
+"""
+import os
+import threading
+
+
+def temp_path_for(output_path: str) -> str:
+    """目标文件对应的临时文件路径
+
+    临时文件与目标文件在同一目录（重命名才是原子的），以点开头（不与输出混在一起显示），
+    文件名包含进程和线程号，多个导出进程、线程或同名输出之间不会冲突。
+    """
+    output_dir, output_name = os.path.split(os.path.abspath(output_path))
+    return os.path.join(output_dir,
+                        f".{output_name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def fsync_path(path: str) -> None:
+    """把文件内容落盘"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def fsync_dir(directory: str) -> None:
+    """把目录项（重命名结果）落盘，不支持打开目录的平台（Windows）上忽略"""
+    try:
+        fd = os.open(directory or '.', os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def commit_temp_file(temp_path: str, output_path: str) -> None:
+    """把写好的临时文件落盘并原子地替换目标文件，再把目录落盘"""
+    fsync_path(temp_path)
+    os.replace(temp_path, output_path)
+    fsync_dir(os.path.dirname(os.path.abspath(output_path)))
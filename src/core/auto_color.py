@@ -0,0 +1,105 @@
+"""
+自动水印颜色模块
+
+统计水印覆盖区域的亮度均值和标准差，为文本水印选择与背景对比度足够的颜色。
+统计只在等间隔取样的缩小区域上进行（最长边不超过 REGION_MAX_SIDE 像素），
+只读取取样点而不是全分辨率像素，再用 NumPy 计算，每张图片只需一两毫秒；
+取样不做平均，背景的细节起伏仍然体现在标准差中。
+"""
+from typing import Optional, Tuple
+from PIL import Image
+import numpy as np
+
+REGION_MAX_SIDE = 64  # 统计时区域缩小到的最长边
+MIN_CONTRAST = 3.0  # 用户颜色与背景的最小对比度（WCAG 大号文本标准）
+BUSY_STD = 0.18  # 亮度标准差（0-1）超过此值时认为背景杂乱，需要描边
+LIGHT_COLOR = (255, 255, 255)
+DARK_COLOR = (0, 0, 0)
+
+# Rec. 709 亮度系数
+_LUMA_WEIGHTS = np.array([0.2126, 0.7152, 0.0722], dtype=np.float32)
+
+# 区域统计: (相对亮度均值, 相对亮度标准差)，均为 0-1
+RegionStats = Tuple[float, float]
+
+
+def region_stats(image, box: Tuple[int, int, int, int],
+                 max_side: int = REGION_MAX_SIDE) -> Optional[RegionStats]:
+    """计算图片某区域缩小后的亮度统计
+
+    Args:
+        image: Pillow 图片或 MappedImage
+        box: (left, top, right, bottom)，超出图片的部分会被裁掉
+        max_side: 缩小后的最长边
+
+    Returns:
+        Optional[RegionStats]: (亮度均值, 亮度标准差)，区域为空时返回 None
+    """
+    width, height = image.size
+    left, top = max(0, int(box[0])), max(0, int(box[1]))
+    right, bottom = min(width, int(box[2])), min(height, int(box[3]))
+    if right <= left or bottom <= top:
+        return None
+    step = max(1, -(-max(right - left, bottom - top) // max_side))
+    if isinstance(image, Image.Image):
+        # 最近邻缩小只访问取样点，不复制出全分辨率的区域
+        size = (-(-(right - left) // step), -(-(bottom - top) // step))
+        small = np.asarray(image.resize(size, Image.Resampling.NEAREST,
+                                        box=(left, top, right, bottom)))
+    else:
+        # 内存映射的图片直接按步长切片，只有取样点所在的页面会被读入
+        small = image.sample((left, top, right, bottom), step)
+    if small.ndim == 2:
+        small = small[..., None]  # 灰度图片三个通道相同
+    pixels = small[..., :3].astype(np.float32) / 255.0
+    # 先转换到线性光再加权，得到 WCAG 定义的相对亮度
+    linear = np.where(pixels <= 0.04045, pixels / 12.92, ((pixels + 0.055) / 1.055) ** 2.4)
+    luminance = linear @ _LUMA_WEIGHTS if linear.shape[-1] == 3 else linear[..., 0]
+    return float(luminance.mean()), float(luminance.std())
+
+
+def relative_luminance(color: Tuple[int, int, int]) -> float:
+    """计算颜色的相对亮度（0-1）"""
+    channels = np.asarray(color[:3], dtype=np.float32) / 255.0
+    linear = np.where(channels <= 0.04045, channels / 12.92, ((channels + 0.055) / 1.055) ** 2.4)
+    return float(linear @ _LUMA_WEIGHTS)
+
+
+def contrast_ratio(a: float, b: float) -> float:
+    """两个相对亮度之间的对比度（1-21）"""
+    light, dark = max(a, b), min(a, b)
+    return (light + 0.05) / (dark + 0.05)
+
+
+def choose_color(stats: Optional[RegionStats], preferred: Tuple[int, int, int]
+                 ) -> Tuple[Tuple[int, int, int], Optional[Tuple[int, int, int]]]:
+    """根据背景统计选择文本颜色和描边颜色
+
+    用户设置的颜色与背景对比度足够时保留，否则改用白色或黑色中对比度更高的一个；
+    背景杂乱（亮度标准差大）时再加上相反颜色的描边。
+
+    Args:
+        stats: region_stats 的结果，为 None 时保留用户颜色
+        preferred: 用户设置的颜色
+
+    Returns:
+        Tuple: (文本颜色, 描边颜色或 None)
+    """
+    preferred = tuple(preferred[:3])
+    if stats is None:
+        return preferred, None
+    mean, std = stats
+    busy = std > BUSY_STD
+    if not busy and contrast_ratio(relative_luminance(preferred), mean) >= MIN_CONTRAST:
+        return preferred, None
+    # 白色与黑色对背景的对比度相等时，背景相对亮度约为 0.179
+    if contrast_ratio(1.0, mean) >= contrast_ratio(0.0, mean):
+        color, outline = LIGHT_COLOR, DARK_COLOR
+    else:
+        color, outline = DARK_COLOR, LIGHT_COLOR
+    return color, outline if busy else None
+
+
+def outline_width(font_size: int) -> int:
+    """描边宽度随字号变化，约为字号的 1/18，至少 1 像素"""
+    return max(1, int(font_size) // 18)
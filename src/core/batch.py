@@ -0,0 +1,651 @@
+"""
+批量导出模块
+
+提供与界面无关的流式批处理接口：输入路径的可迭代对象和一个不可变的导出设置，
+按完成顺序惰性地产出每个文件的处理结果。
+"""
+from dataclasses import asdict, dataclass, field
+from concurrent.futures import (Future, ProcessPoolExecutor, ThreadPoolExecutor,
+                                FIRST_COMPLETED, wait)
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from PIL import Image
+import io
+import os
+import threading
+import time
+
+from .image_processor import ImageProcessor
+from .encoder import DEFAULT_PROFILE
+from .memory_budget import MemoryGovernor, estimate_file_memory, probe_image
+from .dedupe import find_duplicates, link_or_copy
+from .text_tokens import has_tokens
+from .shared_layers import SharedLayerHandle, SharedLayerStore, attach_layers, detach_except
+from .journal import ExportJournal
+from .atomic_file import commit_temp_file, temp_path_for
+from .archive import ArchiveWriter, DEFAULT_ARCHIVE_NAME
+from .scheduler import CostModel, ScheduleReport, plan_lpt
+from .metadata_index import MetadataIndex
+from .animation import (PaletteMapper, fit_size, is_multi_frame, iter_watermarked_frames,
+                        output_format_for, save_frames)
+
+# 没有进行中的任务时，等待已结束任务释放内存预算的最长秒数（之后重新检查）
+GOVERNOR_WAIT = 0.5
+
+
+def _freeze(value: Any) -> Any:
+    """将字典/列表递归转换为可哈希的元组"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _thaw_settings(frozen: Tuple) -> Dict[str, Any]:
+    """将冻结的水印设置还原为字典"""
+    settings = {}
+    for key, value in frozen:
+        if key == 'layers':
+            value = [_thaw_settings(layer) for layer in value]
+        settings[key] = value
+    return settings
+
+
+@dataclass(frozen=True)
+class Rendition:
+    """一种输出尺寸"""
+    max_size: int = 0  # 最长边像素，0 表示原尺寸（不会放大）
+    format: str = ''  # 输出格式，空表示使用 ExportSettings.format
+    quality: int = 0  # 图片质量，0 表示使用 ExportSettings.quality
+    suffix: str = ''  # 追加在 ExportSettings.suffix 之后的文件名后缀
+
+
+@dataclass(frozen=True)
+class ExportSettings:
+    """不可变的导出设置"""
+    output_dir: str
+    prefix: str = ''
+    suffix: str = '_watermarked'
+    format: str = 'JPEG'
+    quality: int = 95
+    profile: str = DEFAULT_PROFILE  # 编码档位，见 encoder.ENCODER_PROFILES
+    watermark: Tuple = ()  # 冻结后的水印设置，用 from_dict 构造
+    archive: str = ''  # 'zip' 或 'tar' 时所有图片写入输出目录中的一个归档，空表示逐个写文件
+    renditions: Tuple[Rendition, ...] = ()  # 多尺寸导出，空表示只导出原尺寸
+    color_management: str = ''  # 'keep' 保留 ICC 配置文件，'srgb' 转换到 sRGB，空表示不处理
+
+    @classmethod
+    def from_dict(cls, watermark: Dict[str, Any], output_dir: str, **kwargs) -> 'ExportSettings':
+        """由编辑器的水印设置字典构造导出设置
+
+        Args:
+            watermark: 水印设置字典（与 WatermarkEditor.get_settings 格式一致）
+            output_dir: 输出目录
+            **kwargs: 其他导出字段（prefix、suffix、format、quality、profile、archive、renditions、
+                color_management）
+
+        Returns:
+            ExportSettings: 导出设置
+        """
+        return cls(output_dir=output_dir, watermark=_freeze(watermark), **kwargs)
+
+    def watermark_settings(self) -> Dict[str, Any]:
+        """获取水印设置字典的副本"""
+        return _thaw_settings(self.watermark)
+
+    def to_json_dict(self) -> Dict[str, Any]:
+        """转换为可 JSON 序列化的字典"""
+        data = {
+            'output_dir': self.output_dir,
+            'prefix': self.prefix,
+            'suffix': self.suffix,
+            'format': self.format,
+            'quality': self.quality,
+            'profile': self.profile,
+            'watermark': self.watermark_settings(),
+        }
+        if self.archive:
+            data['archive'] = self.archive
+        if self.renditions:
+            data['renditions'] = [asdict(rendition) for rendition in self.renditions]
+        if self.color_management:
+            data['color_management'] = self.color_management
+        return data
+
+    @classmethod
+    def from_json_dict(cls, data: Dict[str, Any]) -> 'ExportSettings':
+        """由 to_json_dict 的结果还原导出设置"""
+        data = dict(data)
+        watermark = data.pop('watermark', {})
+        if data.get('renditions'):
+            data['renditions'] = tuple(Rendition(**rendition) for rendition in data['renditions'])
+        return cls.from_dict(watermark, **data)
+
+    def get_renditions(self) -> Tuple[Rendition, ...]:
+        """获取按尺寸从大到小排列的输出尺寸，未设置时只有原尺寸"""
+        if not self.renditions:
+            return (Rendition(),)
+        # 原尺寸 (max_size 为 0) 排在最前，其余按最长边从大到小
+        return tuple(sorted(self.renditions,
+                            key=lambda rendition: (rendition.max_size != 0, -rendition.max_size)))
+
+    def output_path_for(self, input_path: str, rendition: Optional[Rendition] = None) -> str:
+        """生成输入文件对应的输出路径，写入归档时为归档路径下的条目名
+
+        Args:
+            input_path: 输入图片路径
+            rendition: 输出尺寸，默认为最大的一个
+        """
+        rendition = rendition or self.get_renditions()[0]
+        name = os.path.splitext(os.path.basename(input_path))[0]
+        directory = self.archive_path() if self.archive else self.output_dir
+        format = rendition.format or self.format
+        return os.path.join(directory, f"{self.prefix}{name}{self.suffix}{rendition.suffix}.{format.lower()}")
+
+    def output_paths_for(self, input_path: str) -> List[str]:
+        """生成输入文件各尺寸的输出路径，顺序与 get_renditions 一致"""
+        return [self.output_path_for(input_path, rendition) for rendition in self.get_renditions()]
+
+    def archive_path(self) -> str:
+        """归档文件路径"""
+        return os.path.join(self.output_dir, f"{DEFAULT_ARCHIVE_NAME}.{self.archive}")
+
+
+@dataclass
+class ExportResult:
+    """单个文件的导出结果"""
+    input_path: str
+    output_path: str
+    error: Optional[str] = None
+    bytes_written: int = 0
+    timings: Dict[str, float] = field(default_factory=dict)  # 各阶段耗时（秒）
+    duplicate_of: Optional[str] = None  # 内容重复时复用的输入文件
+    extra_outputs: List[str] = field(default_factory=list)  # 多尺寸导出时其余尺寸的输出路径
+    data: Optional[List[bytes]] = field(default=None, repr=False)  # 写入归档前各尺寸的编码数据
+    predicted: Optional[float] = None  # 调度时预计的耗时（秒），未调度时为 None
+
+    @property
+    def ok(self) -> bool:
+        """是否导出成功"""
+        return self.error is None
+
+    @property
+    def output_paths(self) -> List[str]:
+        """所有尺寸的输出路径（第一个为 output_path）"""
+        return [self.output_path] + self.extra_outputs
+
+
+def export_file(input_path: str, settings: ExportSettings,
+                processor: Optional[ImageProcessor] = None,
+                counter: int = 1) -> ExportResult:
+    """导出单个文件
+
+    图片只解码一次。设置了多个输出尺寸时从大到小逐级缩小原图（每一级由上一级缩小得到），
+    水印按该尺寸与原图宽度之比缩放后合成并编码；相对大小的图层本来就随图片宽度变化。
+
+    settings.archive 不为空时不写文件，各尺寸的编码结果放在 result.data 中，由调用方写入归档。
+
+    动图 GIF 和多页 TIFF 的每一帧都加水印，见 _export_frames。
+
+    Args:
+        input_path: 输入图片路径
+        settings: 导出设置
+        processor: 可复用的处理器实例，为 None 时新建一个
+        counter: 文本变量 {counter} 的取值
+
+    Returns:
+        ExportResult: 导出结果
+    """
+    processor = processor or ImageProcessor()
+    processor.set_token_counter(counter)
+    processor.set_color_management(settings.color_management)
+    renditions = settings.get_renditions()
+    output_paths = settings.output_paths_for(input_path)
+    result = ExportResult(input_path, output_paths[0], extra_outputs=output_paths[1:])
+    start = time.perf_counter()
+
+    if is_multi_frame(input_path):
+        return _export_frames(input_path, settings, processor, result, start)
+
+    if not processor.load_image(input_path):
+        result.error = processor.get_last_error()
+        result.timings['total'] = time.perf_counter() - start
+        return result
+    loaded = time.perf_counter()
+
+    watermark = settings.watermark_settings()
+    full_width = processor.get_image_size()[0]
+    timings = {'load': loaded - start, 'resize': 0.0, 'watermark': 0.0, 'save': 0.0}
+    encoded = []
+    for rendition, output_path in zip(renditions, output_paths):
+        step_start = time.perf_counter()
+        if rendition.max_size:
+            processor.downscale_original(rendition.max_size)
+        resized = time.perf_counter()
+
+        width = processor.get_image_size()[0]
+        processor.apply_settings(watermark if width == full_width else
+                                 ImageProcessor.scale_watermark_settings(watermark, width / full_width))
+        watermarked = time.perf_counter()
+
+        format = rendition.format or settings.format
+        quality = rendition.quality or settings.quality
+        if settings.archive:
+            buffer = io.BytesIO()
+            try:
+                processor.encode_image(buffer, format, quality, settings.profile)
+                encoded.append(buffer.getvalue())
+                result.bytes_written += len(encoded[-1])
+            except Exception as e:
+                result.error = f"Error encoding image: {e}"
+        elif processor.save_image(output_path, quality=quality,
+                                  format=format, profile=settings.profile):
+            result.bytes_written += os.path.getsize(output_path)
+        else:
+            result.error = processor.get_last_error()
+        saved = time.perf_counter()
+
+        timings['resize'] += resized - step_start
+        timings['watermark'] += watermarked - resized
+        timings['save'] += saved - watermarked
+        if result.error:
+            break
+
+    if settings.archive and result.ok:
+        result.data = encoded
+    timings['total'] = time.perf_counter() - start
+    result.timings = timings
+    return result
+
+
+def _export_frames(input_path: str, settings: ExportSettings, processor: ImageProcessor,
+                   result: ExportResult, start: float) -> ExportResult:
+    """导出多帧图片，每个尺寸写出一个多帧文件
+
+    输出格式见 animation.output_format_for，与所选格式不同时输出路径的扩展名随之改变。
+    帧流式解码、并行合成，每个尺寸重新读取一遍源文件，不需要同时保留所有帧。
+    """
+    watermark = settings.watermark_settings()
+    # 解码、合成和编码交错进行，只记录各尺寸的整体耗时；没有分阶段耗时的结果不参与成本模型标定
+    timings = {'frames': 0.0}
+    output_paths, encoded = [], []
+
+    def overlay_for(frame: Image.Image, scale: float):
+        # 在调用方线程中执行，处理器只在这里使用
+        processor.set_image(frame)
+        return processor.render_overlay(
+            watermark if scale == 1 else ImageProcessor.scale_watermark_settings(watermark, scale))
+
+    for rendition, output_path in zip(settings.get_renditions(), result.output_paths):
+        step_start = time.perf_counter()
+        try:
+            with Image.open(input_path) as image:
+                format = output_format_for(image.format, rendition.format or settings.format)
+                output_path = f"{os.path.splitext(output_path)[0]}.{format.lower()}"
+                finish = PaletteMapper(image) if format == 'GIF' and image.format == 'GIF' else None
+                frames = iter_watermarked_frames(
+                    image, overlay_for, finish=finish,
+                    target_size=lambda size: fit_size(size, rendition.max_size))
+                quality = rendition.quality or settings.quality
+                if settings.archive:
+                    buffer = io.BytesIO()
+                    save_frames(frames, buffer, format, image, quality)
+                    encoded.append(buffer.getvalue())
+                    result.bytes_written += len(encoded[-1])
+                else:
+                    # 与 ImageProcessor.save_image 相同的临时文件，进程、线程之间不会冲突
+                    temp_path = temp_path_for(output_path)
+                    try:
+                        save_frames(frames, temp_path, format, image, quality)
+                        commit_temp_file(temp_path, output_path)
+                    finally:
+                        if os.path.exists(temp_path):
+                            os.remove(temp_path)
+                    result.bytes_written += os.path.getsize(output_path)
+        except Exception as e:
+            result.error = f"Error exporting frames: {e}"
+        timings['frames'] += time.perf_counter() - step_start
+        output_paths.append(output_path)
+        if result.error:
+            break
+
+    result.output_path, result.extra_outputs = output_paths[0], output_paths[1:]
+    if settings.archive and result.ok:
+        result.data = encoded
+    timings['total'] = time.perf_counter() - start
+    result.timings = timings
+    return result
+
+
+class _SharedArtifacts:
+    """多进程导出时在共享内存中发布的静态图层和平铺图案
+
+    平铺图案从 (0, 0) 开始平铺，大图案的左上角就是小图片需要的图案，
+    因此只保留一份按本批最大图片尺寸（向上对齐）生成的图案，遇到更大的图片时才重新发布，
+    旧图案在引用它的任务全部结束后删除。
+    """
+    PATTERN_ALIGN = 1024
+
+    def __init__(self, store: SharedLayerStore, settings: ExportSettings):
+        self._store = store
+        self._processor = ImageProcessor()
+        self._watermark = settings.watermark_settings()
+        self._has_tiles = any(
+            layer.get('tile') for layer in ImageProcessor.layers_from_settings(self._watermark)
+        )
+        self._pattern_size = (0, 0)
+        self._layer_handles = tuple(
+            store.publish(image, key)
+            for key, image in self._processor.render_static_artifacts(self._watermark).items()
+        )
+        self._pattern_handles: Tuple[SharedLayerHandle, ...] = ()
+
+    def handles_for(self, input_path: str) -> Tuple[SharedLayerHandle, ...]:
+        """获取处理某个文件所需的共享图层描述"""
+        if self._has_tiles:
+            probed = probe_image(input_path)
+            if probed and (probed[0] > self._pattern_size[0] or probed[1] > self._pattern_size[1]):
+                align = self.PATTERN_ALIGN
+                self._pattern_size = (
+                    -(-max(probed[0], self._pattern_size[0]) // align) * align,
+                    -(-max(probed[1], self._pattern_size[1]) // align) * align,
+                )
+                artifacts = self._processor.render_static_artifacts(self._watermark, self._pattern_size)
+                superseded = self._pattern_handles
+                self._pattern_handles = tuple(
+                    self._store.publish(image, key)
+                    for key, image in artifacts.items() if key[0] == 'tile'
+                )
+                self._store.retire(superseded)
+        return self._layer_handles + self._pattern_handles
+
+
+def _has_dynamic_text(settings: ExportSettings) -> bool:
+    """水印中是否有按图片变化的文本变量"""
+    layers = ImageProcessor.layers_from_settings(settings.watermark_settings())
+    return any(layer.get('type') == 'text' and has_tokens(layer.get('text') or '')
+               for layer in layers)
+
+
+# 工作进程中的全局状态，由 _init_process_worker 设置
+_worker_settings: Optional[ExportSettings] = None
+_worker_processor: Optional[ImageProcessor] = None
+
+
+def _init_process_worker(settings: ExportSettings) -> None:
+    """工作进程初始化：设置只在进程启动时传一次"""
+    global _worker_settings, _worker_processor
+    _worker_settings = settings
+    _worker_processor = ImageProcessor()
+
+
+def _process_export(input_path: str, counter: int,
+                    handles: Tuple[SharedLayerHandle, ...]) -> ExportResult:
+    """在工作进程中导出单个文件，水印图层直接映射自共享内存"""
+    _worker_processor.set_shared_layers(attach_layers(handles))
+    # 换上新图层后，已被取代的旧图案不再被引用，释放其映射
+    detach_except(handles)
+    return export_file(input_path, _worker_settings, _worker_processor, counter)
+
+
+def iter_export(input_paths: Iterable[str], settings: ExportSettings,
+                workers: Optional[int] = None,
+                max_in_flight: Optional[int] = None,
+                memory_budget: Optional[int] = None,
+                journal: Optional[ExportJournal] = None,
+                resume: bool = False,
+                processes: bool = False,
+                dedupe: bool = False,
+                schedule: bool = False,
+                cost_model: Optional[CostModel] = None,
+                schedule_report: Optional[ScheduleReport] = None,
+                metadata_index: Optional[MetadataIndex] = None) -> Iterator[ExportResult]:
+    """流式批量导出
+
+    输入路径按需从可迭代对象中取出，同时处理中的文件数不超过 max_in_flight，
+    结果按完成顺序产出。生成器被关闭时，尚未开始的任务会被取消。
+
+    设置 memory_budget 后，每个任务提交前会根据文件头估算峰值内存，
+    只有在总占用不超过预算时才放行，超大文件因此会被串行处理。
+
+    传入 journal 后，每个结果都会追加到导出日志中。resume 为 True 时沿用已有日志，
+    并直接跳过日志中在相同设置下已完成的文件（不会再检查输出文件），
+    否则开始一份新的日志。
+
+    processes 为 True 时使用多进程。渲染好的静态图层和平铺图案在本批中只写入一次共享内存，
+    每个任务只传输文件路径和共享内存名称，批处理结束时共享内存会被释放。
+
+    dedupe 为 True 时先找出内容相同的输入文件（需要先取出全部路径），每组只处理第一个，
+    其余文件在它完成后通过硬链接（或复制）复用其输出，结果的 duplicate_of 指向被复用的文件。
+    水印文本含有按图片变化的变量时不做复用。
+
+    settings.archive 不为空时，各工作线程（进程）只编码，由单个写入线程把结果写入归档；
+    结果的 output_path 为归档路径下的条目名。归档无法追加，因此不能与 journal 同时使用。
+
+    schedule 为 True 时先取出全部路径，只读取文件头估算每个文件的耗时，
+    按预计耗时从长到短提交（LPT），避免最后剩下一个大文件让其他工作线程空等。
+    {counter} 仍按原列表顺序编号；结果的 predicted 为预计耗时，
+    传入 schedule_report 时会记录整批的预计与实际耗时。
+
+    Args:
+        input_paths: 输入图片路径的可迭代对象（可以是惰性生成器）
+        settings: 不可变的导出设置
+        workers: 工作线程（或进程）数，默认为 CPU 核数
+        max_in_flight: 同时提交的最大任务数，默认为工作线程数的两倍
+        memory_budget: 同时运行任务的内存预算（字节），None 表示不限制
+        journal: 导出日志，None 表示不记录
+        resume: 是否从日志中断处继续
+        processes: 是否使用多进程
+        dedupe: 是否跳过内容重复的输入文件
+        schedule: 是否按预计耗时从长到短调度
+        cost_model: 估算耗时的成本模型，默认从 cost_model.json 加载
+        schedule_report: 调度报告，None 表示不记录
+        metadata_index: 元数据索引，内存和耗时估算直接使用索引中的文件头信息
+
+    Yields:
+        ExportResult: 每个文件的导出结果
+
+    Raises:
+        ValueError: 同时指定了归档输出和 journal
+        RuntimeError: 所有文件处理完后归档未能写完
+    """
+    if settings.archive and journal is not None:
+        raise ValueError("Archive export does not support the export journal")
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max(1, max_in_flight or workers * 2)
+    governor = MemoryGovernor(memory_budget) if memory_budget else None
+
+    def estimate_memory(path: str) -> int:
+        # 已索引的文件不必再打开文件头
+        if metadata_index is not None and metadata_index.get(path) is not None:
+            return metadata_index.estimate_memory(path)
+        return estimate_file_memory(path)
+    local = threading.local()
+
+    paths = iter(input_paths)
+    settings_hash = None
+    if journal is not None:
+        if resume:
+            settings_hash = ExportJournal.settings_hash(settings.to_json_dict())
+            completed = journal.completed_inputs(settings_hash)
+            paths = (path for path in paths if path not in completed)
+        else:
+            settings_hash = journal.start(settings.to_json_dict())
+
+    duplicates_of: Dict[str, List[str]] = {}  # 被复用的文件 -> 重复文件
+    if dedupe and not _has_dynamic_text(settings):
+        path_list = list(paths)
+        duplicates = find_duplicates(path_list)
+        for duplicate, original in duplicates.items():
+            duplicates_of.setdefault(original, []).append(duplicate)
+        paths = iter([path for path in path_list if path not in duplicates])
+
+    jobs = ((path, index, None) for index, path in enumerate(paths, 1))
+    if schedule:
+        planned = plan_lpt(((path, index) for path, index, _ in jobs),
+                           cost_model or CostModel.load(), metadata_index)
+        if schedule_report is not None:
+            schedule_report.plan(planned, workers)
+        jobs = iter([(job.path, job.counter, job.predicted) for job in planned])
+
+    writer = ArchiveWriter(settings.archive_path(), settings.archive) if settings.archive else None
+
+    def store(result: ExportResult, data: Optional[List[bytes]]) -> None:
+        # 把编码结果交给归档写入线程，写入积压过多时在这里等待
+        if writer is None or not result.ok:
+            return
+        try:
+            names = [writer.add(os.path.basename(path), blob)
+                     for path, blob in zip(result.output_paths, data)]
+            result.output_path = os.path.join(settings.archive_path(), names[0])
+            result.extra_outputs = [os.path.join(settings.archive_path(), name)
+                                    for name in names[1:]]
+        except Exception as e:
+            result.error = f"Error writing archive: {e}"
+
+    def reuse_output(result: ExportResult, duplicate: str) -> ExportResult:
+        # 多帧图片的输出格式可能与设置不同，扩展名跟随被复用的输出
+        output_paths = [os.path.splitext(target)[0] + os.path.splitext(source)[1]
+                        for target, source in zip(settings.output_paths_for(duplicate),
+                                                  result.output_paths)]
+        reused = ExportResult(duplicate, output_paths[0], duplicate_of=result.input_path,
+                              extra_outputs=output_paths[1:])
+        if not result.ok:
+            reused.error = f"Duplicate of failed input {result.input_path}"
+        elif writer is not None:
+            reused.bytes_written = result.bytes_written
+            store(reused, result.data)
+        else:
+            try:
+                for source, target in zip(result.output_paths, reused.output_paths):
+                    link_or_copy(source, target)
+            except Exception as e:
+                reused.error = f"Error reusing output: {e}"
+        if journal is not None:
+            journal.record(settings_hash, reused.input_path, reused.output_path, reused.error)
+        return reused
+
+    def run(path: str, counter: int) -> ExportResult:
+        # 每个线程复用自己的处理器，以保留图层缓存
+        if not hasattr(local, 'processor'):
+            local.processor = ImageProcessor()
+        return export_file(path, settings, local.processor, counter)
+
+    def result_of(future: Future, path: str) -> ExportResult:
+        try:
+            return future.result()
+        except Exception as e:
+            return ExportResult(path, settings.output_path_for(path), error=str(e))
+
+    def on_done(future: Future, path: str, cost: int) -> None:
+        # 任务结束（包括被取消）时立即释放预算并记录日志，不必等调用方取结果
+        if governor:
+            governor.release(cost)
+        if journal is not None and not future.cancelled():
+            result = result_of(future, path)
+            journal.record(settings_hash, result.input_path, result.output_path, result.error)
+
+    layer_store = SharedLayerStore() if processes else None
+    pending: Dict[Future, str] = {}
+    archive_finished = False  # 全部任务已完成，归档写不完时才报错
+    try:
+        if processes:
+            artifacts = _SharedArtifacts(layer_store, settings)
+            executor = ProcessPoolExecutor(max_workers=workers,
+                                           initializer=_init_process_worker,
+                                           initargs=(settings,))
+
+            def submit(path: str, counter: int) -> Future:
+                # 任务运行期间引用的图层不会被删除，即使之后换成了更大的图案
+                handles = artifacts.handles_for(path)
+                layer_store.retain(handles)
+                try:
+                    future = executor.submit(_process_export, path, counter, handles)
+                except BaseException:
+                    layer_store.release(handles)
+                    raise
+                future.add_done_callback(lambda f: layer_store.release(handles))
+                return future
+        else:
+            executor = ThreadPoolExecutor(max_workers=workers)
+            submit = lambda path, counter: executor.submit(run, path, counter)
+
+        try:
+            exhausted = False
+            waiting = None  # 已取出但尚未获准运行的任务 (path, cost, counter)
+            predictions: Dict[str, float] = {}
+            while True:
+                while len(pending) < max_in_flight:
+                    if waiting is None:
+                        job = next(jobs, None)
+                        if job is None:
+                            exhausted = True
+                            break
+                        path, counter, predicted = job
+                        if predicted is not None:
+                            predictions[path] = predicted
+                        waiting = (path, estimate_memory(path) if governor else 0, counter)
+                    if governor:
+                        # 还有任务在运行时由 wait() 等待它们结束；已全部取回结果但其回调尚未
+                        # 释放预算时，在预算的条件变量上阻塞等待，不空转
+                        admitted = (governor.try_acquire(waiting[1]) if pending
+                                    else governor.acquire(waiting[1], GOVERNOR_WAIT))
+                        if not admitted:
+                            break
+                    path, cost, index = waiting
+                    future = submit(path, index)
+                    future.add_done_callback(lambda f, p=path, c=cost: on_done(f, p, c))
+                    pending[future] = path
+                    waiting = None
+                if not pending:
+                    if exhausted:
+                        break
+                    continue  # 预算等待超时，重新尝试
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = result_of(future, pending.pop(future))
+                    result.predicted = predictions.pop(result.input_path, None)
+                    if schedule_report is not None and result.predicted is not None:
+                        schedule_report.record(result.input_path, result.timings.get('total'))
+                    store(result, result.data)
+                    reused = [reuse_output(result, duplicate)
+                              for duplicate in duplicates_of.pop(result.input_path, [])]
+                    result.data = None
+                    yield result
+                    yield from reused
+            archive_finished = True
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+    finally:
+        if layer_store is not None:
+            layer_store.close()
+        if journal is not None:
+            journal.close()
+        # 取消时已写入的图片同样保留在归档中
+        if writer is not None and not writer.close() and archive_finished:
+            raise RuntimeError(f"Error writing archive: {writer.get_error()}")
+
+
+def resume_export(output_dir: str, input_paths: Iterable[str],
+                  **kwargs) -> Iterator[ExportResult]:
+    """使用输出目录中导出日志记录的设置，从中断处继续导出
+
+    Args:
+        output_dir: 上次导出的输出目录
+        input_paths: 输入图片路径的可迭代对象
+        **kwargs: 传给 iter_export 的其他参数（workers、memory_budget 等）
+
+    Yields:
+        ExportResult: 尚未完成的文件的导出结果
+
+    Raises:
+        FileNotFoundError: 输出目录中没有可用的导出日志
+    """
+    journal = ExportJournal.for_output_dir(output_dir)
+    start = journal.get_start_record()
+    if start is None:
+        raise FileNotFoundError(f"No export journal found in {output_dir}")
+    settings = ExportSettings.from_json_dict(start['settings'])
+    return iter_export(input_paths, settings, journal=journal, resume=True, **kwargs)
@@ -0,0 +1,169 @@
+"""
+色彩管理模块
+
+带 ICC 配置文件（Adobe RGB、ProPhoto 等）的图片保存时如果丢掉配置文件，在网页上颜色会偏移。
+导出时可以保留原配置文件（嵌入到输出文件），或把像素转换到 sRGB 并嵌入 sRGB 配置文件。
+
+构建 ImageCms 转换（解析配置文件、生成查找表）的开销远大于应用它，因此转换按
+(配置文件哈希, 目标, 渲染意图, 模式) 缓存：同一台相机拍摄的一批图片只构建一次转换，
+之后原地应用到刚解码的图片上。没有配置文件的图片按 sRGB 处理，不做转换。
+"""
+from collections import OrderedDict
+from typing import Optional, Tuple
+from PIL import Image, features
+import hashlib
+import io
+import threading
+
+COLOR_MODES = ('', 'keep', 'srgb')  # 不处理（丢弃配置文件）/ 保留配置文件 / 转换到 sRGB
+RENDERING_INTENTS = {'perceptual': 0, 'relative': 1, 'saturation': 2, 'absolute': 3}
+DEFAULT_INTENT = 'perceptual'
+TARGET_SRGB = 'sRGB'
+
+# 可以做色彩转换的输入模式 -> 输出模式（CMYK 转换后为 RGB）
+_OUTPUT_MODES = {'RGB': 'RGB', 'RGBA': 'RGBA', 'CMYK': 'RGB'}
+
+
+def is_available() -> bool:
+    """当前 Pillow 是否带有 LittleCMS（ImageCms）"""
+    return bool(features.check('littlecms2'))
+
+
+def profile_hash(icc_profile: bytes) -> str:
+    """ICC 配置文件内容的哈希，用作缓存键"""
+    return hashlib.sha1(icc_profile).hexdigest()
+
+
+class TransformCache:
+    """线程安全的 ICC 转换缓存
+
+    缓存的转换使用 NOCACHE 标志构建，可以在多个线程中同时应用。
+    """
+
+    def __init__(self, max_size: int = 32):
+        """
+        Args:
+            max_size: 最多缓存的转换数量
+        """
+        self.max_size = max_size
+        self._transforms = OrderedDict()  # (哈希, 目标, 渲染意图, 模式) -> 转换，构建失败时为 None
+        self._profiles = {}  # 哈希 -> (色彩空间, 是否为 sRGB)，无法解析时为 None
+        self._srgb = None
+        self._lock = threading.Lock()
+        self.builds = 0  # 实际构建转换的次数
+
+    def srgb_profile(self) -> bytes:
+        """sRGB 配置文件内容"""
+        from PIL import ImageCms
+        with self._lock:
+            if self._srgb is None:
+                self._srgb = ImageCms.ImageCmsProfile(ImageCms.createProfile('sRGB')).tobytes()
+            return self._srgb
+
+    def describe(self, icc_profile: bytes) -> Optional[Tuple[str, bool]]:
+        """解析配置文件，返回 (色彩空间如 'RGB'/'CMYK', 是否为 sRGB)，无法解析时返回 None"""
+        from PIL import ImageCms
+        key = profile_hash(icc_profile)
+        with self._lock:
+            if key in self._profiles:
+                return self._profiles[key]
+        try:
+            profile = ImageCms.ImageCmsProfile(io.BytesIO(icc_profile))
+            color_space = profile.profile.xcolor_space.strip()
+            description = ImageCms.getProfileDescription(profile)
+            described = (color_space, 'srgb' in description.lower().replace(' ', ''))
+        except Exception as e:
+            print(f"Error reading ICC profile: {e}")
+            described = None
+        with self._lock:
+            self._profiles[key] = described
+        return described
+
+    def get(self, icc_profile: bytes, mode: str, target: str = TARGET_SRGB,
+            intent: str = DEFAULT_INTENT):
+        """获取（必要时构建）从配置文件到目标色彩空间的转换
+
+        Args:
+            icc_profile: 源配置文件内容
+            mode: 图片模式（'RGB'、'RGBA' 或 'CMYK'）
+            target: 目标色彩空间，目前只支持 sRGB
+            intent: 渲染意图，见 RENDERING_INTENTS
+
+        Returns:
+            ImageCmsTransform 或 None（无法构建时）
+        """
+        from PIL import ImageCms
+        key = (profile_hash(icc_profile), target, intent, mode)
+        with self._lock:
+            if key in self._transforms:
+                self._transforms.move_to_end(key)
+                return self._transforms[key]
+        try:
+            transform = ImageCms.buildTransform(
+                ImageCms.ImageCmsProfile(io.BytesIO(icc_profile)),
+                ImageCms.createProfile(target),
+                mode, _OUTPUT_MODES[mode],
+                renderingIntent=RENDERING_INTENTS.get(intent, 0),
+                flags=ImageCms.Flags.NOCACHE,
+            )
+        except Exception as e:
+            print(f"Error building color transform: {e}")
+            transform = None
+        with self._lock:
+            # 其他线程可能同时构建了同一个转换，保留先放入的
+            transform = self._transforms.setdefault(key, transform)
+            self.builds += 1
+            while len(self._transforms) > self.max_size:
+                self._transforms.popitem(last=False)
+        return transform
+
+
+_transform_cache = TransformCache()
+
+
+def get_transform_cache() -> TransformCache:
+    """进程内共享的转换缓存"""
+    return _transform_cache
+
+
+def manage_color(image, icc_profile: Optional[bytes], color_mode: str,
+                 intent: str = DEFAULT_INTENT, in_place: bool = False
+                 ) -> Tuple[object, Optional[bytes]]:
+    """按色彩管理方式处理刚解码的图片
+
+    Args:
+        image: Pillow 图片或 MappedImage
+        icc_profile: 图片内嵌的配置文件，没有时为 None
+        color_mode: COLOR_MODES 之一
+        intent: 渲染意图
+        in_place: 图片是否可以原地修改（刚解码、没有与其他对象共享）
+
+    Returns:
+        Tuple: (处理后的图片, 保存时要嵌入的配置文件或 None)
+    """
+    if not color_mode or not icc_profile or image.mode not in _OUTPUT_MODES:
+        return image, None
+    if not is_available():
+        return image, None
+    cache = _transform_cache
+    described = cache.describe(icc_profile)
+    if described is None:
+        return image, None
+    color_space, is_srgb = described
+    # RGB 配置文件在保留模式或本来就是 sRGB 时原样嵌入；
+    # CMYK 图片之后会被转换为 RGB，原配置文件不再适用，两种模式下都转换到 sRGB
+    if (color_mode == 'keep' or is_srgb) and color_space == 'RGB' and image.mode != 'CMYK':
+        return image, icc_profile
+
+    transform = cache.get(icc_profile, image.mode, TARGET_SRGB, intent)
+    if transform is None:
+        return image, None
+    from PIL import ImageCms
+    if not isinstance(image, Image.Image):
+        image = image.copy()  # 内存映射的原图先读入，读入的副本可以原地转换
+        in_place = True
+    if in_place and _OUTPUT_MODES[image.mode] == image.mode:
+        ImageCms.applyTransform(image, transform, inPlace=True)
+    else:
+        image = ImageCms.applyTransform(image, transform)
+    return image, cache.srgb_profile()
@@ -57,6 +57,7 @@ class ConfigManager:
             'export': {
                 'quality': 95,
                 'format': 'jpg',
+                'profile': 'balanced',
                 'prefix': '',
                 'suffix': '_watermarked'
             },
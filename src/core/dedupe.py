@@ -0,0 +1,95 @@
+"""
+重复图片检测模块
+
+分阶段比较文件内容：先按文件大小分组，再对同组文件计算首尾数据块的哈希，
+只有首尾哈希也相同的文件才计算完整哈希，因此绝大多数文件只需要一次 stat。
+"""
+from typing import Dict, Iterable, List
+import hashlib
+import os
+import shutil
+
+from .atomic_file import commit_temp_file, temp_path_for
+
+BLOCK_SIZE = 64 * 1024  # 首尾数据块大小
+_READ_CHUNK = 1024 * 1024
+
+
+def _edge_hash(path: str, size: int) -> bytes:
+    """计算文件首尾两个数据块的哈希"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        digest.update(f.read(BLOCK_SIZE))
+        if size > BLOCK_SIZE:
+            f.seek(max(BLOCK_SIZE, size - BLOCK_SIZE))
+            digest.update(f.read(BLOCK_SIZE))
+    return digest.digest()
+
+
+def _full_hash(path: str) -> bytes:
+    """计算整个文件的哈希"""
+    digest = hashlib.blake2b(digest_size=32)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_READ_CHUNK), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def _group_by(paths: List[str], key) -> List[List[str]]:
+    """按 key 分组，只返回包含多个文件的组"""
+    groups: Dict[object, List[str]] = {}
+    for path in paths:
+        try:
+            groups.setdefault(key(path), []).append(path)
+        except OSError:
+            continue
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def find_duplicates(paths: Iterable[str]) -> Dict[str, str]:
+    """找出内容完全相同的文件
+
+    Args:
+        paths: 文件路径
+
+    Returns:
+        Dict[str, str]: 重复文件路径 -> 同组中第一个出现的文件路径
+    """
+    paths = list(dict.fromkeys(paths))
+    sizes = {}
+    for path in paths:
+        try:
+            sizes[path] = os.path.getsize(path)
+        except OSError:
+            continue
+
+    duplicates = {}
+    for same_size in _group_by(list(sizes), lambda p: sizes[p]):
+        for same_edges in _group_by(same_size, lambda p: _edge_hash(p, sizes[p])):
+            for same_content in _group_by(same_edges, _full_hash):
+                original = same_content[0]
+                for path in same_content[1:]:
+                    duplicates[path] = original
+    return duplicates
+
+
+def link_or_copy(source: str, target: str) -> None:
+    """让 target 与 source 内容相同：优先创建硬链接，失败时复制
+
+    先写入同目录下的临时文件，落盘后再重命名，不会留下不完整的目标文件。
+
+    Args:
+        source: 已存在的文件
+        target: 目标路径
+    """
+    temp_path = temp_path_for(target)
+    try:
+        try:
+            os.link(source, temp_path)
+        except OSError:
+            shutil.copyfile(source, temp_path)
+        commit_temp_file(temp_path, target)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
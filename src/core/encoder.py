@@ -0,0 +1,106 @@
+"""
+编码配置模块
+
+将 "fast" / "balanced" / "smallest" 三种编码档位映射为各输出格式的具体 Pillow 参数。
+画质（quality）由调用方单独指定，档位决定同一画质下编码耗时、文件大小和色度细节之间的取舍：
+
+- fast: 跳过所有耗时的步骤（JPEG 不做霍夫曼表优化和渐进式扫描，PNG 最低压缩级别，
+  WebP/AVIF 最快的编码速度），适合预览和临时导出，文件最大。
+- balanced: JPEG 保留完整色度（4:4:4），彩色文字水印和细线边缘不会被色度抽样糊掉，
+  并优化霍夫曼表；其他格式使用默认的压缩力度。文件比 smallest 大，编码稍慢于 fast。
+- smallest: JPEG 色度 4:2:0 抽样加渐进式扫描，PNG 最高压缩级别，WebP/AVIF 最慢最细的搜索；
+  文件最小，编码最慢，色度细节略有损失。
+"""
+from typing import Any, Dict, List
+from PIL import Image, features
+
+DEFAULT_PROFILE = 'balanced'
+
+# 各格式在不同档位下的保存参数，quality 由调用方另外传入
+ENCODER_PROFILES: Dict[str, Dict[str, Dict[str, Any]]] = {
+    'JPEG': {
+        'fast': {'optimize': False, 'progressive': False, 'subsampling': '4:2:0'},
+        'balanced': {'optimize': True, 'progressive': False, 'subsampling': '4:4:4'},
+        'smallest': {'optimize': True, 'progressive': True, 'subsampling': '4:2:0'},
+    },
+    'PNG': {
+        'fast': {'compress_level': 1, 'optimize': False},
+        'balanced': {'compress_level': 6, 'optimize': False},
+        'smallest': {'compress_level': 9, 'optimize': True},
+    },
+    'WEBP': {
+        'fast': {'method': 0},
+        'balanced': {'method': 4},
+        'smallest': {'method': 6},
+    },
+    'AVIF': {
+        'fast': {'speed': 9},
+        'balanced': {'speed': 6},
+        'smallest': {'speed': 2},
+    },
+}
+
+# 各档位的取舍说明（界面提示）
+PROFILE_DESCRIPTIONS = {
+    'fast': "编码最快、文件最大：跳过压缩优化，适合预览和临时导出",
+    'balanced': "JPEG 保留完整色度，彩色水印边缘清晰；压缩力度适中",
+    'smallest': "文件最小、编码最慢：JPEG 色度抽样加渐进式，其他格式最高压缩",
+}
+
+# 使用 quality 参数的格式
+_QUALITY_FORMATS = ('JPEG', 'WEBP', 'AVIF')
+
+
+def normalize_format(format: str) -> str:
+    """将格式名或扩展名统一为 Pillow 的格式名，如 'jpg' -> 'JPEG'"""
+    format = format.lstrip('.').upper()
+    if format in ('JPG', 'JPEG'):
+        return 'JPEG'
+    if format in ('TIF', 'TIFF'):
+        return 'TIFF'
+    return format
+
+
+def is_format_available(format: str) -> bool:
+    """当前 Pillow 是否支持写出该格式"""
+    format = normalize_format(format)
+    Image.init()
+    if format not in Image.SAVE:
+        return False
+    if format == 'WEBP':
+        return features.check('webp')
+    if format == 'AVIF':
+        return bool(features.check('avif'))
+    return True
+
+
+def get_output_formats() -> List[str]:
+    """获取可用的导出格式列表"""
+    return [fmt for fmt in ENCODER_PROFILES if is_format_available(fmt)]
+
+
+def get_profile_names() -> List[str]:
+    """获取编码档位名称列表"""
+    return list(ENCODER_PROFILES['JPEG'])
+
+
+def get_encoder_options(format: str, profile: str = DEFAULT_PROFILE,
+                        quality: int = 95) -> Dict[str, Any]:
+    """获取某格式在某档位下的保存参数
+
+    Args:
+        format: 输出格式
+        profile: 编码档位，未知档位按 'balanced' 处理
+        quality: 图片质量 (1-100)，只对有损格式生效
+
+    Returns:
+        Dict[str, Any]: 传给 Image.save 的参数
+    """
+    format = normalize_format(format)
+    profiles = ENCODER_PROFILES.get(format)
+    if not profiles:
+        return {}
+    options = dict(profiles.get(profile, profiles[DEFAULT_PROFILE]))
+    if format in _QUALITY_FORMATS:
+        options['quality'] = quality
+    return options
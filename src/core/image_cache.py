@@ -0,0 +1,191 @@
+"""
+解码图片缓存模块
+
+按内存预算保存最近解码的图片（LRU），并可在后台线程中预先解码即将浏览的图片，
+在列表中来回切换时不必每次都从磁盘重新解码。
+"""
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
+from PIL import Image
+import os
+import threading
+
+from .memory_budget import _MODE_BYTES, default_memory_budget
+
+# 文件签名: (修改时间纳秒, 文件大小)，文件被修改后缓存自动失效
+Signature = Tuple[int, int]
+
+
+def _signature(image_path: str) -> Optional[Signature]:
+    try:
+        stat = os.stat(image_path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def decode_image(image_path: str) -> Image.Image:
+    """完整解码图片，模式与 ImageProcessor.load_image 一致（RGB 或 RGBA）
+
+    Raises:
+        Exception: 无法打开或解码时抛出 Pillow 的异常
+    """
+    img = Image.open(image_path)
+    try:
+        img.load()
+        if img.mode not in ('RGB', 'RGBA'):
+            return img.convert('RGBA')
+        # 单帧图片解码后 Pillow 已关闭文件，可以直接使用；多帧图片复制当前帧再关闭文件
+        return img.copy() if img.fp is not None else img
+    finally:
+        if img.fp is not None:
+            img.close()
+
+
+class DecodedImageCache:
+    """按内存预算淘汰的解码图片缓存
+
+    缓存中的图片会被多个使用者共享，调用方不能原地修改它们
+    （ImageProcessor 只在副本上合成水印，可以直接使用）。
+
+    用法:
+        cache = DecodedImageCache()
+        image = cache.get_or_load(path)       # 命中时立即返回
+        cache.prefetch([next_path, prev_path])  # 后台解码相邻图片
+    """
+    DEFAULT_BUDGET = 1024 * 1024 * 1024  # 默认最多 1 GB
+
+    def __init__(self, budget_bytes: Optional[int] = None, prefetch_workers: int = 2):
+        """
+        Args:
+            budget_bytes: 缓存的内存预算，默认取 1 GB 与物理内存四分之一中较小者
+            prefetch_workers: 后台解码线程数
+        """
+        if budget_bytes is None:
+            physical_half = default_memory_budget()
+            budget_bytes = min(self.DEFAULT_BUDGET, physical_half // 2) if physical_half else self.DEFAULT_BUDGET
+        self.budget_bytes = max(1, budget_bytes)
+        self._entries: OrderedDict = OrderedDict()  # 路径 -> (签名, 图片, 字节数)
+        self._used_bytes = 0
+        self._lock = threading.Lock()
+        self._loading: Dict[str, Future] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max(1, prefetch_workers))
+        self._wanted: set = set()  # 最近一次 prefetch 请求的路径
+
+    @staticmethod
+    def _image_bytes(image: Image.Image) -> int:
+        return image.size[0] * image.size[1] * _MODE_BYTES.get(image.mode, 4)
+
+    def get(self, image_path: str) -> Optional[Image.Image]:
+        """获取已缓存的图片，未缓存或文件已修改时返回 None"""
+        signature = _signature(image_path)
+        with self._lock:
+            entry = self._entries.get(image_path)
+            if entry is None:
+                return None
+            if entry[0] != signature:
+                self._drop(image_path)
+                return None
+            self._entries.move_to_end(image_path)
+            return entry[1]
+
+    def put(self, image_path: str, image: Image.Image,
+            signature: Optional[Signature] = None) -> None:
+        """放入一张已解码的图片，超出预算时淘汰最久未使用的图片"""
+        size = self._image_bytes(image)
+        if size > self.budget_bytes:
+            return
+        signature = signature or _signature(image_path)
+        with self._lock:
+            if image_path in self._entries:
+                self._drop(image_path)
+            self._entries[image_path] = (signature, image, size)
+            self._used_bytes += size
+            while self._used_bytes > self.budget_bytes and len(self._entries) > 1:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, image_path: str) -> None:
+        """移除一项，调用方需持有锁"""
+        _, _, size = self._entries.pop(image_path)
+        self._used_bytes -= size
+
+    def _load(self, image_path: str) -> Image.Image:
+        """解码并放入缓存"""
+        try:
+            signature = _signature(image_path)
+            image = decode_image(image_path)
+            self.put(image_path, image, signature)
+            return image
+        finally:
+            with self._lock:
+                self._loading.pop(image_path, None)
+
+    def _submit_prefetch(self, image_path: str) -> None:
+        """提交后台解码任务，同一文件已在解码时不重复提交"""
+        with self._lock:
+            if image_path not in self._loading:
+                self._loading[image_path] = self._executor.submit(self._prefetch_task, image_path)
+
+    def _prefetch_task(self, image_path: str) -> Optional[Image.Image]:
+        """后台预取：开始解码前不再需要的图片直接跳过"""
+        with self._lock:
+            wanted = image_path in self._wanted
+        if not wanted or self.get(image_path) is not None:
+            with self._lock:
+                self._loading.pop(image_path, None)
+            return None
+        return self._load(image_path)
+
+    def get_or_load(self, image_path: str) -> Image.Image:
+        """获取图片，未缓存时解码（正在后台预取时等待其完成）
+
+        Raises:
+            Exception: 无法打开或解码时抛出 Pillow 的异常
+        """
+        image = self.get(image_path)
+        if image is not None:
+            return image
+        with self._lock:
+            future = self._loading.get(image_path)
+            if future is not None and future.cancel():
+                # 预取还在排队，不等它，直接在当前线程解码
+                self._loading.pop(image_path, None)
+                future = None
+        if future is not None:
+            image = future.result()
+            if image is not None:
+                return image
+        return self._load(image_path)
+
+    def prefetch(self, image_paths: Iterable[str]) -> None:
+        """在后台解码这些图片；之前请求但尚未开始的预取会被放弃"""
+        paths = [path for path in image_paths if path]
+        with self._lock:
+            self._wanted = set(paths)
+        for path in paths:
+            if self.get(path) is None:
+                self._submit_prefetch(path)
+
+    def discard(self, image_path: str) -> None:
+        """从缓存中移除某张图片"""
+        with self._lock:
+            if image_path in self._entries:
+                self._drop(image_path)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._used_bytes = 0
+
+    def get_used_bytes(self) -> int:
+        """获取当前占用的字节数"""
+        return self._used_bytes
+
+    def close(self) -> None:
+        """停止后台解码并清空缓存"""
+        with self._lock:
+            self._wanted = set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.clear()
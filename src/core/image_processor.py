@@ -1,14 +1,43 @@
 """
 核心图片处理模块
 """
-from typing import Optional, Tuple, Union, List
+from typing import Optional, Tuple, Union, List, Dict, Any
+from collections import OrderedDict
 from PIL import Image, ImageDraw, ImageFont, ImageEnhance
 import numpy as np
+import math
 import os
 
+from .atomic_file import commit_temp_file, temp_path_for
+from .auto_color import choose_color, outline_width, region_stats
+from .color_management import DEFAULT_INTENT, manage_color
+from .encoder import DEFAULT_PROFILE, get_encoder_options, normalize_format
+from .mapped_image import open_mapped
+from .text_tokens import Segment, TokenContext, TokenTextRenderer, parse_template
+
 class ImageProcessor:
     """图像处理类"""
-    SUPPORTED_FORMATS = ['.png', '.jpg', '.jpeg', '.bmp', '.tiff']
+    SUPPORTED_FORMATS = ['.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.tif', '.gif']
+    LAYER_CACHE_SIZE = 32  # 渲染后图层的缓存数量
+    PARSED_TEXT_CACHE_SIZE = 256  # 解析后水印文本的缓存数量
+    DEFAULT_WATERMARK_SETTINGS = {
+        'text': '',
+        'font_name': 'arial.ttf',
+        'font_size': 36,
+        'color': (0, 0, 0),
+        'opacity': 255,
+        'rotation': 0,
+        'scale': 1.0,
+        'position': (0.05, 0.05),  # 使用相对位置 (0.0-1.0)
+        'relative_size': None,  # 水印（文字）宽度占图片宽度的比例，None 表示使用绝对大小
+        'auto_color': False,  # 按水印下方背景的亮度自动选择文本颜色
+        'outline': None,  # 文本描边颜色，None 表示不描边
+        'tile': False,  # 是否把水印按间距重复铺满整张图片（此时忽略 position）
+        'tile_spacing': 50,  # 平铺时相邻水印之间的间距（像素）
+    }
+    SIZE_BUCKETS_PER_OCTAVE = 4  # 相对大小量化时每倍频程的档位数
+    RELATIVE_MEASURE_SIZE = 100  # 按相对大小求字号时，测量文本宽度所用的字号
+    MIN_BUCKET_SIZE = 4  # 最小的渲染尺寸（像素）
     
     def __init__(self):
         self._image = None
@@ -17,26 +46,38 @@ class ImageProcessor:
         self._watermark_image = None  # 用于存储水印图片
         self._current_watermark_layer = None # 用于存储当前水印图层
         self._watermark_bbox = None # (x, y, width, height)
+        self._composite_bbox = None # 所有图层边界框的并集
+        self._composited_image = None # 除 _composite_bbox 外与原图一致、可原地更新的结果图
+        self._patch = None # 尚未读入整张结果图时，合成好的水印区域 (区域图片, 左上角)
+        self._update_bbox = None # 最近一次合成实际改动的区域
+        self._layers = [] # 水印图层栈（从下到上）
+        self._layer_cache = OrderedDict() # 渲染后图层的 LRU 缓存
+        self._last_error = None # 最近一次失败的错误信息
+        self._native_widths = {} # 水印图片路径 -> 原始宽度
+        self._fonts = {} # (字体名, 字号) -> 字体
+        self._parsed_texts = OrderedDict() # 水印文本 -> 解析后的片段（LRU）
+        self._token_renderer = TokenTextRenderer()
+        self._token_context = TokenContext()
+        self._shared_layers = {} # 由其他进程预先渲染好的图层，键与图层缓存一致
+        self._color_management = '' # 色彩管理方式，见 color_management.COLOR_MODES
+        self._rendering_intent = DEFAULT_INTENT
+        self._icc_profile = None # 保存时嵌入的 ICC 配置文件
         self.reset_watermark_settings()
 
     def reset_watermark_settings(self):
         """重置水印设置"""
-        self._watermark_settings = {
-            'text': '',
-            'font_name': 'arial.ttf',
-            'font_size': 36,
-            'color': (0, 0, 0),
-            'opacity': 255,
-            'rotation': 0,
-            'scale': 1.0,
-            'position': (0.05, 0.05),  # 使用相对位置 (0.0-1.0)
-        }
+        self._watermark_settings = dict(self.DEFAULT_WATERMARK_SETTINGS)
         self._watermark_image = None # 重置时也清除水印图片
         self._current_watermark_layer = None
         self._watermark_bbox = None
+        self._composite_bbox = None
+        self._composited_image = None
 
     def load_image(self, image_path: str) -> bool:
         """加载图片
+
+        只准备原图，不复制整张图片：合成水印时只处理水印覆盖的区域，
+        整张结果图在 get_image、保存或编码时才生成。失败时的错误信息见 get_last_error。
         
         Args:
             image_path: 图片路径
@@ -45,19 +86,139 @@ class ImageProcessor:
             bool: 是否成功加载
         """
         try:
-            self._image = Image.open(image_path)
-            self._original_image = self._image.copy()  # 保存原始图片
-            
-            # 确保图片是RGB或RGBA模式
-            if self._image.mode not in ('RGB', 'RGBA'):
-                self._image = self._image.convert('RGBA')
-                self._original_image = self._original_image.convert('RGBA')
+            # 未压缩的 BMP/TIFF 直接内存映射为只读原图，合成时只读取水印覆盖的行
+            mapped = open_mapped(image_path)
+            if mapped is not None:
+                icc_profile = self._read_icc_profile(image_path) if self._color_management else None
+                # 需要转换色彩时会先读入整张图片
+                self._original_image, self._icc_profile = manage_color(
+                    mapped, icc_profile, self._color_management, self._rendering_intent)
+            else:
+                image = Image.open(image_path)
+                image.load()
+                # 刚解码的图片可以原地做色彩转换
+                image, self._icc_profile = manage_color(
+                    image, image.info.get('icc_profile'), self._color_management,
+                    self._rendering_intent, in_place=True)
+                # 确保图片是RGB或RGBA模式
+                if image.mode not in ('RGB', 'RGBA'):
+                    image = image.convert('RGBA')
+                self._original_image = image  # 保存原始图片，之后不会被修改
+            self._image = None
+            self._token_context = TokenContext(image_path, self._token_context.counter)
             
+            self._start_composite_tracking()
             return True
         except Exception as e:
-            print(f"Error loading image: {e}")
+            self._last_error = f"Error loading image: {e}"
             return False
             
+    @staticmethod
+    def _read_icc_profile(image_path: str) -> Optional[bytes]:
+        """只读取文件头中的 ICC 配置文件"""
+        try:
+            with Image.open(image_path) as image:
+                return image.info.get('icc_profile')
+        except Exception:
+            return None
+
+    def set_color_management(self, mode: str = '', intent: str = DEFAULT_INTENT) -> None:
+        """设置之后 load_image 加载的图片的色彩管理方式
+
+        Args:
+            mode: '' 不处理（保存时不嵌入配置文件），'keep' 保留原配置文件，'srgb' 转换到 sRGB
+            intent: 转换到 sRGB 时的渲染意图，见 color_management.RENDERING_INTENTS
+        """
+        self._color_management = mode or ''
+        self._rendering_intent = intent
+
+    def get_icc_profile(self) -> Optional[bytes]:
+        """获取保存时嵌入的 ICC 配置文件"""
+        return self._icc_profile
+
+    def set_image(self, image: Image.Image, image_path: Optional[str] = None) -> bool:
+        """直接使用已解码的图片作为原图
+
+        图片不会被原地修改，可以与解码缓存共享；不做色彩管理，保存时不嵌入配置文件。
+
+        Args:
+            image: PIL 图片
+            image_path: 图片来源路径，用于文本变量 {filename} 等；为 None 时沿用当前图片的取值
+                （如多帧图片的各帧），为空字符串时清空
+
+        Returns:
+            bool: 是否成功设置
+        """
+        if image is None:
+            return False
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        self._original_image = image
+        self._icc_profile = None
+        self._image = None
+        if image_path is not None:
+            self._token_context = TokenContext(image_path, self._token_context.counter)
+        self._start_composite_tracking()
+        return True
+
+    def downscale_original(self, max_size: int) -> bool:
+        """将原图缩小到最长边不超过 max_size（不放大），之后的水印合成都基于缩小后的图片
+
+        多尺寸导出时从大到小依次调用，每一级都由上一级缩小得到，不必重新解码或从原尺寸缩小。
+
+        Args:
+            max_size: 最长边像素
+
+        Returns:
+            bool: 是否缩小了图片
+        """
+        if self._original_image is None:
+            return False
+        width, height = self._original_image.size
+        factor = max_size / max(width, height)
+        if factor >= 1:
+            return False
+        size = (max(1, round(width * factor)), max(1, round(height * factor)))
+        source = self._original_image
+        if not isinstance(source, Image.Image):
+            source = source.copy()  # 内存映射的原图先读入
+        # reducing_gap 先用整数倍 reduce 快速缩小，再做 LANCZOS 重采样；
+        # 取 2.0 时缩小 2 倍以上就会先 reduce，画质与直接 LANCZOS 几乎没有差别
+        icc_profile = self._icc_profile
+        resized = self.set_image(source.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0))
+        self._icc_profile = icc_profile  # 缩小不改变色彩空间
+        return resized
+
+    @classmethod
+    def scale_watermark_settings(cls, settings: Dict[str, Any], factor: float) -> Dict[str, Any]:
+        """按比例缩放水印设置中的绝对尺寸（字号、图片缩放、平铺间距）
+
+        相对大小的图层本来就随图片宽度变化，不做处理。
+
+        Args:
+            settings: 水印设置字典（可包含已固定的 layers）
+            factor: 缩放比例
+
+        Returns:
+            Dict[str, Any]: 缩放后的设置副本
+        """
+        def scale_layer(layer: Dict[str, Any]) -> Dict[str, Any]:
+            scaled = dict(layer)
+            if layer.get('relative_size'):
+                return scaled
+            if layer.get('text'):
+                font_size = layer.get('font_size', cls.DEFAULT_WATERMARK_SETTINGS['font_size'])
+                scaled['font_size'] = max(1, round(font_size * factor))
+            scaled['scale'] = layer.get('scale', 1.0) * factor
+            if 'tile_spacing' in layer:
+                scaled['tile_spacing'] = max(0, round(layer['tile_spacing'] * factor))
+            return scaled
+
+        scaled = scale_layer(settings)
+        if settings.get('layers'):
+            scaled['layers'] = [scale_layer(layer) for layer in settings['layers']]
+        return scaled
+
     @staticmethod
     def is_supported_format(file_path: str) -> bool:
         """检查文件是否为支持的格式
@@ -77,14 +238,69 @@ class ImageProcessor:
         Returns:
             Tuple[int, int]: (宽, 高)
         """
-        if self._image:
+        if self._image is not None:
             return self._image.size
+        if self._original_image is not None:
+            return self._original_image.size
         return (0, 0)
             
+    def has_image(self) -> bool:
+        """是否已加载图片"""
+        return self._original_image is not None
+
+    def get_image(self) -> Optional[Image.Image]:
+        """获取当前结果图（已合成水印），未加载图片时返回 None
+
+        结果图会在下次合成时原地更新，需要保留时请先复制。
+        第一次调用时才读取整张原图，之后的合成在这张结果图上原地更新。
+        """
+        if self._image is None and self._original_image is not None:
+            self._image = self._composited_image = self._render_full_image()
+            self._patch = None
+        return self._image
+
+    def _render_full_image(self) -> Image.Image:
+        """读取整张原图并贴上已合成的水印区域"""
+        image = self._original_image.copy()
+        if self._patch is not None:
+            image.paste(*self._patch)
+        return image
+
+    def get_original_image(self) -> Optional[Image.Image]:
+        """获取未加水印的原图，未加载图片时返回 None"""
+        return self._original_image
+
+    def get_watermark_layer(self) -> Optional[Image.Image]:
+        """获取最近一次渲染的水印图层（RGBA），没有水印时返回 None"""
+        return self._current_watermark_layer
+
+    def get_last_error(self) -> Optional[str]:
+        """获取最近一次操作失败的错误信息"""
+        return self._last_error
+
     def get_watermark_bounding_box(self) -> Optional[Tuple[int, int, int, int]]:
         """获取当前水印的边界框 (x, y, width, height)"""
         return self._watermark_bbox
 
+    def get_last_update_bbox(self) -> Optional[Tuple[int, int, int, int]]:
+        """获取最近一次合成（或移除水印）实际改动的区域
+
+        水印只改变位置、不透明度、颜色等时，结果图会原地更新：只把旧水印区域恢复为原图，
+        再在新水印区域内混合，改动区域为新旧边界框的并集。
+
+        Returns:
+            Optional[Tuple[int, int, int, int]]: (x, y, width, height)，无法确定时返回 None
+        """
+        return self._update_bbox
+
+    def invalidate_composite(self) -> None:
+        """放弃原地更新，下次合成从原图的完整副本开始"""
+        self._composited_image = None
+
+    def get_composite_bounding_box(self) -> Optional[Tuple[int, int, int, int]]:
+        """获取所有水印图层边界框的并集 (x, y, width, height)"""
+        return self._composite_bbox
+
     def set_watermark_text(self, text: str) -> None:
         """设置水印文本
         
@@ -142,6 +358,17 @@ class ImageProcessor:
             scale: 缩放比例 (e.g., 1.0 for 100%)
         """
         self._watermark_settings['scale'] = scale
+
+    def set_watermark_relative_size(self, relative_size: Optional[float]) -> None:
+        """设置水印相对图片宽度的大小
+
+        水印宽度为图片宽度乘以该比例：文本水印按文字的实际宽度反求字号，图片水印按原始宽度求缩放比例；
+        字号和宽度都量化到固定的几何档位（相邻档位相差约 19%），同一档位只渲染一次。
+
+        Args:
+            relative_size: 比例 (e.g., 0.05 表示图片宽度的 5%)，None 表示使用绝对大小
+        """
+        self._watermark_settings['relative_size'] = relative_size if relative_size else None
         
     def add_text_watermark(self) -> bool:
         """添加文本水印
@@ -149,95 +376,12 @@ class ImageProcessor:
         Returns:
             bool: 是否成功添加水印
         """
-        if self._image is None or not self._watermark_settings['text']:
-            self._watermark_bbox = None
-            self._current_watermark_layer = None
-            if self._original_image:
-                self._image = self._original_image.copy()
+        if self._original_image is None or not self._watermark_settings['text']:
+            self._reset_to_original()
             return False
-            
-        try:
-            # 恢复原始图片
-            self._image = self._original_image.copy()
-            
-            # 创建水印图层
-            watermark = Image.new('RGBA', self._image.size, (255, 255, 255, 0))
-            draw = ImageDraw.Draw(watermark)
-            
-            # 设置字体
-            try:
-                font = ImageFont.truetype(
-                    self._watermark_settings['font_name'],
-                    self._watermark_settings['font_size']
-                ) if self._watermark_settings['font_name'] else ImageFont.load_default(size=self._watermark_settings['font_size'])
-            except Exception:
-                font = ImageFont.load_default(size=self._watermark_settings['font_size'])
-            
-            # 获取文本大小
-            text_bbox = draw.textbbox(
-                (0, 0),
-                self._watermark_settings['text'],
-                font=font,
-                anchor='lt'
-            )
-            text_width = text_bbox[2] - text_bbox[0]
-            text_height = text_bbox[3] - text_bbox[1]
-            
-            # 创建一个单独的文本图层以便旋转
-            text_layer = Image.new('RGBA', (text_width + 20, text_height + 20), (255, 255, 255, 0))
-            text_draw = ImageDraw.Draw(text_layer)
-            
-            # 绘制文本
-            text_draw.text(
-                (10, 10),
-                self._watermark_settings['text'],
-                font=font,
-                fill=(*self._watermark_settings['color'], self._watermark_settings['opacity']),
-                anchor='lt'
-            )
-            
-            # 旋转文本
-            if self._watermark_settings['rotation']:
-                text_layer = text_layer.rotate(
-                    self._watermark_settings['rotation'],
-                    expand=True,
-                    fillcolor=(255, 255, 255, 0)
-                )
-
-            self._current_watermark_layer = text_layer
-            
-            # 计算像素位置
-            img_width, img_height = self.get_image_size()
-            wm_width, wm_height = text_layer.size
-            rel_x, rel_y = self._watermark_settings['position']
-            
-            pixel_x = int(rel_x * (img_width - wm_width))
-            pixel_y = int(rel_y * (img_height - wm_height))
-            
-            pixel_x = max(0, min(pixel_x, img_width - wm_width))
-            pixel_y = max(0, min(pixel_y, img_height - wm_height))
-
-            self._watermark_bbox = (pixel_x, pixel_y, wm_width, wm_height)
 
-            # 粘贴到水印图层
-            watermark.paste(
-                text_layer,
-                (pixel_x, pixel_y),
-                text_layer
-            )
-            
-            # 合并水印层
-            if self._image.mode != 'RGBA':
-                self._image = self._image.convert('RGBA')
-            
-            self._image = Image.alpha_composite(self._image, watermark)
-            return True
-            
-        except Exception as e:
-            print(f"Error adding text watermark: {e}")
-            self._watermark_bbox = None
-            self._current_watermark_layer = None
-            return False
+        layer = dict(self._watermark_settings, type='text')
+        return self._composite_layers([layer], 'text watermark')
     
     def add_image_watermark(self, image_path: str) -> bool:
         """添加图片水印
@@ -248,81 +392,635 @@ class ImageProcessor:
         Returns:
             bool: 是否成功添加水印
         """
-        if self._image is None or not image_path:
-            self._watermark_bbox = None
-            self._current_watermark_layer = None
-            if self._original_image:
-                self._image = self._original_image.copy()
+        if self._original_image is None or not image_path:
+            self._reset_to_original()
             return False
-            
-        try:
-            # 恢复原始图片
-            self._image = self._original_image.copy()
 
-            # 加载水印图片
-            watermark_img = Image.open(image_path)
-            
-            # 确保水印图片是RGBA模式
-            if watermark_img.mode != 'RGBA':
-                watermark_img = watermark_img.convert('RGBA')
-            
-            # 调整水印图片大小
-            if self._watermark_settings['scale'] != 1.0:
-                new_size = tuple(int(dim * self._watermark_settings['scale']) for dim in watermark_img.size)
-                watermark_img = watermark_img.resize(new_size, Image.Resampling.LANCZOS)
-            
-            # 旋转水印
-            if self._watermark_settings['rotation']:
-                watermark_img = watermark_img.rotate(
-                    self._watermark_settings['rotation'],
-                    expand=True,
-                    fillcolor=(255, 255, 255, 0)
-                )
-            
-            # 调整不透明度
-            if self._watermark_settings['opacity'] != 255:
-                alpha = watermark_img.getchannel('A')
-                alpha = ImageEnhance.Brightness(alpha).enhance(self._watermark_settings['opacity'] / 255.0)
-                watermark_img.putalpha(alpha)
+        layer = dict(self._watermark_settings, type='image', image_path=image_path)
+        return self._composite_layers([layer], 'image watermark')
 
-            self._current_watermark_layer = watermark_img
+    def set_layers(self, layers: List[Dict[str, Any]]) -> None:
+        """设置水印图层栈
 
-            # 计算像素位置
-            img_width, img_height = self.get_image_size()
-            wm_width, wm_height = watermark_img.size
-            rel_x, rel_y = self._watermark_settings['position']
+        Args:
+            layers: 按从下到上顺序排列的图层设置列表，
+                每个图层包含 'type' ('text' 或 'image') 及对应的水印设置，
+                缺失的键取自 DEFAULT_WATERMARK_SETTINGS；'tile' 为 True 时该图层按
+                'tile_spacing' 的间距平铺整张图片
+        """
+        self._layers = [self._normalize_layer(layer) for layer in layers]
 
-            pixel_x = int(rel_x * (img_width - wm_width))
-            pixel_y = int(rel_y * (img_height - wm_height))
+    def get_layers(self) -> List[Dict[str, Any]]:
+        """获取水印图层栈的副本"""
+        return [dict(layer) for layer in self._layers]
 
-            pixel_x = max(0, min(pixel_x, img_width - wm_width))
-            pixel_y = max(0, min(pixel_y, img_height - wm_height))
+    def add_layer(self, layer: Dict[str, Any]) -> int:
+        """在图层栈顶部添加一个图层
 
-            self._watermark_bbox = (pixel_x, pixel_y, wm_width, wm_height)
-            
-            # 创建一个新的RGBA图层
-            watermark_layer = Image.new('RGBA', self._image.size, (255, 255, 255, 0))
-            
-            # 粘贴水印图片
-            watermark_layer.paste(
-                watermark_img,
-                (pixel_x, pixel_y),
-                watermark_img
-            )
-            
-            # 合并水印层
-            if self._image.mode != 'RGBA':
-                self._image = self._image.convert('RGBA')
-            
-            self._image = Image.alpha_composite(self._image, watermark_layer)
+        Args:
+            layer: 图层设置
+
+        Returns:
+            int: 新图层的索引
+        """
+        self._layers.append(self._normalize_layer(layer))
+        return len(self._layers) - 1
+
+    def remove_layer(self, index: int) -> bool:
+        """删除指定索引的图层"""
+        if 0 <= index < len(self._layers):
+            del self._layers[index]
             return True
-            
+        return False
+
+    def clear_layers(self) -> None:
+        """清空水印图层栈"""
+        self._layers = []
+
+    def apply_layers(self) -> bool:
+        """将整个图层栈一次性合成到原始图片上
+
+        Returns:
+            bool: 是否成功合成至少一个图层
+        """
+        if self._original_image is None or not self._layers:
+            self._reset_to_original()
+            return False
+        return self._composite_layers(self._layers, 'watermark layers')
+
+    def apply_settings(self, settings: Dict[str, Any]) -> bool:
+        """根据编辑器的设置字典构建图层栈并合成
+
+        Args:
+            settings: 水印设置字典（与 WatermarkEditor.get_settings 格式一致）
+
+        Returns:
+            bool: 是否成功添加水印
+        """
+        self.set_watermark_position(settings.get('position', (0, 0)))
+        self.set_watermark_opacity(settings.get('opacity', 255))
+        self.set_watermark_rotation(settings.get('rotation', 0))
+        self.set_watermark_scale(settings.get('scale', 1.0))
+        if settings.get('text'):
+            self.set_watermark_text(settings['text'])
+            if settings.get('font_name'):
+                self.set_watermark_font(settings['font_name'], settings.get('font_size', 36))
+            self.set_watermark_color(settings.get('color', (0, 0, 0)))
+        self.set_watermark_relative_size(settings.get('relative_size'))
+
+        self.set_layers(self.layers_from_settings(settings))
+        return self.apply_layers()
+
+    @staticmethod
+    def layers_from_settings(settings: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """将编辑器设置转换为图层栈
+
+        已固定的图层 (settings['layers']) 在下，当前编辑的水印在最上层。
+
+        Args:
+            settings: 水印设置字典
+
+        Returns:
+            List[Dict[str, Any]]: 图层列表
+        """
+        layers = [dict(layer) for layer in settings.get('layers') or []]
+        current = {k: v for k, v in settings.items() if k != 'layers'}
+        if settings.get('text'):
+            layers.append(dict(current, type='text'))
+        elif settings.get('image_path'):
+            layers.append(dict(current, type='image'))
+        return layers
+
+    def render_static_artifacts(self, settings: Dict[str, Any],
+                                pattern_size: Optional[Tuple[int, int]] = None
+                                ) -> Dict[tuple, Image.Image]:
+        """预先渲染与具体图片无关的图层，供批处理分发给工作进程
+
+        相对大小、自动颜色和带变量的图层依赖每张图片，不在此渲染。
+
+        Args:
+            settings: 水印设置字典
+            pattern_size: 平铺图案的尺寸，为 None 时不生成平铺图案
+
+        Returns:
+            Dict[tuple, Image.Image]: 键为 set_shared_layers 使用的键
+        """
+        artifacts = {}
+        for layer in self.layers_from_settings(settings):
+            layer = self._normalize_layer(layer)
+            if layer.get('relative_size') or layer.get('auto_color') or self._is_dynamic(layer):
+                continue
+            key = self._layer_cache_key(layer)
+            rendered = self._render_layer(layer)
+            if rendered is None:
+                continue
+            artifacts[key] = rendered
+            if layer.get('tile') and pattern_size:
+                spacing = int(layer['tile_spacing'])
+                artifacts[('tile', key, spacing)] = self._get_tile_pattern(
+                    layer, rendered, pattern_size)
+        return artifacts
+
+    def set_shared_layers(self, layers: Dict[tuple, Image.Image]) -> None:
+        """设置预先渲染好的图层（通常是共享内存中的只读视图）
+
+        Args:
+            layers: render_static_artifacts 返回的键到图片的映射
+        """
+        self._shared_layers = dict(layers)
+
+    def _normalize_layer(self, layer: Dict[str, Any]) -> Dict[str, Any]:
+        """用默认水印设置补全图层中缺失的键"""
+        normalized = dict(self.DEFAULT_WATERMARK_SETTINGS)
+        normalized.update(layer)
+        normalized.setdefault('type', 'image' if layer.get('image_path') else 'text')
+        return normalized
+
+    def _reset_to_original(self) -> None:
+        """丢弃当前水印，恢复原始图片"""
+        self._watermark_bbox = None
+        self._current_watermark_layer = None
+        if self._original_image is not None and self._image is None:
+            # 还没有整张结果图，丢弃合成区域即可
+            self._update_bbox = self._composite_bbox if self._patch is not None else None
+            self._patch = None
+            self._composite_bbox = None
+        elif self._original_image is not None:
+            self._image, self._update_bbox = self._restore_for_update()
+            self._composited_image = self._image
+            self._composite_bbox = None
+
+    def _start_composite_tracking(self) -> None:
+        """新图片载入后还没有结果图，合成时只生成水印区域"""
+        self._composited_image = None
+        self._patch = None
+        self._composite_bbox = None
+        self._update_bbox = None
+
+    def _restore_for_update(self) -> Tuple[Image.Image, Tuple[int, int, int, int]]:
+        """获取用于本次合成的结果图，并把上次合成的区域恢复为原图
+
+        上次的结果图仍可原地更新时只恢复旧的合成区域；否则返回原图的完整副本。
+
+        Returns:
+            Tuple[Image.Image, Tuple[int, int, int, int]]: (结果图, 已改动的区域)
+        """
+        base = self._original_image
+        image = self._image
+        if (image is not None and image is self._composited_image and image is not base
+                and image.size == base.size and image.mode == base.mode):
+            old = self._composite_bbox
+            if old:
+                box = (old[0], old[1], old[0] + old[2], old[1] + old[3])
+                image.paste(base.crop(box), box[:2])
+                return image, old
+            return image, (0, 0, 0, 0)
+        return base.copy(), (0, 0) + base.size
+
+    @staticmethod
+    def _union_bbox(a: Tuple[int, int, int, int],
+                    b: Optional[Tuple[int, int, int, int]]) -> Tuple[int, int, int, int]:
+        """合并两个 (x, y, width, height) 边界框，空框不参与合并"""
+        if not b or b[2] <= 0 or b[3] <= 0:
+            return a
+        if a[2] <= 0 or a[3] <= 0:
+            return b
+        left = min(a[0], b[0])
+        top = min(a[1], b[1])
+        right = max(a[0] + a[2], b[0] + b[2])
+        bottom = max(a[1] + a[3], b[1] + b[3])
+        return (left, top, right - left, bottom - top)
+
+    def _build_overlay(self, layers: List[Dict[str, Any]]
+                       ) -> Optional[Tuple[Image.Image, int, int, list]]:
+        """渲染各图层并叠加到所有图层边界框并集大小的透明画布上
+
+        Args:
+            layers: 图层设置列表（从下到上）
+
+        Returns:
+            Optional[Tuple]: (画布, 并集左上角 x, y, [(图层, x, y), ...])，没有可见图层时返回 None
+        """
+        img_width, img_height = self._original_image.size
+        placements = []
+        for layer in layers:
+            layer = self._resolve_relative_size(layer, img_width)
+            rendered = self._render_layer(layer)
+            if rendered is None:
+                continue
+            if layer.get('auto_color') and layer['type'] == 'text':
+                layer = self._apply_auto_color(layer, rendered.size)
+                rendered = self._render_layer(layer)
+            if layer.get('tile'):
+                rendered = self._get_tile_pattern(layer, rendered, (img_width, img_height))
+                pixel_x, pixel_y = 0, 0
+            else:
+                pixel_x, pixel_y = self._compute_pixel_position(layer, rendered.size)
+            placements.append((rendered, pixel_x, pixel_y))
+
+        if not placements:
+            return None
+
+        # 所有图层边界框的并集
+        left = max(0, min(x for _, x, _ in placements))
+        top = max(0, min(y for _, _, y in placements))
+        right = min(img_width, max(x + im.size[0] for im, x, _ in placements))
+        bottom = min(img_height, max(y + im.size[1] for im, _, y in placements))
+
+        # 在并集大小的画布上按顺序叠加各图层
+        canvas = Image.new('RGBA', (right - left, bottom - top), (255, 255, 255, 0))
+        for rendered, x, y in placements:
+            # 只取图层落在画布内的部分（共享的平铺图案可能比图片大）
+            source = (left - x if x < left else 0, top - y if y < top else 0,
+                      min(rendered.size[0], right - x), min(rendered.size[1], bottom - y))
+            if source[2] > source[0] and source[3] > source[1]:
+                canvas.alpha_composite(rendered, (max(0, x - left), max(0, y - top)), source)
+        return canvas, left, top, placements
+
+    def render_overlay(self, settings: Dict[str, Any]
+                       ) -> Optional[Tuple[Image.Image, Tuple[int, int]]]:
+        """按当前原图的尺寸渲染水印叠加层，不修改图片
+
+        多帧图片的所有帧共用同一个叠加层，只需渲染一次。
+
+        Args:
+            settings: 水印设置字典
+
+        Returns:
+            Optional[Tuple[Image.Image, Tuple[int, int]]]: (RGBA 叠加层, 左上角坐标)，
+            没有可见水印或出错时返回 None
+        """
+        if self._original_image is None:
+            return None
+        try:
+            layers = [self._normalize_layer(layer) for layer in self.layers_from_settings(settings)]
+            overlay = self._build_overlay(layers)
         except Exception as e:
-            print(f"Error adding image watermark: {e}")
+            self._last_error = f"Error rendering watermark overlay: {e}"
+            return None
+        if overlay is None:
+            return None
+        canvas, left, top, _ = overlay
+        return canvas, (left, top)
+
+    def _composite_layers(self, layers: List[Dict[str, Any]], label: str) -> bool:
+        """渲染各图层并在所有图层边界框的并集上一次性合成
+
+        Args:
+            layers: 图层设置列表（从下到上）
+            label: 出错时用于日志的名称
+
+        Returns:
+            bool: 是否至少合成了一个图层
+        """
+        try:
+            img_width, img_height = self._original_image.size
+            overlay = self._build_overlay(layers)
+            if overlay is None:
+                self._reset_to_original()
+                return False
+            canvas, left, top, placements = overlay
+            right, bottom = left + canvas.size[0], top + canvas.size[1]
+
+            # 只在并集区域内与原图混合一次；结果图能原地更新时只恢复旧水印区域，不复制整张图
+            base = self._original_image
+            region = base.crop((left, top, right, bottom))
+            if region.mode != 'RGBA':
+                region = region.convert('RGBA')
+            region.alpha_composite(canvas)
+            if base.mode != 'RGBA':
+                region = region.convert(base.mode)
+            if self._image is None:
+                # 只保留合成后的区域，整张结果图等到需要时再生成（内存映射的原图只读入水印覆盖的行）
+                old = self._composite_bbox if self._patch is not None else None
+                restored = old or (0, 0, 0, 0)
+                self._patch = (region, (left, top))
+            else:
+                target, restored = self._restore_for_update()
+                target.paste(region, (left, top))
+                self._image = self._composited_image = target
+
+            # 最上层是当前编辑的水印，拖拽等交互以它为准
+            top_layer, top_x, top_y = placements[-1]
+            self._current_watermark_layer = top_layer
+            self._watermark_bbox = (top_x, top_y,
+                                    min(top_layer.size[0], img_width - top_x),
+                                    min(top_layer.size[1], img_height - top_y))
+            self._composite_bbox = (left, top, right - left, bottom - top)
+            self._update_bbox = self._union_bbox(restored, self._composite_bbox)
+            return True
+
+        except Exception as e:
+            self._last_error = f"Error adding {label}: {e}"
             self._watermark_bbox = None
             self._current_watermark_layer = None
+            # 结果图的状态不确定，下次从原图重新开始
+            self._composite_bbox = None
+            self._composited_image = None
+            self._patch = None
+            self._update_bbox = None
             return False
-            
+
+    def _apply_auto_color(self, layer: Dict[str, Any],
+                          layer_size: Tuple[int, int]) -> Dict[str, Any]:
+        """按水印下方原图区域的亮度统计选择文本颜色和描边
+
+        平铺图层覆盖整张图片，统计整张图片；描边不改变图层的位置计算，
+        因此可以用第一次渲染的尺寸确定区域。
+        """
+        if layer.get('tile'):
+            box = (0, 0) + tuple(self._original_image.size)
+        else:
+            x, y = self._compute_pixel_position(layer, layer_size)
+            box = (x, y, x + layer_size[0], y + layer_size[1])
+        color, outline = choose_color(region_stats(self._original_image, box), layer['color'])
+        return dict(layer, color=color, outline=outline)
+
+    def _compute_pixel_position(self, settings: Dict[str, Any],
+                                layer_size: Tuple[int, int]) -> Tuple[int, int]:
+        """根据相对位置计算图层左上角的像素坐标"""
+        img_width, img_height = self._original_image.size
+        wm_width, wm_height = layer_size
+        rel_x, rel_y = settings['position']
+
+        pixel_x = int(rel_x * (img_width - wm_width))
+        pixel_y = int(rel_y * (img_height - wm_height))
+
+        pixel_x = max(0, min(pixel_x, img_width - wm_width))
+        pixel_y = max(0, min(pixel_y, img_height - wm_height))
+        return pixel_x, pixel_y
+
+    @classmethod
+    def snap_to_bucket(cls, size: float) -> int:
+        """将渲染尺寸量化到最近的几何档位
+
+        档位为 MIN_BUCKET_SIZE * 2^(k / SIZE_BUCKETS_PER_OCTAVE)，相邻档位相差约 19%，
+        不同分辨率的图片因此只会落在少数几个档位上。
+
+        Args:
+            size: 期望的像素尺寸
+
+        Returns:
+            int: 档位尺寸
+        """
+        if size <= cls.MIN_BUCKET_SIZE:
+            return cls.MIN_BUCKET_SIZE
+        step = round(math.log2(size / cls.MIN_BUCKET_SIZE) * cls.SIZE_BUCKETS_PER_OCTAVE)
+        return int(round(cls.MIN_BUCKET_SIZE * 2 ** (step / cls.SIZE_BUCKETS_PER_OCTAVE)))
+
+    def _resolve_relative_size(self, layer: Dict[str, Any], image_width: int) -> Dict[str, Any]:
+        """将相对大小的图层换算为当前图片上的绝对字号或缩放比例
+
+        文字宽度与字号成正比，先在 RELATIVE_MEASURE_SIZE 字号下测量文字宽度，
+        再求出使文字宽度等于 relative_size * 图片宽度 的字号并量化到档位。
+        """
+        relative_size = layer.get('relative_size')
+        if not relative_size:
+            return layer
+
+        target_width = relative_size * image_width
+        resolved = dict(layer)
+        if layer['type'] == 'text':
+            width_per_size = self._measure_text_width(layer) / self.RELATIVE_MEASURE_SIZE
+            if width_per_size > 0:
+                resolved['font_size'] = self.snap_to_bucket(target_width / width_per_size)
+        elif layer.get('image_path'):
+            native_width = self._get_native_width(layer['image_path'])
+            if native_width:
+                resolved['scale'] = self.snap_to_bucket(target_width) / native_width
+        return resolved
+
+    def _measure_text_width(self, layer: Dict[str, Any]) -> float:
+        """文本图层在 RELATIVE_MEASURE_SIZE 字号下的文字宽度（变量按当前图片取值）"""
+        text = layer.get('text') or ''
+        if self._is_dynamic(layer):
+            segments = self._parse_text(text)
+            values = iter(self._token_context.resolve_all(segments))
+            text = ''.join(segment[1] if segment[0] == 'static' else next(values, '')
+                           for segment in segments)
+        return self._load_font(layer['font_name'], self.RELATIVE_MEASURE_SIZE).getlength(text)
+
+    def _get_native_width(self, image_path: str) -> int:
+        """只读取文件头获取水印图片的原始宽度，结果按路径缓存"""
+        width = self._native_widths.get(image_path)
+        if width is None:
+            with Image.open(image_path) as img:
+                width = img.size[0]
+            self._native_widths[image_path] = width
+        return width
+
+    def _layer_cache_key(self, layer: Dict[str, Any]) -> Optional[tuple]:
+        """生成图层渲染结果的缓存键，图层为空时返回 None
+
+        带变量的文本图层的键包含变量在当前图片上的取值。
+        """
+        if layer['type'] == 'text':
+            if not layer.get('text'):
+                return None
+            segments = self._parse_text(layer['text'])
+            values = self._token_context.resolve_all(segments)
+            outline = layer.get('outline')
+            return ('text', layer['text'], values, layer['font_name'], layer['font_size'],
+                    tuple(layer['color']), layer['opacity'], layer['rotation'],
+                    tuple(outline) if outline else None)
+        path = layer.get('image_path')
+        if not path:
+            return None
+        return ('image', path, os.path.getmtime(path), layer['scale'],
+                layer['rotation'], layer['opacity'])
+
+    def _cache_get(self, key: tuple) -> Optional[Image.Image]:
+        """从图层缓存中取出结果"""
+        cached = self._layer_cache.get(key)
+        if cached is not None:
+            self._layer_cache.move_to_end(key)
+        return cached
+
+    def _cache_put(self, key: tuple, image: Image.Image) -> None:
+        """放入图层缓存，超出容量时淘汰最久未用的项"""
+        self._layer_cache[key] = image
+        while len(self._layer_cache) > self.LAYER_CACHE_SIZE:
+            self._layer_cache.popitem(last=False)
+
+    def _render_layer(self, layer: Dict[str, Any]) -> Optional[Image.Image]:
+        """渲染单个图层，结果按渲染参数缓存"""
+        key = self._layer_cache_key(layer)
+        if key is None:
+            return None
+        shared = self._shared_layers.get(key)
+        if shared is not None:
+            return shared
+        rendered = self._cache_get(key)
+        if rendered is None:
+            if layer['type'] == 'text' and self._is_dynamic(layer):
+                # 每张图片取值不同，只缓存固定片段的字形，不缓存整个图层
+                return self._render_token_text_layer(layer)
+            if layer['type'] == 'text':
+                rendered = self._render_text_layer(layer)
+            else:
+                rendered = self._render_image_layer(layer)
+            self._cache_put(key, rendered)
+        return rendered
+
+    def set_token_counter(self, counter: int) -> None:
+        """设置文本变量 {counter} 的取值（如批处理中的序号）"""
+        self._token_context = TokenContext(self._token_context.image_path, counter)
+
+    def _parse_text(self, text: str) -> List[Segment]:
+        """解析水印文本中的变量，结果按文本缓存，超出容量时淘汰最久未用的项"""
+        segments = self._parsed_texts.get(text)
+        if segments is None:
+            segments = parse_template(text)
+            self._parsed_texts[text] = segments
+            while len(self._parsed_texts) > self.PARSED_TEXT_CACHE_SIZE:
+                self._parsed_texts.popitem(last=False)
+        else:
+            self._parsed_texts.move_to_end(text)
+        return segments
+
+    def _is_dynamic(self, layer: Dict[str, Any]) -> bool:
+        """图层内容是否随图片变化（带变量的文本）"""
+        return layer['type'] == 'text' and any(
+            segment[0] == 'token' for segment in self._parse_text(layer.get('text') or '')
+        )
+
+    def _load_font(self, font_name: str, font_size: int) -> ImageFont.ImageFont:
+        """加载字体，结果按 (字体名, 字号) 缓存"""
+        key = (font_name, font_size)
+        font = self._fonts.get(key)
+        if font is None:
+            try:
+                font = ImageFont.truetype(font_name, font_size) \
+                    if font_name else ImageFont.load_default(size=font_size)
+            except Exception:
+                font = ImageFont.load_default(size=font_size)
+            self._fonts[key] = font
+        return font
+
+    def _pad_and_rotate(self, text_layer: Image.Image, rotation: float) -> Image.Image:
+        """给文本图层加上 10 像素边距并旋转"""
+        padded = Image.new('RGBA', (text_layer.size[0] + 20, text_layer.size[1] + 20),
+                           (255, 255, 255, 0))
+        padded.paste(text_layer, (10, 10))
+        if rotation:
+            padded = padded.rotate(rotation, expand=True, fillcolor=(255, 255, 255, 0))
+        return padded
+
+    @staticmethod
+    def _stroke(settings: Dict[str, Any]) -> Optional[Tuple[int, Tuple[int, ...]]]:
+        """文本描边参数 (宽度, RGBA 颜色)，不描边时返回 None"""
+        outline = settings.get('outline')
+        if not outline:
+            return None
+        return outline_width(settings['font_size']), (*outline[:3], settings['opacity'])
+
+    def _render_token_text_layer(self, settings: Dict[str, Any]) -> Image.Image:
+        """渲染带变量的文本图层：固定片段取自缓存，只渲染变量片段"""
+        segments = self._parse_text(settings['text'])
+        font = self._load_font(settings['font_name'], settings['font_size'])
+        text_layer = self._token_renderer.render(
+            segments,
+            self._token_context.resolve_all(segments),
+            font,
+            (*settings['color'], settings['opacity']),
+            (settings['font_name'], settings['font_size']),
+            self._stroke(settings)
+        )
+        return self._pad_and_rotate(text_layer, settings['rotation'])
+
+    def _render_text_layer(self, settings: Dict[str, Any]) -> Image.Image:
+        """渲染文本图层（已旋转）"""
+        # 设置字体
+        font = self._load_font(settings['font_name'], settings['font_size'])
+
+        # 获取文本大小
+        stroke_width, stroke_fill = self._stroke(settings) or (0, None)
+        measure = ImageDraw.Draw(Image.new('RGBA', (1, 1)))
+        text_bbox = measure.textbbox((0, 0), settings['text'], font=font, anchor='lt',
+                                     stroke_width=stroke_width)
+        text_width = text_bbox[2] - text_bbox[0]
+        text_height = text_bbox[3] - text_bbox[1]
+
+        # 创建一个单独的文本图层以便旋转
+        text_layer = Image.new('RGBA', (text_width + 20, text_height + 20), (255, 255, 255, 0))
+        text_draw = ImageDraw.Draw(text_layer)
+
+        # 绘制文本
+        text_draw.text(
+            (10 + stroke_width, 10 + stroke_width),
+            settings['text'],
+            font=font,
+            fill=(*settings['color'], settings['opacity']),
+            anchor='lt',
+            stroke_width=stroke_width,
+            stroke_fill=stroke_fill
+        )
+
+        # 旋转文本
+        if settings['rotation']:
+            text_layer = text_layer.rotate(
+                settings['rotation'],
+                expand=True,
+                fillcolor=(255, 255, 255, 0)
+            )
+        return text_layer
+
+    def _render_image_layer(self, settings: Dict[str, Any]) -> Image.Image:
+        """渲染图片图层（已缩放、旋转并调整不透明度）"""
+        # 加载水印图片
+        watermark_img = Image.open(settings['image_path'])
+
+        # 确保水印图片是RGBA模式
+        if watermark_img.mode != 'RGBA':
+            watermark_img = watermark_img.convert('RGBA')
+
+        # 调整水印图片大小
+        if settings['scale'] != 1.0:
+            new_size = tuple(max(1, int(dim * settings['scale'])) for dim in watermark_img.size)
+            watermark_img = watermark_img.resize(new_size, Image.Resampling.LANCZOS)
+
+        # 旋转水印
+        if settings['rotation']:
+            watermark_img = watermark_img.rotate(
+                settings['rotation'],
+                expand=True,
+                fillcolor=(255, 255, 255, 0)
+            )
+
+        # 调整不透明度
+        if settings['opacity'] != 255:
+            alpha = watermark_img.getchannel('A')
+            alpha = ImageEnhance.Brightness(alpha).enhance(settings['opacity'] / 255.0)
+            watermark_img.putalpha(alpha)
+        return watermark_img
+
+    def _get_tile_pattern(self, layer: Dict[str, Any], rendered: Image.Image,
+                          size: Tuple[int, int]) -> Image.Image:
+        """生成铺满整张图片的平铺水印图案，按图层和图片尺寸缓存"""
+        spacing = int(layer['tile_spacing'])
+        layer_key = self._layer_cache_key(layer)
+
+        # 平铺从 (0, 0) 开始，任何更大的同一图案都可以直接使用其左上角部分
+        shared = self._shared_layers.get(('tile', layer_key, spacing))
+        if shared is not None and shared.size[0] >= size[0] and shared.size[1] >= size[1]:
+            return shared
+
+        key = ('tile', layer_key, size, spacing)
+        dynamic = self._is_dynamic(layer)
+        pattern = None if dynamic else self._cache_get(key)
+        if pattern is not None:
+            return pattern
+
+        pattern = Image.new('RGBA', size, (255, 255, 255, 0))
+        step_x = max(1, rendered.size[0] + spacing)
+        step_y = max(1, rendered.size[1] + spacing)
+        for y in range(0, size[1], step_y):
+            for x in range(0, size[0], step_x):
+                pattern.paste(rendered, (x, y))
+        if not dynamic:
+            self._cache_put(key, pattern)
+        return pattern
+
     def resize_image(self, width: Optional[int] = None, height: Optional[int] = None,
                     scale: Optional[float] = None) -> bool:
         """调整图片大小
@@ -335,7 +1033,7 @@ class ImageProcessor:
         Returns:
             bool: 是否成功调整
         """
-        if self._image is None:
+        if self.get_image() is None:
             return False
             
         try:
@@ -356,46 +1054,75 @@ class ImageProcessor:
             return True
             
         except Exception as e:
-            print(f"Error resizing image: {e}")
+            self._last_error = f"Error resizing image: {e}"
             return False
             
-    def save_image(self, output_path: str, quality: int = 95, format: Optional[str] = None) -> bool:
+    def save_image(self, output_path: str, quality: int = 95, format: Optional[str] = None,
+                   profile: str = DEFAULT_PROFILE) -> bool:
         """保存图片
+
+        先写入同目录下的临时文件，落盘后再原子地重命名为目标文件，
+        因此中途崩溃不会留下不完整的输出文件。
         
         Args:
             output_path: 输出路径
             quality: 图片质量 (1-100)
-            format: 输出格式，如 'JPEG', 'PNG' 等
+            format: 输出格式，如 'JPEG', 'PNG', 'WEBP', 'AVIF' 等
+            profile: 编码档位 ('fast', 'balanced', 'smallest')
             
         Returns:
             bool: 是否成功保存
         """
-        if self._image is None:
+        if self._original_image is None:
             return False
-            
+
+        temp_path = None
         try:
             # 确定输出格式
             if not format:
-                format = os.path.splitext(output_path)[1][1:].upper()
-                if format in ('JPG', 'JPEG'):
-                    format = 'JPEG'
-                elif format == 'PNG':
-                    format = 'PNG'
-            
-            # 转换图片模式
-            if format == 'JPEG':
-                if self._image.mode == 'RGBA':
-                    # 创建白色背景
-                    background = Image.new('RGB', self._image.size, (255, 255, 255))
-                    background.paste(self._image, mask=self._image.getchannel('A'))
-                    background.save(output_path, format=format, quality=quality)
-                else:
-                    self._image.convert('RGB').save(output_path, format=format, quality=quality)
-            else:
-                self._image.save(output_path, format=format)
-            
+                format = os.path.splitext(output_path)[1]
+
+            # 临时文件名包含进程和线程号，多个导出线程之间不会冲突
+            temp_path = temp_path_for(output_path)
+            self.encode_image(temp_path, format, quality, profile)
+            # 先落盘再重命名，导出日志随后记录完成时文件一定完整
+            commit_temp_file(temp_path, output_path)
             return True
             
         except Exception as e:
-            print(f"Error saving image: {e}")
-            return False
\ No newline at end of file
+            self._last_error = f"Error saving image: {e}"
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+
+    def encode_image(self, fp, format: str, quality: int = 95,
+                     profile: str = DEFAULT_PROFILE) -> None:
+        """按编码档位将当前图片编码写入文件路径或文件对象
+
+        Args:
+            fp: 文件路径或可写的二进制文件对象
+            format: 输出格式
+            quality: 图片质量 (1-100)
+            profile: 编码档位
+
+        Raises:
+            Exception: 编码失败时抛出 Pillow 的异常
+        """
+        format = normalize_format(format)
+        # 还没有整张结果图时只为编码临时生成，不常驻内存
+        image = self._image if self._image is not None else self._render_full_image()
+
+        # 转换图片模式
+        if format == 'JPEG':
+            if image.mode == 'RGBA':
+                # 创建白色背景
+                background = Image.new('RGB', image.size, (255, 255, 255))
+                background.paste(image, mask=image.getchannel('A'))
+                image = background
+            elif image.mode != 'RGB':
+                image = image.convert('RGB')
+
+        options = get_encoder_options(format, profile, quality)
+        if self._icc_profile:
+            options['icc_profile'] = self._icc_profile
+        image.save(fp, format=format, **options)
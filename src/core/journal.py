@@ -0,0 +1,176 @@
+"""
+导出日志模块
+
+以只追加的 JSON Lines 文件记录批量导出中每个文件的完成/失败状态，
+进程或机器崩溃后可以据此从中断处继续导出。
+"""
+from typing import Any, Dict, Iterator, Optional, Set
+from datetime import datetime
+import hashlib
+import json
+import os
+import threading
+
+
+class ExportJournal:
+    """批量导出日志
+
+    文件第一条记录为 'start'，保存导出设置及其哈希；之后每处理完一个文件追加一条
+    'done' 或 'failed' 记录。输出文件总是先写好、落盘并原子地重命名后再记录日志，
+    因此日志中标记为完成的文件一定完整存在。每条记录写入后立即落盘（相比编码一张图片，
+    一次 fsync 的开销很小），record 返回后即使断电，继续导出也不会重新导出该文件。
+    """
+    FILENAME = '.watermark_export_journal.jsonl'
+
+    def __init__(self, journal_path: str):
+        self.journal_path = journal_path
+        self._lock = threading.Lock()
+        self._file = None
+
+    @classmethod
+    def for_output_dir(cls, output_dir: str) -> 'ExportJournal':
+        """获取输出目录对应的日志"""
+        return cls(os.path.join(output_dir, cls.FILENAME))
+
+    @staticmethod
+    def settings_hash(settings: Dict[str, Any]) -> str:
+        """计算导出设置的哈希
+
+        Args:
+            settings: 可 JSON 序列化的导出设置字典
+
+        Returns:
+            str: 十六进制哈希值
+        """
+        payload = json.dumps(settings, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def exists(self) -> bool:
+        """日志文件是否存在"""
+        return os.path.exists(self.journal_path)
+
+    def start(self, settings: Dict[str, Any]) -> str:
+        """开始一次新的导出，清空旧日志并写入 'start' 记录
+
+        Args:
+            settings: 可 JSON 序列化的导出设置字典
+
+        Returns:
+            str: 设置哈希
+        """
+        self.close()
+        digest = self.settings_hash(settings)
+        with open(self.journal_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({
+                'type': 'start',
+                'settings_hash': digest,
+                'settings': settings,
+                'time': datetime.now().isoformat(),
+            }, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        return digest
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        """逐条读取日志记录，忽略崩溃时写了一半的最后一行
+
+        按字节读取，截断处落在多字节字符中间时也只丢弃这一行。
+        """
+        if not self.exists():
+            return
+        with open(self.journal_path, 'rb') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:  # JSONDecodeError 或 UnicodeDecodeError
+                    continue
+                if isinstance(record, dict):
+                    yield record
+
+    def get_start_record(self) -> Optional[Dict[str, Any]]:
+        """获取 'start' 记录，日志不存在或为空时返回 None"""
+        for record in self.records():
+            if record.get('type') == 'start':
+                return record
+        return None
+
+    def completed_inputs(self, settings_hash: str) -> Set[str]:
+        """获取在相同设置下已经成功导出的输入路径
+
+        Args:
+            settings_hash: 设置哈希
+
+        Returns:
+            Set[str]: 输入路径集合
+        """
+        done = set()
+        for record in self.records():
+            if record.get('type') == 'done' and record.get('settings_hash') == settings_hash:
+                done.add(record['input'])
+        return done
+
+    def record(self, settings_hash: str, input_path: str, output_path: str,
+               error: Optional[str] = None) -> None:
+        """追加一条完成或失败记录（线程安全）
+
+        Args:
+            settings_hash: 设置哈希
+            input_path: 输入路径
+            output_path: 输出路径
+            error: 错误信息，为 None 表示成功
+        """
+        entry = {
+            'type': 'done' if error is None else 'failed',
+            'settings_hash': settings_hash,
+            'input': input_path,
+            'output': output_path,
+        }
+        if error is not None:
+            entry['error'] = error
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+
+        with self._lock:
+            if self._file is None:
+                self._truncate_partial_line()
+                self._file = open(self.journal_path, 'a', encoding='utf-8')
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def _truncate_partial_line(self) -> None:
+        """截掉崩溃时写了一半的最后一行，否则下一条记录会接在它后面一起被丢弃
+
+        只缺换行符的完整记录会被 records 读到，因此补上换行符而不是截掉。
+        """
+        if not self.exists():
+            return
+        with open(self.journal_path, 'rb+') as f:
+            end = f.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                start = max(0, position - 4096)
+                f.seek(start)
+                chunk = f.read(position - start)
+                newline = chunk.rfind(b'\n')
+                if newline >= 0:
+                    position = start + newline + 1
+                    break
+                position = start
+            if position < end:
+                f.seek(position)
+                try:
+                    json.loads(f.read(end - position))
+                except ValueError:
+                    f.truncate(position)
+                else:
+                    f.write(b'\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+    def close(self) -> None:
+        """落盘并关闭日志文件"""
+        with self._lock:
+            if self._file is not None:
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
@@ -0,0 +1,209 @@
+"""
+内存映射输入模块
+
+未压缩的 BMP/TIFF 像素在文件中按行连续存放，可以直接内存映射为只读的 NumPy 视图，
+不必先解码到 Pillow 缓冲区再复制一份原图。合成水印时只裁剪水印覆盖的区域，
+操作系统只会读入这些行所在的页面；大扫描件的加载时间和常驻内存都明显下降。
+"""
+from typing import Optional, Tuple
+from PIL import Image
+import numpy as np
+import os
+
+MAPPABLE_EXTENSIONS = ('.bmp', '.tif', '.tiff')
+
+# 原始像素格式 -> (每像素字节数, 取出 RGB(A) 通道的顺序, 输出模式)
+_RAW_LAYOUTS = {
+    'RGB': (3, (0, 1, 2), 'RGB'),
+    'BGR': (3, (2, 1, 0), 'RGB'),
+    'RGBX': (4, (0, 1, 2), 'RGB'),
+    'BGRX': (4, (2, 1, 0), 'RGB'),
+    'RGBA': (4, (0, 1, 2, 3), 'RGBA'),
+    'BGRA': (4, (2, 1, 0, 3), 'RGBA'),
+}
+
+
+class MappedImage:
+    """只读的内存映射图片
+
+    提供 ImageProcessor 处理原图所需的接口（size、mode、crop、copy），
+    crop 只读取所需的行，copy 才会读取整张图片。
+    """
+    COPY_BAND_BYTES = 16 * 1024 * 1024  # copy 时每次复制的行带大小
+
+    def __init__(self, pixels, mode: str, path: str):
+        """
+        Args:
+            pixels: 形状为 (高, 宽, 通道) 的 NumPy 视图，通道已按 RGB(A) 顺序排列
+            mode: 'RGB' 或 'RGBA'
+            path: 源文件路径
+        """
+        self._pixels = pixels
+        self.mode = mode
+        self.path = path
+        self.size = (pixels.shape[1], pixels.shape[0])
+
+    @property
+    def width(self) -> int:
+        return self.size[0]
+
+    @property
+    def height(self) -> int:
+        return self.size[1]
+
+    def crop(self, box: Tuple[int, int, int, int]) -> Image.Image:
+        """裁剪区域并复制为 Pillow 图片，只访问该区域所在的行
+
+        Args:
+            box: (left, top, right, bottom)
+
+        Returns:
+            Image.Image: 区域图片
+        """
+        left, top, right, bottom = (int(v) for v in box)
+        left, right = max(0, left), min(self.size[0], right)
+        top, bottom = max(0, top), min(self.size[1], bottom)
+        if right <= left or bottom <= top:
+            return Image.new(self.mode, (max(0, right - left), max(0, bottom - top)))
+        region = np.ascontiguousarray(self._pixels[top:bottom, left:right])
+        return Image.frombuffer(self.mode, (right - left, bottom - top), region,
+                                'raw', self.mode, 0, 1)
+
+    def sample(self, box: Tuple[int, int, int, int], step: int):
+        """按步长取样区域内的像素（用于统计），返回 (行, 列, 通道) 的 NumPy 数组
+
+        Args:
+            box: (left, top, right, bottom)，调用方保证在图片范围内
+            step: 取样间隔（像素）
+        """
+        left, top, right, bottom = (int(v) for v in box)
+        return np.asarray(self._pixels[top:bottom:step, left:right:step])
+
+    def copy(self) -> Image.Image:
+        """读取整张图片为可修改的 Pillow 图片
+
+        按行带分段复制，临时缓冲只有一个行带大小，峰值内存约等于结果图本身。
+        """
+        width, height = self.size
+        image = Image.new(self.mode, self.size)
+        band = max(1, self.COPY_BAND_BYTES // max(1, width * len(self.mode)))
+        for top in range(0, height, band):
+            bottom = min(height, top + band)
+            image.paste(self.crop((0, top, width, bottom)), (0, top))
+        return image
+
+    def convert(self, mode: str) -> Image.Image:
+        """转换为指定模式的 Pillow 图片"""
+        image = self.copy()
+        return image if mode == self.mode else image.convert(mode)
+
+    def close(self) -> None:
+        """释放映射（之后不能再使用该图片）"""
+        self._pixels = None
+
+
+def _raw_layout(image: Image.Image) -> Optional[Tuple[int, str, int, int, int]]:
+    """检查图片是否为单块连续存放的未压缩像素
+
+    Returns:
+        Optional[Tuple]: (数据偏移, 原始像素格式, 行跨度, 方向, 每像素字节数)，不支持时返回 None
+    """
+    tiles = sorted(image.tile, key=lambda tile: tile[1][1])
+    if not tiles:
+        return None
+    width, height = image.size
+    codec, _, offset, args = tiles[0][:4]
+    if codec != 'raw' or not isinstance(args, tuple) or not args or args[0] not in _RAW_LAYOUTS:
+        return None
+    rawmode = args[0]
+    stride = args[1] if len(args) > 1 and args[1] else 0
+    orientation = args[2] if len(args) > 2 else 1
+    pixel_bytes = _RAW_LAYOUTS[rawmode][0]
+    stride = stride or width * pixel_bytes
+
+    # TIFF 可能分成多个条带，只要各条带首尾相接就等价于一整块
+    expected_offset, expected_top = offset, 0
+    for tile in tiles:
+        tile_codec, extents, tile_offset, tile_args = tile[:4]
+        if (tile_codec != 'raw' or tile_args != args or tile_offset != expected_offset
+                or extents[0] != 0 or extents[2] != width or extents[1] != expected_top):
+            return None
+        expected_top = extents[3]
+        expected_offset = tile_offset + (extents[3] - extents[1]) * stride
+    if expected_top != height:
+        return None
+    return offset, rawmode, stride, orientation, pixel_bytes
+
+
+def _probe(image_path: str) -> Optional[Tuple[Tuple[int, int], Tuple[int, str, int, int, int]]]:
+    """读取文件头，返回可映射图片的 (尺寸, 像素布局)，不可映射时返回 None"""
+    if os.path.splitext(image_path)[1].lower() not in MAPPABLE_EXTENSIONS:
+        return None
+    try:
+        with Image.open(image_path) as image:
+            if getattr(image, 'n_frames', 1) != 1:
+                return None
+            layout = _raw_layout(image)
+            size = image.size
+        if layout is None:
+            return None
+        offset, _, stride, _, _ = layout
+        if offset + stride * size[1] > os.path.getsize(image_path):
+            return None
+        return size, layout
+    except Exception:
+        return None
+
+
+def is_mappable(image_path: str) -> bool:
+    """图片是否可以内存映射（只读取文件头）"""
+    return _probe(image_path) is not None
+
+
+def open_mapped(image_path: str) -> Optional[MappedImage]:
+    """尝试内存映射未压缩的 BMP/TIFF 图片
+
+    Args:
+        image_path: 图片路径
+
+    Returns:
+        Optional[MappedImage]: 映射后的图片；文件有压缩或像素格式不支持时返回 None
+    """
+    probed = _probe(image_path)
+    if probed is None:
+        return None
+    (width, height), (offset, rawmode, stride, orientation, pixel_bytes) = probed
+    try:
+        rows = np.memmap(image_path, dtype=np.uint8, mode='r',
+                         offset=offset, shape=(height, stride))
+    except (OSError, ValueError):
+        return None
+    pixels = rows[:, :width * pixel_bytes].reshape(height, width, pixel_bytes)
+    if orientation < 0:
+        pixels = pixels[::-1]  # BMP 默认自下而上存放
+    _, channels, mode = _RAW_LAYOUTS[rawmode]
+    if channels != tuple(range(pixel_bytes)):
+        pixels = _select_channels(pixels, channels)
+    return MappedImage(pixels, mode, image_path)
+
+
+def _select_channels(pixels, channels: Tuple[int, ...]):
+    """按顺序取出通道，尽量保持为视图（不复制数据）"""
+    if channels == (2, 1, 0):
+        return pixels[:, :, 2::-1]
+    if channels == (0, 1, 2):
+        return pixels[:, :, :3]
+    # BGRA -> RGBA 无法用单个切片表示，裁剪时再按索引重排
+    return _ChannelOrder(pixels, channels)
+
+
+class _ChannelOrder:
+    """按索引重排通道的惰性视图，只在切片时复制所取的区域"""
+
+    def __init__(self, pixels, channels: Tuple[int, ...]):
+        self._pixels = pixels
+        self._channels = list(channels)
+        self.shape = pixels.shape[:2] + (len(channels),)
+
+    def __getitem__(self, key):
+        return self._pixels[key][:, :, self._channels]
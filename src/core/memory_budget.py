@@ -0,0 +1,136 @@
+"""
+内存预算模块
+
+根据图片文件头估算每个导出任务的峰值内存，并按总预算控制同时运行的任务。
+"""
+from typing import Optional, Tuple
+from PIL import Image
+import os
+import threading
+
+from .mapped_image import is_mappable
+
+# 各模式每像素字节数，未列出的模式按 4 字节估算
+_MODE_BYTES = {
+    '1': 1, 'L': 1, 'P': 1, 'LA': 2, 'PA': 2, 'I;16': 2,
+    'RGB': 3, 'YCbCr': 3, 'LAB': 3, 'HSV': 3,
+    'RGBA': 4, 'RGBX': 4, 'CMYK': 4, 'I': 4, 'F': 4,
+}
+
+
+def probe_image(image_path: str) -> Optional[Tuple[int, int, str]]:
+    """只读取文件头获取图片尺寸和模式，不解码像素
+
+    Args:
+        image_path: 图片路径
+
+    Returns:
+        Optional[Tuple[int, int, str]]: (宽, 高, 模式)，无法识别时返回 None
+    """
+    try:
+        with Image.open(image_path) as img:
+            return img.size[0], img.size[1], img.mode
+    except Exception:
+        return None
+
+
+def estimate_peak_memory(width: int, height: int, mode: str, mapped: bool = False) -> int:
+    """估算导出一张图片的峰值内存（字节）
+
+    对应 ImageProcessor 的流程：解码后的原图、保存的原图副本、
+    合成结果，以及 JPEG 导出时去除透明通道的 RGB 缓冲。
+
+    Args:
+        width: 图片宽度
+        height: 图片高度
+        mode: 图片模式
+        mapped: 原图是否为内存映射（不占用解码缓冲，也没有额外的原图副本）
+
+    Returns:
+        int: 估算的峰值内存
+    """
+    pixels = width * height
+    source_bytes = _MODE_BYTES.get(mode, 4)
+    working_bytes = source_bytes if mode in ('RGB', 'RGBA') else 4
+    if mapped:
+        return pixels * (working_bytes + 3)
+    return pixels * (source_bytes + 2 * working_bytes + 3)
+
+
+def default_memory_budget() -> Optional[int]:
+    """默认内存预算：物理内存的一半，无法获取时返回 None"""
+    try:
+        return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') // 2
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def estimate_file_memory(image_path: str) -> int:
+    """根据文件头估算导出一张图片的峰值内存，无法识别时返回 0"""
+    probed = probe_image(image_path)
+    if probed is None:
+        return 0
+    return estimate_peak_memory(*probed, mapped=is_mappable(image_path))
+
+
+class MemoryGovernor:
+    """内存准入控制器
+
+    只有当前已占用的预算加上新任务的估算值不超过总预算时才放行新任务；
+    单个超出预算的任务会在没有其他任务运行时单独放行，因此超大文件会被串行处理，
+    小文件可以并行很多个。
+    """
+
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = max(1, int(budget_bytes))
+        self._in_use = 0
+        self._running = 0
+        self._condition = threading.Condition()
+
+    @property
+    def in_use(self) -> int:
+        """当前已占用的预算"""
+        return self._in_use
+
+    def _fits(self, cost: int) -> bool:
+        return self._running == 0 or self._in_use + cost <= self.budget_bytes
+
+    def try_acquire(self, cost: int) -> bool:
+        """尝试占用预算，不阻塞
+
+        Args:
+            cost: 任务的估算内存
+
+        Returns:
+            bool: 是否放行
+        """
+        with self._condition:
+            if not self._fits(cost):
+                return False
+            self._in_use += cost
+            self._running += 1
+            return True
+
+    def acquire(self, cost: int, timeout: Optional[float] = None) -> bool:
+        """占用预算，必要时阻塞等待
+
+        Args:
+            cost: 任务的估算内存
+            timeout: 最长等待秒数，None 表示一直等待
+
+        Returns:
+            bool: 是否放行
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._fits(cost), timeout):
+                return False
+            self._in_use += cost
+            self._running += 1
+            return True
+
+    def release(self, cost: int) -> None:
+        """释放任务占用的预算"""
+        with self._condition:
+            self._in_use = max(0, self._in_use - cost)
+            self._running = max(0, self._running - 1)
+            self._condition.notify_all()
@@ -0,0 +1,402 @@
+"""
+图片元数据索引模块
+
+导入图片时只需要知道尺寸、模式、帧数、EXIF 方向和文件大小，这些都可以从文件头读出：
+Image.open 只解析文件头，不调用 load() 就不会解码像素。
+
+索引按列存储（每个字段一个 array.array，模式和格式名另存为字符串表中的编号），
+每个文件只占几十个字节，排序、筛选和导出估算可以直接在整列上用 NumPy 计算。
+索引保存为 .npz 文件，下次启动时直接加载；文件的修改时间或大小变化后会重新读取文件头。
+路径等字符串列保存为一整块 UTF-8 字节加一列偏移量，不会像定长字符串数组那样按最长的路径补齐每一行。
+"""
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence
+from PIL import Image
+import os
+import threading
+
+import numpy as np
+
+from .mapped_image import is_mappable
+from .memory_budget import estimate_peak_memory
+from .scheduler import CostModel, simulate_makespan
+
+DEFAULT_INDEX_FILE = 'metadata_index.npz'
+INDEX_VERSION = 2
+
+# 列名 -> array 类型码（NumPy 可以直接用同样的类型码解释其内容）
+COLUMNS = {
+    'width': 'I',
+    'height': 'I',
+    'frames': 'I',
+    'orientation': 'B',  # EXIF 方向 (1-8)，没有时为 1
+    'mode': 'B',  # 模式表中的编号
+    'format': 'B',  # 格式表中的编号
+    'mapped': 'B',  # 是否可以内存映射（未压缩的 BMP/TIFF）
+    'file_size': 'Q',
+    'mtime_ns': 'q',
+}
+
+SORT_KEYS = ('name', 'file_size', 'pixels', 'mtime', 'frames')
+ORIENTATIONS = ('landscape', 'portrait', 'square')
+
+_EXIF_ORIENTATION = 0x0112
+
+
+def _pack_strings(values: Sequence[str]) -> Dict[str, np.ndarray]:
+    """把字符串列表编码为一块 UTF-8 字节和 len(values) + 1 个偏移量"""
+    encoded = [value.encode('utf-8', 'surrogateescape') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+    return {'blob': np.frombuffer(b''.join(encoded), dtype=np.uint8), 'offsets': offsets}
+
+
+def _unpack_strings(blob: np.ndarray, offsets: np.ndarray) -> List[str]:
+    """_pack_strings 的逆过程"""
+    data = blob.tobytes()
+    bounds = offsets.tolist()
+    return [data[start:end].decode('utf-8', 'surrogateescape')
+            for start, end in zip(bounds, bounds[1:])]
+
+
+@dataclass(frozen=True)
+class ImageMetadata:
+    """单个文件的元数据"""
+    path: str
+    width: int
+    height: int
+    mode: str
+    format: str
+    frames: int = 1
+    orientation: int = 1
+    file_size: int = 0
+    mtime_ns: int = 0
+    mapped: bool = False
+
+    @property
+    def pixels(self) -> int:
+        return self.width * self.height
+
+    @property
+    def display_size(self) -> tuple:
+        """按 EXIF 方向旋转后的显示尺寸（方向 5-8 宽高互换）"""
+        if self.orientation >= 5:
+            return self.height, self.width
+        return self.width, self.height
+
+
+def probe_metadata(image_path: str) -> Optional[ImageMetadata]:
+    """只读取文件头获取元数据，不解码像素
+
+    Args:
+        image_path: 图片路径
+
+    Returns:
+        Optional[ImageMetadata]: 元数据，无法识别时返回 None
+    """
+    try:
+        stat = os.stat(image_path)
+        with Image.open(image_path) as image:
+            try:
+                orientation = int(image.getexif().get(_EXIF_ORIENTATION, 1))
+            except Exception:
+                orientation = 1
+            return ImageMetadata(
+                image_path, image.size[0], image.size[1], image.mode, image.format or '',
+                getattr(image, 'n_frames', 1), orientation if 1 <= orientation <= 8 else 1,
+                stat.st_size, stat.st_mtime_ns, is_mappable(image_path),
+            )
+    except Exception:
+        return None
+
+
+class MetadataIndex:
+    """按列存储的图片元数据索引（线程安全）
+
+    用法:
+        index = MetadataIndex.load()
+        metadata = index.get(path)            # 未索引或文件已修改时读取文件头
+        index.update(paths)                   # 并行读取一批文件头
+        ordered = index.sort_paths(paths, 'pixels', reverse=True)
+        index.save()
+    """
+
+    def __init__(self):
+        self._paths: List[str] = []
+        self._rows: Dict[str, int] = {}  # 路径 -> 行号
+        self._columns = {name: array(code) for name, code in COLUMNS.items()}
+        self._modes: List[str] = []
+        self._formats: List[str] = []
+        self._lock = threading.RLock()
+        self.dirty = False  # 加载或保存后是否有改动
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    @staticmethod
+    def _intern(table: List[str], value: str) -> int:
+        try:
+            return table.index(value)
+        except ValueError:
+            table.append(value)
+            return len(table) - 1
+
+    def _store(self, metadata: ImageMetadata) -> None:
+        values = {
+            'width': metadata.width,
+            'height': metadata.height,
+            'frames': metadata.frames,
+            'orientation': metadata.orientation,
+            'mode': self._intern(self._modes, metadata.mode),
+            'format': self._intern(self._formats, metadata.format),
+            'mapped': int(metadata.mapped),
+            'file_size': metadata.file_size,
+            'mtime_ns': metadata.mtime_ns,
+        }
+        row = self._rows.get(metadata.path)
+        if row is None:
+            self._rows[metadata.path] = len(self._paths)
+            self._paths.append(metadata.path)
+            for name, value in values.items():
+                self._columns[name].append(value)
+        else:
+            for name, value in values.items():
+                self._columns[name][row] = value
+        self.dirty = True
+
+    def _row_metadata(self, row: int) -> ImageMetadata:
+        columns = self._columns
+        return ImageMetadata(
+            self._paths[row], columns['width'][row], columns['height'][row],
+            self._modes[columns['mode'][row]], self._formats[columns['format'][row]],
+            columns['frames'][row], columns['orientation'][row],
+            columns['file_size'][row], columns['mtime_ns'][row], bool(columns['mapped'][row]),
+        )
+
+    def _is_current(self, row: int, path: str) -> bool:
+        """索引中的记录是否与文件一致（修改时间和大小都没变）"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        return (self._columns['mtime_ns'][row] == stat.st_mtime_ns
+                and self._columns['file_size'][row] == stat.st_size)
+
+    def get(self, path: str, refresh: bool = True) -> Optional[ImageMetadata]:
+        """获取文件的元数据
+
+        Args:
+            path: 图片路径
+            refresh: 是否检查文件是否已修改，未索引或已修改时读取文件头
+
+        Returns:
+            Optional[ImageMetadata]: 元数据，无法识别时返回 None
+        """
+        with self._lock:
+            row = self._rows.get(path)
+            if row is not None and (not refresh or self._is_current(row, path)):
+                return self._row_metadata(row)
+        if not refresh:
+            return None
+        metadata = probe_metadata(path)
+        if metadata is not None:
+            with self._lock:
+                self._store(metadata)
+        return metadata
+
+    def update(self, paths: Iterable[str], workers: int = 4) -> List[Optional[ImageMetadata]]:
+        """确保一批文件都已索引，未索引或已修改的文件并行读取文件头
+
+        Args:
+            paths: 图片路径
+            workers: 读取文件头的线程数（主要是等待磁盘）
+
+        Returns:
+            List[Optional[ImageMetadata]]: 与 paths 顺序一致的元数据
+        """
+        paths = list(paths)
+        with self._lock:
+            missing = [path for path in paths
+                       if path not in self._rows or not self._is_current(self._rows[path], path)]
+        if missing:
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+                probed = list(executor.map(probe_metadata, missing))
+            with self._lock:
+                for metadata in probed:
+                    if metadata is not None:
+                        self._store(metadata)
+        return [self.get(path, refresh=False) for path in paths]
+
+    def prune(self) -> int:
+        """删除已不存在的文件的记录
+
+        Returns:
+            int: 删除的记录数
+        """
+        with self._lock:
+            keep = [row for row, path in enumerate(self._paths) if os.path.exists(path)]
+            removed = len(self._paths) - len(keep)
+            if removed:
+                self._paths = [self._paths[row] for row in keep]
+                self._rows = {path: row for row, path in enumerate(self._paths)}
+                for name, code in COLUMNS.items():
+                    self._columns[name] = array(code, (self._columns[name][row] for row in keep))
+                self.dirty = True
+            return removed
+
+    def column(self, name: str, paths: Sequence[str]) -> np.ndarray:
+        """按 paths 的顺序取出一列（未索引的文件为 0）
+
+        Args:
+            name: COLUMNS 中的列名，或 'pixels'（宽 × 高）
+            paths: 图片路径
+        """
+        with self._lock:
+            rows = np.fromiter((self._rows.get(path, -1) for path in paths),
+                               dtype=np.int64, count=len(paths))
+            found = rows >= 0
+            if name == 'pixels':
+                data = (np.frombuffer(self._columns['width'], dtype='I').astype(np.int64)
+                        * np.frombuffer(self._columns['height'], dtype='I'))
+            else:
+                data = np.frombuffer(self._columns[name], dtype=COLUMNS[name])
+            values = np.zeros(len(paths), dtype=data.dtype)
+            values[found] = data[rows[found]]
+        return values
+
+    def sort_paths(self, paths: Sequence[str], key: str = 'name',
+                   reverse: bool = False) -> List[str]:
+        """按元数据排序路径，相同的保持原顺序
+
+        Args:
+            paths: 图片路径
+            key: SORT_KEYS 之一
+            reverse: 是否从大到小
+        """
+        paths = list(paths)
+        if key == 'name':
+            return sorted(paths, key=lambda path: os.path.basename(path).lower(), reverse=reverse)
+        values = self.column('mtime_ns' if key == 'mtime' else key, paths).astype(np.int64)
+        order = np.argsort(-values if reverse else values, kind='stable')
+        return [paths[i] for i in order]
+
+    def filter_paths(self, paths: Sequence[str], orientation: Optional[str] = None,
+                     multi_frame: Optional[bool] = None, min_pixels: int = 0) -> List[str]:
+        """按元数据筛选路径（未索引的文件不会被选中）
+
+        Args:
+            paths: 图片路径
+            orientation: 'landscape'、'portrait' 或 'square'（按 EXIF 方向旋转后），None 表示不限
+            multi_frame: True 只保留多帧图片，False 只保留单帧图片，None 表示不限
+            min_pixels: 最少像素数
+        """
+        paths = list(paths)
+        width = self.column('width', paths).astype(np.int64)
+        height = self.column('height', paths).astype(np.int64)
+        rotated = self.column('orientation', paths) >= 5
+        width, height = np.where(rotated, height, width), np.where(rotated, width, height)
+        pixels = width * height
+        keep = (pixels > 0) & (pixels >= min_pixels)
+        if orientation == 'landscape':
+            keep &= width > height
+        elif orientation == 'portrait':
+            keep &= width < height
+        elif orientation == 'square':
+            keep &= width == height
+        if multi_frame is not None:
+            frames = self.column('frames', paths)
+            keep &= (frames > 1) if multi_frame else (frames <= 1)
+        return [path for path, selected in zip(paths, keep) if selected]
+
+    def estimate_memory(self, path: str) -> int:
+        """估算导出一张图片的峰值内存（字节），未索引的文件返回 0"""
+        metadata = self.get(path, refresh=False)
+        if metadata is None:
+            return 0
+        return estimate_peak_memory(metadata.width, metadata.height, metadata.mode,
+                                    mapped=metadata.mapped)
+
+    def estimate(self, paths: Sequence[str], model: Optional[CostModel] = None,
+                 workers: int = 1) -> Dict[str, float]:
+        """估算一批文件的导出开销
+
+        Args:
+            paths: 图片路径
+            model: 成本模型，默认使用内置系数
+            workers: 工作线程数
+
+        Returns:
+            Dict[str, float]: files, pixels, file_size, peak_memory（单个任务的最大峰值内存），
+            total_time（各文件耗时之和，秒）, makespan（按大图优先调度的整批耗时，秒）
+        """
+        model = model or CostModel()
+        paths = list(paths)
+        width = self.column('width', paths).astype(np.float64)
+        height = self.column('height', paths).astype(np.float64)
+        file_size = self.column('file_size', paths).astype(np.float64)
+        data_size = np.where(self.column('mapped', paths) > 0, 0.0, file_size)
+        # 成本模型是线性的，直接对整列计算
+        coefficients = np.array([model.coefficients[stage] for stage in model.coefficients]).sum(axis=0)
+        times = (coefficients[0] * width * height / 1e6
+                 + coefficients[1] * data_size / (1024 * 1024) + coefficients[2])
+        times[width == 0] = 0.0
+        return {
+            'files': len(paths),
+            'pixels': float((width * height).sum()),
+            'file_size': float(file_size.sum()),
+            'peak_memory': max((self.estimate_memory(path) for path in paths), default=0),
+            'total_time': float(times.sum()),
+            'makespan': float(simulate_makespan(sorted(times, reverse=True), workers)),
+        }
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_INDEX_FILE) -> 'MetadataIndex':
+        """从文件加载索引，文件不存在、损坏或版本不符时返回空索引"""
+        index = cls()
+        if not os.path.exists(path):
+            return index
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if int(data['version']) != INDEX_VERSION:
+                    return index
+                index._paths, index._modes, index._formats = (
+                    _unpack_strings(data[f'{name}_blob'], data[f'{name}_offsets'])
+                    for name in ('paths', 'modes', 'formats'))
+                for name, code in COLUMNS.items():
+                    column = array(code)
+                    column.frombytes(np.ascontiguousarray(data[name], dtype=code).tobytes())
+                    index._columns[name] = column
+            index._rows = {p: row for row, p in enumerate(index._paths)}
+        except Exception as e:
+            print(f"Error loading metadata index: {e}")
+            return cls()
+        return index
+
+    def save(self, path: str = DEFAULT_INDEX_FILE) -> bool:
+        """保存索引
+
+        Returns:
+            bool: 是否成功保存
+        """
+        with self._lock:
+            arrays = {name: np.frombuffer(column, dtype=COLUMNS[name])
+                      for name, column in self._columns.items()}
+            arrays['version'] = np.array(INDEX_VERSION)
+            for name, values in (('paths', self._paths), ('modes', self._modes),
+                                 ('formats', self._formats)):
+                for part, packed in _pack_strings(values).items():
+                    arrays[f'{name}_{part}'] = packed
+            temp_path = f"{path}.tmp.npz"
+            try:
+                with open(temp_path, 'wb') as f:
+                    np.savez(f, **arrays)
+                os.replace(temp_path, path)
+                self.dirty = False
+                return True
+            except Exception as e:
+                print(f"Error saving metadata index: {e}")
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                return False
@@ -0,0 +1,142 @@
+"""
+预览金字塔模块
+"""
+from typing import List, Optional, Tuple
+from PIL import Image
+
+
+class PreviewPyramid:
+    """多分辨率预览金字塔
+
+    第 0 层是完整分辨率的合成图，第 k 层是原图缩小 2^k 倍后的结果。
+    各层按需生成，水印变化时只记录脏矩形，真正显示某一层时才刷新该层。
+    """
+    MIN_LEVEL_SIZE = 256  # 最小层的长边像素数
+
+    def __init__(self, image: Optional[Image.Image] = None):
+        self._levels: List[Optional[Image.Image]] = []
+        self._dirty: List[List[Tuple[int, int, int, int]]] = []
+        self._version = 0
+        self.set_image(image)
+
+    @property
+    def version(self) -> int:
+        """金字塔内容版本号，每次底图变化时递增"""
+        return self._version
+
+    def set_image(self, image: Optional[Image.Image]) -> None:
+        """设置新的底图并丢弃所有已生成的层
+
+        Args:
+            image: 完整分辨率图片
+        """
+        self._version += 1
+        if image is None:
+            self._levels = []
+            self._dirty = []
+            return
+
+        count = 1
+        longest = max(image.size)
+        while (longest >> count) >= self.MIN_LEVEL_SIZE:
+            count += 1
+
+        self._levels = [image] + [None] * (count - 1)
+        self._dirty = [[] for _ in range(count)]
+
+    def update_image(self, image: Image.Image,
+                     bbox: Optional[Tuple[int, int, int, int]] = None) -> None:
+        """更新底图内容
+
+        Args:
+            image: 新的完整分辨率图片，尺寸必须与原底图一致
+            bbox: 发生变化的区域 (x, y, width, height)，为 None 表示整张图都变了
+        """
+        if not self._levels or bbox is None or image.size != self._levels[0].size:
+            self.set_image(image)
+            return
+
+        self._version += 1
+        self._levels[0] = image
+        x, y, w, h = bbox
+        if w <= 0 or h <= 0:
+            return
+        for level in range(1, len(self._levels)):
+            # 尚未生成的层下次会从头生成，无需记录脏矩形
+            if self._levels[level] is not None:
+                self._dirty[level].append((x, y, x + w, y + h))
+
+    def level_count(self) -> int:
+        """获取层数"""
+        return len(self._levels)
+
+    def level_for_size(self, width: int, height: int) -> int:
+        """选择仍不小于目标尺寸的最小一层
+
+        Args:
+            width: 目标宽度
+            height: 目标高度
+
+        Returns:
+            int: 层号
+        """
+        if not self._levels:
+            return 0
+        base_w, base_h = self._levels[0].size
+        # 按保持宽高比缩放时实际显示的比例
+        scale = min(width / base_w, height / base_h)
+        level = 0
+        while level + 1 < len(self._levels) and (1 << (level + 1)) * scale <= 1.0:
+            level += 1
+        return level
+
+    def get_level(self, level: int) -> Optional[Image.Image]:
+        """获取某一层，必要时生成或刷新该层
+
+        Args:
+            level: 层号
+
+        Returns:
+            Optional[Image.Image]: 该层图片
+        """
+        if not self._levels:
+            return None
+        level = max(0, min(level, len(self._levels) - 1))
+        if level == 0:
+            return self._levels[0]
+
+        if self._levels[level] is None:
+            self._levels[level] = self._levels[0].reduce(1 << level)
+            self._dirty[level] = []
+        elif self._dirty[level]:
+            self._refresh_level(level)
+        return self._levels[level]
+
+    def get_for_size(self, width: int, height: int) -> Optional[Image.Image]:
+        """获取最适合目标尺寸的层"""
+        return self.get_level(self.level_for_size(width, height))
+
+    def _refresh_level(self, level: int) -> None:
+        """只重新缩小该层的脏矩形区域"""
+        factor = 1 << level
+        base = self._levels[0]
+        target = self._levels[level]
+        if target.mode != base.mode:
+            self._levels[level] = base.reduce(factor)
+            self._dirty[level] = []
+            return
+
+        bw, bh = base.size
+        tw, th = target.size
+        for left, top, right, bottom in self._dirty[level]:
+            # 对齐到 factor 的整数倍，保证与整层缩小的结果一致
+            lx = max(0, left // factor)
+            ty = max(0, top // factor)
+            rx = min(tw, -(-right // factor))
+            by = min(th, -(-bottom // factor))
+            if rx <= lx or by <= ty:
+                continue
+            region = base.crop((lx * factor, ty * factor,
+                                min(bw, rx * factor), min(bh, by * factor)))
+            target.paste(region.reduce(factor), (lx, ty))
+        self._dirty[level] = []
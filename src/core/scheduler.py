@@ -0,0 +1,232 @@
+"""
+批处理调度模块
+
+按列表顺序分配任务时，排在最后的一张超大 TIFF 会让其他核心空等它完成。
+这里先只读取文件头获得尺寸和需要解码的数据量，用成本模型估算每个任务的耗时，
+再按预计耗时从长到短提交（LPT，最长处理时间优先），缩短整批的完成时间。
+
+成本模型对 load / watermark / save 三个阶段分别拟合
+    耗时 = a * 百万像素 + b * 压缩数据MB + c
+可内存映射的未压缩 BMP/TIFF 不需要解码，压缩数据量按 0 计。
+系数可以用 benchmarks/bench_scheduler.py --calibrate 根据实测的阶段耗时重新标定。
+"""
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import heapq
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from .mapped_image import is_mappable
+from .memory_budget import probe_image
+
+DEFAULT_COST_MODEL_FILE = 'cost_model.json'
+STAGES = ('load', 'watermark', 'save')
+
+# 各阶段的默认系数 (秒/百万像素, 秒/MB, 秒)，由 bench_scheduler.py --calibrate
+# 在 x86 Linux 上导出 JPEG（默认档位）标定
+DEFAULT_COEFFICIENTS = {
+    'load': (0.0046, 0.050, 0.0024),
+    'watermark': (0.0, 0.0, 0.0008),
+    'save': (0.0106, 0.0, 0.0057),
+}
+
+
+class CostModel:
+    """根据图片尺寸和文件大小估算导出耗时"""
+
+    def __init__(self, coefficients: Optional[Dict[str, Sequence[float]]] = None):
+        """
+        Args:
+            coefficients: 阶段名 -> (秒/百万像素, 秒/压缩数据MB, 秒)，缺少的阶段使用默认系数
+        """
+        self.coefficients = {stage: tuple(DEFAULT_COEFFICIENTS[stage]) for stage in STAGES}
+        for stage, values in (coefficients or {}).items():
+            if stage in self.coefficients:
+                self.coefficients[stage] = tuple(float(v) for v in values)
+
+    @staticmethod
+    def features(width: int, height: int, data_size: int) -> Tuple[float, float, float]:
+        """任务特征: (百万像素, 压缩数据MB, 1)"""
+        return width * height / 1e6, data_size / (1024 * 1024), 1.0
+
+    def predict_stages(self, width: int, height: int, data_size: int) -> Dict[str, float]:
+        """估算各阶段耗时（秒）"""
+        x = self.features(width, height, data_size)
+        return {stage: sum(a * b for a, b in zip(self.coefficients[stage], x))
+                for stage in STAGES}
+
+    def predict(self, width: int, height: int, data_size: int) -> float:
+        """估算单个任务的总耗时（秒）"""
+        return sum(self.predict_stages(width, height, data_size).values())
+
+    @classmethod
+    def calibrate(cls, samples: Iterable[Tuple[int, int, int, Dict[str, float]]]) -> 'CostModel':
+        """用实测的阶段耗时拟合系数（非负最小二乘的近似：负系数置零后重新拟合）
+
+        Args:
+            samples: (宽, 高, 压缩数据字节数, ExportResult.timings) 的序列，
+                前三项可取自 probe_job 的结果
+
+        Returns:
+            CostModel: 拟合后的模型；样本不足的阶段保留默认系数
+        """
+        samples = [s for s in samples if all(stage in s[3] for stage in STAGES)]
+        if len(samples) < 3:
+            return cls()
+        coefficients = {}
+        x = np.array([cls.features(w, h, size) for w, h, size, _ in samples])
+        for stage in STAGES:
+            y = np.array([timings[stage] for _, _, _, timings in samples])
+            active = [0, 1, 2]
+            while True:
+                solution, *_ = np.linalg.lstsq(x[:, active], y, rcond=None)
+                if (solution >= 0).all() or len(active) == 1:
+                    break
+                active.pop(int(np.argmin(solution)))
+            values = [0.0, 0.0, 0.0]
+            for index, value in zip(active, solution):
+                values[index] = max(0.0, float(value))
+            coefficients[stage] = tuple(values)
+        return cls(coefficients)
+
+    def to_dict(self) -> Dict[str, List[float]]:
+        return {stage: list(values) for stage, values in self.coefficients.items()}
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_COST_MODEL_FILE) -> 'CostModel':
+        """从 JSON 文件加载系数，文件不存在或损坏时使用默认系数"""
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    return cls(json.load(f))
+            except Exception as e:
+                print(f"Error loading cost model: {e}")
+        return cls()
+
+    def save(self, path: str = DEFAULT_COST_MODEL_FILE) -> bool:
+        """保存系数到 JSON 文件
+
+        Returns:
+            bool: 是否成功保存
+        """
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(self.to_dict(), f, indent=4)
+            return True
+        except Exception as e:
+            print(f"Error saving cost model: {e}")
+            return False
+
+
+@dataclass
+class ScheduledJob:
+    """已估算耗时的导出任务"""
+    path: str
+    counter: int  # 文本变量 {counter} 的取值，保持原列表顺序
+    width: int = 0
+    height: int = 0
+    data_size: int = 0  # 需要解码的压缩数据字节数
+    predicted: float = 0.0  # 预计耗时（秒）
+
+
+def probe_job(path: str, counter: int, model: CostModel, metadata=None) -> ScheduledJob:
+    """只读取文件头估算单个任务的耗时，无法识别的文件按文件大小估算
+
+    传入 metadata（MetadataIndex）时优先使用索引中的尺寸和文件大小，不再打开文件。
+    """
+    indexed = metadata.get(path) if metadata is not None else None
+    if indexed is not None:
+        data_size = 0 if indexed.mapped else indexed.file_size
+        return ScheduledJob(path, counter, indexed.width, indexed.height, data_size,
+                            model.predict(indexed.width, indexed.height, data_size))
+    try:
+        data_size = 0 if is_mappable(path) else os.path.getsize(path)
+    except OSError:
+        data_size = 0
+    probed = probe_image(path)
+    width, height = probed[:2] if probed else (0, 0)
+    return ScheduledJob(path, counter, width, height, data_size,
+                        model.predict(width, height, data_size))
+
+
+def plan_lpt(paths: Iterable[Tuple[str, int]], model: CostModel,
+             metadata=None) -> List[ScheduledJob]:
+    """按预计耗时从长到短排列任务（耗时相同的保持原顺序）
+
+    Args:
+        paths: (路径, 序号) 的序列
+        model: 成本模型
+        metadata: 元数据索引（MetadataIndex），None 表示逐个读取文件头
+
+    Returns:
+        List[ScheduledJob]: 排好序的任务
+    """
+    jobs = [probe_job(path, counter, model, metadata) for path, counter in paths]
+    jobs.sort(key=lambda job: -job.predicted)
+    return jobs
+
+
+def simulate_makespan(durations: Iterable[float], workers: int) -> float:
+    """模拟按给定顺序把任务分配给最先空闲的工作线程，返回整批完成时间"""
+    finish_times = [0.0] * max(1, workers)
+    for duration in durations:
+        heapq.heappush(finish_times, heapq.heappop(finish_times) + duration)
+    return max(finish_times)
+
+
+@dataclass
+class ScheduleReport:
+    """调度的预计与实际耗时对比
+
+    iter_export 在排好任务后填入预计值，并在每个结果产出时记录实际耗时。
+    """
+    workers: int = 1
+    predicted_makespan: float = 0.0  # 按预计耗时模拟的整批完成时间（秒）
+    unscheduled_makespan: float = 0.0  # 同样的预计耗时按原列表顺序分配时的完成时间（秒）
+    actual_makespan: float = 0.0  # 实际的整批完成时间（秒）
+    jobs: Dict[str, Tuple[float, Optional[float]]] = field(default_factory=dict)  # 路径 -> (预计, 实际)
+    _start: float = field(default=0.0, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def plan(self, jobs: Sequence[ScheduledJob], workers: int) -> None:
+        """记录调度计划并开始计时"""
+        self.workers = workers
+        self.predicted_makespan = simulate_makespan((job.predicted for job in jobs), workers)
+        self.unscheduled_makespan = simulate_makespan(
+            (job.predicted for job in sorted(jobs, key=lambda job: job.counter)), workers)
+        self.jobs = {job.path: (job.predicted, None) for job in jobs}
+        self._start = time.perf_counter()
+
+    def record(self, path: str, actual: Optional[float]) -> None:
+        """记录一个任务的实际耗时"""
+        with self._lock:
+            predicted = self.jobs.get(path, (0.0, None))[0]
+            self.jobs[path] = (predicted, actual)
+            self.actual_makespan = time.perf_counter() - self._start
+
+    def summary(self) -> Dict[str, float]:
+        """汇总预计与实际耗时
+
+        Returns:
+            Dict[str, float]: files, predicted_total, actual_total, mean_error
+            （已完成任务按耗时加权的平均相对误差）, predicted_makespan, unscheduled_makespan,
+            actual_makespan
+        """
+        finished = [(p, a) for p, a in self.jobs.values() if a is not None]
+        predicted_total = sum(p for p, _ in finished)
+        actual_total = sum(a for _, a in finished)
+        # 按耗时加权，避免几毫秒的小图的计时抖动主导误差
+        absolute_error = sum(abs(p - a) for p, a in finished)
+        return {
+            'files': len(finished),
+            'predicted_total': predicted_total,
+            'actual_total': actual_total,
+            'mean_error': absolute_error / actual_total if actual_total > 0 else 0.0,
+            'predicted_makespan': self.predicted_makespan,
+            'unscheduled_makespan': self.unscheduled_makespan,
+            'actual_makespan': self.actual_makespan,
+        }
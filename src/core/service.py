@@ -0,0 +1,257 @@
+"""
+水印服务模块
+
+为本地 HTTP 服务提供与界面无关的处理逻辑：并发到达的请求在短时间窗口内合并为一批，
+整批提交给进程池。每个工作进程常驻一个 ImageProcessor，同一模板的连续请求可以直接
+命中其图层缓存，每批只需一次进程间往返。
+"""
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from PIL import Image
+import asyncio
+import io
+import os
+
+from .config_manager import ConfigManager
+from .encoder import DEFAULT_PROFILE, get_output_formats, normalize_format
+from .image_processor import ImageProcessor
+from .template_manager import TemplateManager
+
+CONTENT_TYPES = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'WEBP': 'image/webp',
+    'AVIF': 'image/avif',
+}
+
+
+@dataclass
+class WatermarkRequest:
+    """一次水印请求，data 和 path 二选一"""
+    template: Optional[str] = None
+    data: Optional[bytes] = None
+    path: Optional[str] = None
+    format: str = 'JPEG'
+    quality: int = 95
+    profile: str = DEFAULT_PROFILE
+
+
+@dataclass
+class WatermarkResponse:
+    """一次水印请求的结果"""
+    data: bytes = b''
+    content_type: str = 'application/octet-stream'
+    error: Optional[str] = None
+    status: int = 200
+
+
+class _TemplateCache:
+    """工作进程中的模板缓存，模板文件修改后自动重新加载
+
+    只读取模板，不调用 TemplateManager.get_template（它会回写最近使用时间）。
+    """
+
+    def __init__(self, templates_file: str):
+        self.templates_file = templates_file
+        self._mtime = None
+        self._templates: Dict[str, Dict[str, Any]] = {}
+        self._default = ConfigManager().get_value('watermark', {})
+
+    def get(self, name: Optional[str]) -> Optional[Dict[str, Any]]:
+        """获取模板设置，name 为空时返回默认水印"""
+        if not name:
+            return self._default
+        try:
+            mtime = os.path.getmtime(self.templates_file)
+        except OSError:
+            mtime = None
+        if mtime != self._mtime:
+            manager = TemplateManager(self.templates_file)
+            self._templates = {
+                template.name: dict(template.settings, layers=template.layers)
+                for template in manager.templates
+            }
+            self._mtime = mtime
+        return self._templates.get(name)
+
+
+# 工作进程中的全局状态，由 _init_service_worker 设置
+_worker_processor: Optional[ImageProcessor] = None
+_worker_templates: Optional[_TemplateCache] = None
+
+
+def _init_service_worker(templates_file: str) -> None:
+    """工作进程初始化：创建常驻的处理器和模板缓存"""
+    global _worker_processor, _worker_templates
+    _worker_processor = ImageProcessor()
+    _worker_templates = _TemplateCache(templates_file)
+
+
+def _render(request: WatermarkRequest) -> WatermarkResponse:
+    """在工作进程中处理单个请求"""
+    settings = _worker_templates.get(request.template)
+    if settings is None:
+        return WatermarkResponse(error=f"Template not found: {request.template}", status=404)
+
+    format = normalize_format(request.format) if isinstance(request.format, str) else ''
+    if format not in get_output_formats():
+        return WatermarkResponse(error=f"Unsupported format: {request.format}", status=400)
+
+    processor = _worker_processor
+    try:
+        if request.path:
+            if not processor.load_image(request.path):
+                return WatermarkResponse(error=processor.get_last_error(), status=400)
+        else:
+            image = Image.open(io.BytesIO(request.data))
+            image.load()
+            # 上传的图片没有路径，不能沿用上一个请求的 {filename}、{exif:...} 等取值
+            processor.set_image(image, '')
+    except Exception as e:
+        return WatermarkResponse(error=f"Error loading image: {e}", status=400)
+
+    try:
+        processor.apply_settings(settings)
+        buffer = io.BytesIO()
+        processor.encode_image(buffer, format, request.quality, request.profile)
+    except Exception as e:
+        return WatermarkResponse(error=f"Error rendering image: {e}", status=500)
+    return WatermarkResponse(buffer.getvalue(), CONTENT_TYPES.get(format, 'application/octet-stream'))
+
+
+def render_batch(requests: List[WatermarkRequest]) -> List[WatermarkResponse]:
+    """在工作进程中按顺序处理一批请求
+
+    同一模板的请求排在一起，以便连续命中图层缓存；返回结果与输入顺序一致。
+    """
+    order = sorted(range(len(requests)), key=lambda i: requests[i].template or '')
+    responses: List[Optional[WatermarkResponse]] = [None] * len(requests)
+    for i in order:
+        responses[i] = _render(requests[i])
+    return responses
+
+
+class BatchingRenderer:
+    """把并发请求合并成小批次提交给进程池
+
+    第一个请求到达后最多等待 max_delay 秒或凑满 max_batch 个请求再提交；
+    同时在途的批次数不超过工作进程数，进程池繁忙时新请求会在队列中自然积累成更大的批次。
+    工作进程崩溃后进程池会被重建，只有当时在途的批次失败。
+
+    用法（在事件循环中）:
+        renderer = BatchingRenderer(workers=4)
+        await renderer.start()
+        response = await renderer.submit(request)
+        await renderer.close()
+    """
+
+    def __init__(self, workers: Optional[int] = None,
+                 max_batch: int = 8,
+                 max_delay: float = 0.005,
+                 templates_file: str = 'templates.json'):
+        """
+        Args:
+            workers: 工作进程数，默认 CPU 核数
+            max_batch: 每批最多请求数
+            max_delay: 凑批最长等待时间（秒）
+            templates_file: 模板文件路径
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max_delay
+        self.templates_file = templates_file
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._batches = set()
+        self.stats = {'requests': 0, 'batches': 0, 'pool_restarts': 0}
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers,
+                                   initializer=_init_service_worker,
+                                   initargs=(self.templates_file,))
+
+    async def start(self) -> None:
+        """启动进程池和分发任务，并预热所有工作进程"""
+        self._executor = self._create_executor()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self._executor, render_batch, [])
+                               for _ in range(self.workers)))
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.workers)
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def submit(self, request: WatermarkRequest) -> WatermarkResponse:
+        """提交一个请求并等待结果"""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((request, future))
+        return await future
+
+    async def _dispatch(self) -> None:
+        """从队列中取出请求组成批次"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            await self._slots.acquire()
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                if self._queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    batch.append(self._queue.get_nowait())
+            task = asyncio.create_task(self._run_batch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _run_batch(self, batch: List[Tuple[WatermarkRequest, asyncio.Future]]) -> None:
+        """在进程池中处理一批请求并分发结果"""
+        loop = asyncio.get_running_loop()
+        try:
+            requests = [request for request, _ in batch]
+            executor = self._executor
+            try:
+                responses = await loop.run_in_executor(executor, render_batch, requests)
+            except BrokenProcessPool as e:
+                # 工作进程崩溃：本批失败，之后的请求交给新的进程池
+                self._replace_executor(executor)
+                responses = [WatermarkResponse(error=f"Worker process crashed: {e}",
+                                               status=500)] * len(batch)
+            except Exception as e:
+                responses = [WatermarkResponse(error=str(e), status=500)] * len(batch)
+            self.stats['requests'] += len(batch)
+            self.stats['batches'] += 1
+            for (_, future), response in zip(batch, responses):
+                if not future.done():
+                    future.set_result(response)
+        finally:
+            self._slots.release()
+
+    def _replace_executor(self, broken: ProcessPoolExecutor) -> None:
+        """重建已损坏的进程池，同一个进程池上失败的多个批次只重建一次"""
+        if self._executor is not broken:
+            return
+        self._executor = self._create_executor()
+        self.stats['pool_restarts'] += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    async def close(self) -> None:
+        """停止分发并关闭进程池"""
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+        if self._executor:
+            self._executor.shutdown(wait=True)
@@ -0,0 +1,274 @@
+"""
+工作会话模块
+
+保存和恢复图片列表以及每张图片的水印设置。几万张图片的会话中，大多数图片的设置相同或只差一两项，
+因此会话文件只保存一份基准设置（每一项取最常见的值），每张图片只记录与基准不同的项；
+键、值和目录都只保存一次，每张图片的差异只是几个编号。
+
+文件格式（UTF-8 文本）:
+    第 1 行  WMSESSION <版本>
+    第 2 行  JSON: base（基准设置）、keys、values、dirs、current（当前图片序号，-1 表示无）
+    第 3 行  JSON: 路径列表，扁平存放为 [目录编号, 文件名, 目录编号, 文件名, ...]
+    之后每张图片一行: 用空格分隔的 "键编号 值编号" 对，值编号为 -1 表示删除该键；
+             空行表示与基准相同，"-" 表示该图片没有设置
+    元组（颜色、位置等）存为 {"__tuple__": [...]}，读回时仍是元组，设置哈希和比较结果与保存前一致。
+
+加载时只解析前三行，每张图片的差异在第一次读取其设置时才解析，大会话打开后窗口立即可用。
+"""
+from collections import Counter
+from collections.abc import MutableMapping
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+import copy
+import json
+import os
+
+SESSION_MAGIC = 'WMSESSION'
+SESSION_VERSION = 2
+_READABLE_VERSIONS = ('1', '2')  # 版本 1 没有元组标记，元组读回为列表
+SESSION_EXTENSION = '.wmsession'
+
+_REMOVED = -1  # 值编号：该图片没有这个键
+_NO_SETTINGS = '-'  # 差异行：该图片没有设置
+_SCALARS = (str, int, float, bool, type(None))
+_MISSING = object()
+_BASE_SAMPLE = 2048  # 选择基准设置时最多统计的图片数
+_TUPLE_TAG = '__tuple__'
+
+
+def _value_key(value: Any) -> Any:
+    """值的驻留键：可哈希且区分类型（True 与 1、元组与列表都不是同一个值）"""
+    if isinstance(value, _SCALARS):
+        return type(value), value
+    if isinstance(value, (list, tuple)):
+        return type(value), tuple(_value_key(item) for item in value)
+    return dict, tuple(sorted((key, _value_key(item)) for key, item in value.items()))
+
+
+def _encode_value(value: Any) -> Any:
+    """转换为可 JSON 序列化的形式，元组加上标记"""
+    if isinstance(value, _SCALARS):
+        return value
+    if isinstance(value, tuple):
+        return {_TUPLE_TAG: [_encode_value(item) for item in value]}
+    if isinstance(value, list):
+        return [_encode_value(item) for item in value]
+    return {key: _encode_value(item) for key, item in value.items()}
+
+
+def _decode_value(value: Any) -> Any:
+    """_encode_value 的逆变换，返回新的对象（不与值表共享）"""
+    if isinstance(value, _SCALARS):
+        return value
+    if isinstance(value, list):
+        return [_decode_value(item) for item in value]
+    if len(value) == 1 and _TUPLE_TAG in value:
+        return tuple(_decode_value(item) for item in value[_TUPLE_TAG])
+    return {key: _decode_value(item) for key, item in value.items()}
+
+
+class _Interner:
+    """值表：相同的值只保存一次"""
+
+    def __init__(self):
+        self.values: List[Any] = []
+        self._index: Dict[Any, int] = {}
+        self._by_id: Dict[int, int] = {}  # 同一对象（如共享的图层列表）只计算一次驻留键，对象需在保存期间一直存在
+
+    def index(self, value: Any) -> int:
+        if isinstance(value, _SCALARS):
+            key = (type(value), value)
+        else:
+            cached = self._by_id.get(id(value))
+            if cached is not None:
+                return cached
+            key = _value_key(value)
+        index = self._index.get(key)
+        if index is None:
+            index = self._index[key] = len(self.values)
+            self.values.append(value)
+        if not isinstance(value, _SCALARS):
+            self._by_id[id(value)] = index
+        return index
+
+
+class LazySettings(MutableMapping):
+    """路径 -> 水印设置的映射，从会话文件加载的设置在第一次读取时才解析
+
+    可以直接替代普通字典（如 MainWindow.image_settings）。
+    """
+
+    def __init__(self, base: Optional[Dict[str, Any]] = None, keys: Sequence[str] = (),
+                 values: Sequence[Any] = (), encoded: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            base: 基准设置
+            keys: 键表
+            values: 值表（_encode_value 编码后的形式，读取时才还原）
+            encoded: 路径 -> 尚未解析的差异行
+        """
+        self._base = base or {}
+        self._keys = keys
+        self._values = values
+        self._encoded = encoded or {}
+        self._decoded: Dict[str, Dict[str, Any]] = {}
+
+    def _decode(self, line: str) -> Dict[str, Any]:
+        settings = copy.deepcopy(self._base)
+        numbers = line.split()
+        for key_index, value_index in zip(numbers[::2], numbers[1::2]):
+            key, value_index = self._keys[int(key_index)], int(value_index)
+            if value_index == _REMOVED:
+                settings.pop(key, None)
+            else:
+                settings[key] = _decode_value(self._values[value_index])
+        return settings
+
+    def __getitem__(self, path: str) -> Dict[str, Any]:
+        settings = self._decoded.get(path)
+        if settings is None:
+            line = self._encoded.pop(path)  # 不存在时抛出 KeyError
+            settings = self._decoded[path] = self._decode(line)
+        return settings
+
+    def __setitem__(self, path: str, settings: Dict[str, Any]) -> None:
+        self._encoded.pop(path, None)
+        self._decoded[path] = settings
+
+    def __delitem__(self, path: str) -> None:
+        if self._encoded.pop(path, None) is None:
+            del self._decoded[path]
+
+    def __contains__(self, path) -> bool:
+        return path in self._decoded or path in self._encoded
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._decoded
+        yield from list(self._encoded)
+
+    def __len__(self) -> int:
+        return len(self._decoded) + len(self._encoded)
+
+    @property
+    def pending(self) -> int:
+        """尚未解析的设置数"""
+        return len(self._encoded)
+
+
+@dataclass
+class Session:
+    """工作会话"""
+    paths: List[str] = field(default_factory=list)
+    settings: MutableMapping = field(default_factory=LazySettings)  # 路径 -> 水印设置
+    current: Optional[str] = None  # 当前选中的图片
+
+
+def _choose_base(entries: Sequence[Dict[str, Any]], interner: _Interner) -> Dict[str, Any]:
+    """每一项取最常见的值作为基准（只统计均匀抽取的一部分图片）"""
+    sample = entries[::max(1, len(entries) // _BASE_SAMPLE)]
+    pairs = Counter((key, interner.index(value)) for settings in sample for key, value in settings.items())
+    key_counts: Counter = Counter()
+    best: Dict[str, Tuple[int, int]] = {}  # 键 -> (最常见的值编号, 次数)
+    for (key, value_index), count in pairs.items():
+        key_counts[key] += count
+        if count > best.get(key, (0, 0))[1]:
+            best[key] = (value_index, count)
+    # 出现在一半以上图片中的键才放入基准
+    return {key: interner.values[value_index] for key, (value_index, _) in best.items()
+            if 2 * key_counts[key] > len(sample)}
+
+
+def save_session(session_path: str, paths: Sequence[str],
+                 settings: Mapping[str, Dict[str, Any]], current: Optional[str] = None) -> bool:
+    """保存会话
+
+    Args:
+        session_path: 会话文件路径
+        paths: 图片列表（按显示顺序）
+        settings: 路径 -> 水印设置，可以不包含全部图片
+        current: 当前选中的图片
+
+    Returns:
+        bool: 是否成功保存
+    """
+    temp_path = f"{session_path}.tmp"
+    try:
+        interner = _Interner()
+        entries = [settings.get(path) for path in paths]
+        base = _choose_base([entry for entry in entries if entry], interner)
+        key_numbers = {key: number for number, key in enumerate(base)}
+
+        dirs: Dict[str, int] = {}
+        flat_paths: List[Any] = []
+        for path in paths:
+            directory, name = os.path.split(path)
+            flat_paths.append(dirs.setdefault(directory, len(dirs)))
+            flat_paths.append(name)
+
+        # 与基准相同（类型也相同）的值直接比较，只有不同的值才需要驻留
+        removed = [f"{number} {_REMOVED}" for number in range(len(base))]
+        lines = []
+        for entry in entries:
+            if not entry:
+                lines.append(_NO_SETTINGS)
+                continue
+            delta = []
+            for key, value in entry.items():
+                base_value = base.get(key, _MISSING)
+                if type(value) is not type(base_value) or value != base_value:
+                    number = key_numbers.setdefault(key, len(key_numbers))
+                    delta.append(f"{number} {interner.index(value)}")
+            delta.extend(removed[key_numbers[key]] for key in base if key not in entry)
+            lines.append(' '.join(delta))
+
+        header = {
+            'base': _encode_value(base),
+            'keys': list(key_numbers),
+            'values': [_encode_value(value) for value in interner.values],
+            'dirs': list(dirs),
+            'current': paths.index(current) if current in paths else -1,
+        }
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(f"{SESSION_MAGIC} {SESSION_VERSION}\n")
+            f.write(json.dumps(header, ensure_ascii=False, separators=(',', ':')) + '\n')
+            f.write(json.dumps(flat_paths, ensure_ascii=False, separators=(',', ':')) + '\n')
+            f.write('\n'.join(lines))
+        os.replace(temp_path, session_path)
+        return True
+    except Exception as e:
+        print(f"Error saving session: {e}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return False
+
+
+def load_session(session_path: str) -> Optional[Session]:
+    """加载会话，每张图片的设置在第一次读取时才解析
+
+    Args:
+        session_path: 会话文件路径
+
+    Returns:
+        Optional[Session]: 会话，文件不存在、损坏或版本不符时返回 None
+    """
+    try:
+        with open(session_path, 'r', encoding='utf-8') as f:
+            magic = f.readline().split()
+            if len(magic) != 2 or magic[0] != SESSION_MAGIC or magic[1] not in _READABLE_VERSIONS:
+                print(f"Error loading session: unsupported file {session_path}")
+                return None
+            header = json.loads(f.readline())
+            flat_paths = json.loads(f.readline())
+            lines = f.read().split('\n')
+    except Exception as e:
+        print(f"Error loading session: {e}")
+        return None
+
+    dirs = header['dirs']
+    paths = [os.path.join(dirs[directory], name)
+             for directory, name in zip(flat_paths[::2], flat_paths[1::2])]
+    # 与基准相同的图片只有空行，读取时直接得到基准设置的副本
+    encoded = {path: line for path, line in zip(paths, lines) if line != _NO_SETTINGS}
+    settings = LazySettings(_decode_value(header['base']), header['keys'], header['values'], encoded)
+    current = header.get('current', -1)
+    return Session(paths, settings, paths[current] if 0 <= current < len(paths) else None)
@@ -0,0 +1,186 @@
+"""
+共享内存图层模块
+
+批处理使用多进程时，渲染好的水印图层和平铺图案在每批中只写入一次共享内存，
+工作进程按名称映射为只读的 PIL 图片视图，不需要随每个任务传输像素数据。
+"""
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, List, Set, Tuple
+from PIL import Image
+import sys
+import threading
+
+
+@dataclass(frozen=True)
+class SharedLayerHandle:
+    """共享内存中一个图层的描述，只有几十字节，可以随任务传给工作进程"""
+    name: str
+    size: Tuple[int, int]
+    mode: str
+    key: tuple  # 对应 ImageProcessor.set_shared_layers 的键
+
+
+def _open_segment(name: str) -> shared_memory.SharedMemory:
+    """以只附加的方式打开已有的共享内存段
+
+    工作进程由 multiprocessing 启动，与创建者共用同一个 resource_tracker，
+    重复登记不会产生额外记录；共享内存只由创建者（SharedLayerStore）删除。
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+
+class SharedLayerStore:
+    """在一批任务期间持有共享内存图层，退出时统一释放
+
+    被新图层取代的共享内存（如换成更大的平铺图案）在没有进行中的任务引用时立即删除：
+    提交任务前 retain 其用到的图层，任务结束后 release。
+
+    用法:
+        with SharedLayerStore() as store:
+            handle = store.publish(image, key)
+            store.retain([handle])
+            ...  # 把 handle 传给工作进程，任务结束后 store.release([handle])
+            store.retire([handle])  # 之后的任务不再使用
+    """
+
+    def __init__(self):
+        self._segments: Dict[str, shared_memory.SharedMemory] = {}
+        self._refs: Dict[str, int] = {}  # 名称 -> 引用它的进行中任务数
+        self._retired: Set[str] = set()  # 已被取代、等待最后一个任务结束的共享内存
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """当前持有的共享内存段数"""
+        return len(self._segments)
+
+    def publish(self, image: Image.Image, key: tuple) -> SharedLayerHandle:
+        """将图片写入一块新的共享内存
+
+        Args:
+            image: RGBA 图片
+            key: 图层键
+
+        Returns:
+            SharedLayerHandle: 共享图层描述
+        """
+        if image.mode != 'RGBA':
+            image = image.convert('RGBA')
+        data = image.tobytes()
+        segment = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+        segment.buf[:len(data)] = data
+        with self._lock:
+            self._segments[segment.name] = segment
+        return SharedLayerHandle(segment.name, image.size, image.mode, key)
+
+    def retain(self, handles: Iterable[SharedLayerHandle]) -> None:
+        """登记一个进行中的任务引用了这些图层"""
+        with self._lock:
+            for handle in handles:
+                self._refs[handle.name] = self._refs.get(handle.name, 0) + 1
+
+    def release(self, handles: Iterable[SharedLayerHandle]) -> None:
+        """任务结束，已被取代且不再被引用的图层随即删除"""
+        with self._lock:
+            for handle in handles:
+                count = self._refs.get(handle.name, 0) - 1
+                if count > 0:
+                    self._refs[handle.name] = count
+                    continue
+                self._refs.pop(handle.name, None)
+                if handle.name in self._retired:
+                    self._unlink(handle.name)
+
+    def retire(self, handles: Iterable[SharedLayerHandle]) -> None:
+        """之后提交的任务不再使用这些图层，没有任务引用时立即删除"""
+        with self._lock:
+            for handle in handles:
+                if self._refs.get(handle.name):
+                    self._retired.add(handle.name)
+                else:
+                    self._unlink(handle.name)
+
+    def _unlink(self, name: str) -> None:
+        """关闭并删除一块共享内存（调用方持有锁）"""
+        self._retired.discard(name)
+        segment = self._segments.pop(name, None)
+        if segment is None:
+            return
+        try:
+            segment.close()
+        finally:
+            try:
+                segment.unlink()
+            except FileNotFoundError:
+                pass
+
+    def close(self) -> None:
+        """关闭并删除本批创建的所有共享内存"""
+        with self._lock:
+            for name in list(self._segments):
+                self._unlink(name)
+            self._refs.clear()
+
+    def __enter__(self) -> 'SharedLayerStore':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+# 工作进程中已附加的共享内存，名称 -> (共享内存段, 图片视图)
+_attached: Dict[str, Tuple[shared_memory.SharedMemory, Image.Image]] = {}
+# 释放时仍被引用、尚未关闭的共享内存段
+_closing: List[shared_memory.SharedMemory] = []
+
+
+def attach_layer(handle: SharedLayerHandle) -> Image.Image:
+    """在工作进程中把共享图层映射为只读图片，不复制像素
+
+    Args:
+        handle: 共享图层描述
+
+    Returns:
+        Image.Image: 直接引用共享内存的图片
+    """
+    attached = _attached.get(handle.name)
+    if attached is not None:
+        return attached[1]
+    segment = _open_segment(handle.name)
+    image = Image.frombuffer(handle.mode, handle.size, segment.buf, 'raw', handle.mode, 0, 1)
+    _attached[handle.name] = (segment, image)
+    return image
+
+
+def attach_layers(handles: Tuple[SharedLayerHandle, ...]) -> Dict[tuple, Image.Image]:
+    """附加一组共享图层，返回键到图片视图的映射"""
+    return {handle.key: attach_layer(handle) for handle in handles}
+
+
+def _close_segments(segments: List[shared_memory.SharedMemory]) -> None:
+    """关闭共享内存段，仍有图片引用而无法关闭的留到下次再试"""
+    for segment in segments:
+        try:
+            segment.close()
+        except BufferError:
+            _closing.append(segment)
+
+
+def detach_except(handles: Tuple[SharedLayerHandle, ...]) -> None:
+    """释放工作进程中不属于当前这组图层的共享内存（已被取代的平铺图案等）
+
+    应在 ImageProcessor.set_shared_layers 换上新图层之后调用，旧的图片视图已不再被引用。
+    """
+    keep = {handle.name for handle in handles}
+    stale = [name for name in _attached if name not in keep]
+    segments = [_attached.pop(name)[0] for name in stale]
+    retry = _closing[:]
+    _closing.clear()
+    _close_segments(retry + segments)
+
+
+def detach_all() -> None:
+    """释放工作进程中所有已附加的共享图层"""
+    detach_except(())
@@ -7,10 +7,16 @@ import os
 from datetime import datetime
 
 class WatermarkTemplate:
-    """水印模板类"""
-    def __init__(self, name: str, settings: Dict):
+    """水印模板类
+
+    settings 保存当前编辑的水印，layers 保存整个已固定的图层栈（从下到上）。
+    """
+    def __init__(self, name: str, settings: Dict, layers: Optional[List[Dict]] = None):
         self.name = name
-        self.settings = settings
+        self.settings = {k: v for k, v in settings.items() if k != 'layers'}
+        if layers is None:
+            layers = settings.get('layers') or []
+        self.layers = [dict(layer) for layer in layers]
         self.created_at = datetime.now().isoformat()
         self.last_used = self.created_at
         
@@ -19,6 +25,7 @@ class WatermarkTemplate:
         return {
             'name': self.name,
             'settings': self.settings,
+            'layers': self.layers,
             'created_at': self.created_at,
             'last_used': self.last_used
         }
@@ -26,7 +33,7 @@ class WatermarkTemplate:
     @classmethod
     def from_dict(cls, data: Dict) -> 'WatermarkTemplate':
         """从字典创建模板"""
-        template = cls(data['name'], data['settings'])
+        template = cls(data['name'], data['settings'], data.get('layers', []))
         template.created_at = data['created_at']
         template.last_used = data['last_used']
         return template
@@ -68,12 +75,14 @@ class TemplateManager:
             print(f"Error saving templates: {e}")
             return False
             
-    def add_template(self, name: str, settings: Dict) -> bool:
+    def add_template(self, name: str, settings: Dict,
+                     layers: Optional[List[Dict]] = None) -> bool:
         """添加模板
         
         Args:
             name: 模板名称
             settings: 水印设置
+            layers: 图层栈，为 None 时取 settings['layers']
             
         Returns:
             bool: 是否成功添加
@@ -82,23 +91,27 @@ class TemplateManager:
         if any(t.name == name for t in self.templates):
             return False
             
-        template = WatermarkTemplate(name, settings)
+        template = WatermarkTemplate(name, settings, layers)
         self.templates.append(template)
         return self.save_templates()
         
-    def update_template(self, name: str, settings: Dict) -> bool:
+    def update_template(self, name: str, settings: Dict,
+                        layers: Optional[List[Dict]] = None) -> bool:
         """更新模板
         
         Args:
             name: 模板名称
             settings: 新的水印设置
+            layers: 新的图层栈，为 None 时取 settings['layers']
             
         Returns:
             bool: 是否成功更新
         """
         for template in self.templates:
             if template.name == name:
-                template.settings = settings
+                updated = WatermarkTemplate(name, settings, layers)
+                template.settings = updated.settings
+                template.layers = updated.layers
                 template.last_used = datetime.now().isoformat()
                 return self.save_templates()
         return False
@@ -125,13 +138,13 @@ class TemplateManager:
             name: 模板名称
             
         Returns:
-            Optional[Dict]: 模板设置，如果不存在返回None
+            Optional[Dict]: 模板设置（包含 'layers' 图层栈），如果不存在返回None
         """
         for template in self.templates:
             if template.name == name:
                 template.last_used = datetime.now().isoformat()
                 self.save_templates()
-                return template.settings
+                return dict(template.settings, layers=[dict(l) for l in template.layers])
         return None
         
     def get_template_names(self) -> List[str]:
@@ -157,6 +170,6 @@ class TemplateManager:
             reverse=True
         )
         return [
-            {'name': t.name, 'settings': t.settings}
+            {'name': t.name, 'settings': t.settings, 'layers': t.layers}
             for t in sorted_templates[:limit]
         ]
\ No newline at end of file
@@ -0,0 +1,192 @@
+"""
+文本水印变量模块
+
+支持在水印文本中使用按图片变化的变量，例如:
+    "© Studio {exif:DateTimeOriginal} #{counter}"
+    "{filename}"
+
+可用变量:
+    {filename}          文件名（含扩展名）
+    {stem}              文件名（不含扩展名）
+    {counter}           批处理序号，可带格式，如 {counter:04d}
+    {exif:标签名}        EXIF 字段，如 {exif:DateTimeOriginal}、{exif:Model}
+    {{ 和 }}             字面量花括号
+
+文本中固定的部分只渲染一次并缓存，每张图片只渲染变量部分再拼接。
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from collections import OrderedDict
+from PIL import Image, ImageDraw, ImageFont, ExifTags
+import os
+import re
+
+# 片段: ('static', 文本) 或 ('token', 名称, 参数)
+Segment = Tuple[str, ...]
+
+_TOKEN_PATTERN = re.compile(r'\{\{|\}\}|\{([a-z]+)(?::([^{}]*))?\}')
+_KNOWN_TOKENS = ('filename', 'stem', 'counter', 'exif')
+_EXIF_IFD_POINTER = 0x8769
+_EXIF_TAG_IDS = {name: tag for tag, name in ExifTags.TAGS.items()}
+
+
+def parse_template(text: str) -> List[Segment]:
+    """将水印文本解析为固定片段和变量片段
+
+    Args:
+        text: 水印文本
+
+    Returns:
+        List[Segment]: 片段列表，相邻的固定文本会被合并
+    """
+    segments: List[Segment] = []
+    static = []
+    position = 0
+    for match in _TOKEN_PATTERN.finditer(text):
+        static.append(text[position:match.start()])
+        position = match.end()
+        token = match.group(0)
+        if token in ('{{', '}}'):
+            static.append(token[0])
+        elif match.group(1) in _KNOWN_TOKENS:
+            if any(static):
+                segments.append(('static', ''.join(static)))
+            static = []
+            segments.append(('token', match.group(1), match.group(2) or ''))
+        else:
+            # 未知变量按原样保留
+            static.append(token)
+    static.append(text[position:])
+    if any(static):
+        segments.append(('static', ''.join(static)))
+    return segments
+
+
+def has_tokens(text: str) -> bool:
+    """文本中是否包含变量"""
+    return any(segment[0] == 'token' for segment in parse_template(text))
+
+
+def read_exif(image_path: str) -> Dict[int, Any]:
+    """只读取文件头中的 EXIF 信息，不解码像素
+
+    Args:
+        image_path: 图片路径
+
+    Returns:
+        Dict[int, Any]: 标签号到值的映射，包含 Exif 子 IFD 中的字段
+    """
+    try:
+        with Image.open(image_path) as img:
+            exif = img.getexif()
+            values = dict(exif)
+            values.update(exif.get_ifd(_EXIF_IFD_POINTER))
+            return values
+    except Exception:
+        return {}
+
+
+class TokenContext:
+    """单张图片的变量取值上下文，EXIF 在第一次用到时才读取"""
+
+    def __init__(self, image_path: Optional[str] = None, counter: int = 1):
+        self.image_path = image_path
+        self.counter = counter
+        self._exif = None
+
+    def resolve(self, name: str, argument: str) -> str:
+        """获取某个变量在当前图片上的取值"""
+        if name == 'counter':
+            try:
+                return format(self.counter, argument) if argument else str(self.counter)
+            except ValueError:
+                return str(self.counter)
+        if not self.image_path:
+            return ''
+        if name == 'filename':
+            return os.path.basename(self.image_path)
+        if name == 'stem':
+            return os.path.splitext(os.path.basename(self.image_path))[0]
+        if name == 'exif':
+            if self._exif is None:
+                self._exif = read_exif(self.image_path)
+            value = self._exif.get(_EXIF_TAG_IDS.get(argument, -1), '')
+            if isinstance(value, bytes):
+                value = value.decode('utf-8', 'replace')
+            return str(value).strip('\x00 ')
+        return ''
+
+    def resolve_all(self, segments: List[Segment]) -> Tuple[str, ...]:
+        """获取所有变量片段的取值"""
+        return tuple(self.resolve(seg[1], seg[2]) for seg in segments if seg[0] == 'token')
+
+
+class TokenTextRenderer:
+    """渲染带变量的文本水印
+
+    每个文本片段渲染为一段与基线对齐的字形条，按 (文本, 字体, 颜色) 放入 LRU 缓存。
+    固定片段和变量片段分开缓存，变量的大量不同取值（如文件名）不会把固定片段挤出缓存；
+    长时间运行的服务中模板、字号和颜色不断变化，两个缓存都有上限。
+    """
+    RUN_CACHE_SIZE = 256
+
+    def __init__(self):
+        self._static_runs: OrderedDict = OrderedDict()
+        self._dynamic_runs: OrderedDict = OrderedDict()
+
+    def render(self, segments: List[Segment], values: Tuple[str, ...],
+               font: ImageFont.FreeTypeFont, fill: Tuple[int, int, int, int],
+               font_key: tuple, stroke: Optional[Tuple[int, tuple]] = None) -> Image.Image:
+        """将所有片段横向拼接为一个文本图层（未加边距、未旋转）
+
+        Args:
+            segments: parse_template 的结果
+            values: 变量片段的取值，顺序与 segments 中的变量一致
+            font: 字体
+            fill: RGBA 颜色
+            font_key: 用于缓存的字体标识 (字体名, 字号)
+            stroke: 描边 (宽度, RGBA 颜色)，None 表示不描边
+
+        Returns:
+            Image.Image: 文本图层
+        """
+        runs = []
+        value_iter = iter(values)
+        for segment in segments:
+            if segment[0] == 'static':
+                text, cache = segment[1], self._static_runs
+            else:
+                text, cache = next(value_iter, ''), self._dynamic_runs
+                if not text:
+                    continue
+            key = (text, font_key, fill, stroke)
+            run = cache.get(key)
+            if run is None:
+                run = self._render_run(text, font, fill, stroke)
+                cache[key] = run
+                while len(cache) > self.RUN_CACHE_SIZE:
+                    cache.popitem(last=False)
+            else:
+                cache.move_to_end(key)
+            runs.append(run)
+
+        width = sum(run.size[0] for run in runs)
+        height = max((run.size[1] for run in runs), default=1)
+        layer = Image.new('RGBA', (max(1, width), height), (255, 255, 255, 0))
+        x = 0
+        for run in runs:
+            layer.paste(run, (x, 0))
+            x += run.size[0]
+        return layer
+
+    @staticmethod
+    def _render_run(text: str, font: ImageFont.FreeTypeFont,
+                    fill: Tuple[int, int, int, int],
+                    stroke: Optional[Tuple[int, tuple]] = None) -> Image.Image:
+        """渲染单个片段，宽度为字形前进宽度，基线统一位于 ascent 处（描边时四周各加描边宽度）"""
+        stroke_width, stroke_fill = stroke or (0, None)
+        ascent, descent = font.getmetrics()
+        width = max(1, int(round(font.getlength(text))) + 2 * stroke_width)
+        run = Image.new('RGBA', (width, ascent + descent + 2 * stroke_width), (255, 255, 255, 0))
+        ImageDraw.Draw(run).text((stroke_width, ascent + stroke_width), text, font=font, fill=fill,
+                                 anchor='ls', stroke_width=stroke_width, stroke_fill=stroke_fill)
+        return run
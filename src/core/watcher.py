@@ -0,0 +1,364 @@
+"""
+监视文件夹模块
+
+持续监视一个输入文件夹，自动为新增或修改过的图片加水印并导出。
+
+用 os.scandir 轮询目录，按 (修改时间, 大小) 与持久化的索引比较来发现变化，
+已处理且未变化的文件只需要一次 stat；Linux 上可用 inotify 在目录变化时立即唤醒，
+省去空闲时的轮询等待。文件在连续 settle_time 秒内大小和修改时间都不变时才视为写入完成。
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import threading
+import time
+
+from .batch import ExportResult, ExportSettings, export_file
+from .image_processor import ImageProcessor
+from .journal import ExportJournal
+from .animation import ANIMATED_FORMATS
+from ..utils.file_utils import is_image_file
+
+# 文件签名: (修改时间纳秒, 文件大小)
+Signature = Tuple[int, int]
+
+
+class WatchIndex:
+    """已处理文件的索引，保存在输出目录中，重启后不必重新处理未变化的文件
+
+    索引与导出设置的哈希绑定，设置改变后旧索引作废，所有文件会按新设置重新导出。
+    """
+    FILENAME = '.watermark_watch_index.json'
+
+    def __init__(self, index_path: str, settings_hash: str):
+        self.index_path = index_path
+        self.settings_hash = settings_hash
+        self._files: Dict[str, Signature] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+
+    @classmethod
+    def for_output_dir(cls, output_dir: str, settings_hash: str) -> 'WatchIndex':
+        """获取输出目录对应的索引"""
+        return cls(os.path.join(output_dir, cls.FILENAME), settings_hash)
+
+    def load(self) -> None:
+        """从文件加载索引，文件不存在、损坏或设置不同时为空索引"""
+        self._files = {}
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('settings_hash') == self.settings_hash:
+            self._files = {path: tuple(sig) for path, sig in data.get('files', {}).items()}
+
+    def save(self) -> bool:
+        """有变化时原子地写回索引
+
+        Returns:
+            bool: 是否保存成功
+        """
+        with self._lock:
+            if not self._dirty:
+                return True
+            data = {'settings_hash': self.settings_hash, 'files': dict(self._files)}
+            self._dirty = False
+        temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.index_path) or '.', exist_ok=True)
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, self.index_path)
+            return True
+        except Exception as e:
+            print(f"Error saving watch index: {e}")
+            with self._lock:
+                self._dirty = True
+            return False
+
+    def get(self, path: str) -> Optional[Signature]:
+        """获取文件处理时的签名"""
+        return self._files.get(path)
+
+    def mark(self, path: str, signature: Signature) -> None:
+        """记录文件已按该签名处理"""
+        with self._lock:
+            self._files[path] = signature
+            self._dirty = True
+
+    def retain(self, paths) -> None:
+        """只保留仍然存在的文件"""
+        with self._lock:
+            removed = [path for path in self._files if path not in paths]
+            for path in removed:
+                del self._files[path]
+            self._dirty = self._dirty or bool(removed)
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+
+class _Waker:
+    """在两次扫描之间等待，可被 wake() 提前唤醒"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def wait(self, timeout: float) -> None:
+        self._event.wait(timeout)
+        self._event.clear()
+
+    def wake(self) -> None:
+        self._event.set()
+
+    def close(self) -> None:
+        pass
+
+
+class _InotifyWaker(_Waker):
+    """Linux 上用 inotify 在目录变化时唤醒；事件只作为提醒，变化仍由扫描确定"""
+    _IN_MODIFY = 0x00000002
+    _IN_CLOSE_WRITE = 0x00000008
+    _IN_MOVED_TO = 0x00000080
+    _IN_CREATE = 0x00000100
+    _IN_NONBLOCK = 0o4000
+    _IN_CLOEXEC = 0o2000000
+
+    def __init__(self, inotify_fd: int):
+        super().__init__()
+        self._fd = inotify_fd
+        self._wake_read, self._wake_write = os.pipe()
+        os.set_blocking(self._wake_read, False)
+
+    @classmethod
+    def create(cls, folder: str) -> Optional['_InotifyWaker']:
+        """为目录创建 inotify 监视，不可用时返回 None"""
+        if not hasattr(select, 'select') or not os.path.isdir('/proc/self'):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            fd = libc.inotify_init1(cls._IN_NONBLOCK | cls._IN_CLOEXEC)
+            if fd < 0:
+                return None
+            mask = cls._IN_MODIFY | cls._IN_CLOSE_WRITE | cls._IN_MOVED_TO | cls._IN_CREATE
+            if libc.inotify_add_watch(fd, os.fsencode(folder), mask) < 0:
+                os.close(fd)
+                return None
+        except (OSError, AttributeError):
+            return None
+        return cls(fd)
+
+    def wait(self, timeout: float) -> None:
+        readable, _, _ = select.select([self._fd, self._wake_read], [], [], timeout)
+        # 清空已到达的事件，一次扫描就能处理它们
+        for fd in readable:
+            try:
+                while os.read(fd, 65536):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def wake(self) -> None:
+        try:
+            os.write(self._wake_write, b'\0')
+        except OSError:
+            pass
+
+    def close(self) -> None:
+        for fd in (self._fd, self._wake_read, self._wake_write):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+class FolderWatcher:
+    """监视输入文件夹并自动导出新图片
+
+    用法:
+        watcher = FolderWatcher(input_dir, settings)
+        watcher.run()  # 阻塞直到 stop() 被调用
+    """
+
+    def __init__(self, input_dir: str, settings: ExportSettings,
+                 workers: Optional[int] = None,
+                 max_backlog: Optional[int] = None,
+                 settle_time: float = 2.0,
+                 poll_interval: float = 5.0,
+                 use_inotify: bool = True,
+                 on_result: Optional[Callable[[ExportResult], None]] = None):
+        """
+        Args:
+            input_dir: 监视的文件夹
+            settings: 导出设置
+            workers: 工作线程数，默认 CPU 核数
+            max_backlog: 已提交但未完成的最大任务数，默认 workers * 2；
+                超出的文件留在待处理列表中，下次扫描再提交
+            settle_time: 文件保持不变多少秒后视为写入完成
+            poll_interval: 没有待处理文件时两次扫描的间隔（秒）
+            use_inotify: 是否在可用时使用 inotify
+            on_result: 每个文件处理完后在工作线程中调用
+        """
+        self.input_dir = os.path.abspath(input_dir)
+        self.settings = settings
+        self.workers = workers or os.cpu_count() or 1
+        self.max_backlog = max(1, max_backlog or self.workers * 2)
+        self.settle_time = settle_time
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.on_result = on_result
+
+        settings_hash = ExportJournal.settings_hash(settings.to_json_dict())
+        self._index = WatchIndex.for_output_dir(settings.output_dir, settings_hash)
+        self._index.load()
+        # 正在等待写入完成的文件: 路径 -> (签名, 开始保持不变的时间)
+        self._candidates: Dict[str, Tuple[Signature, float]] = {}
+        self._in_flight: Dict[str, Signature] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._counter = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._waker: _Waker = _Waker()
+        self._stopped = False
+
+    def _is_own_output(self, path: str) -> bool:
+        """输出目录与输入目录相同时，跳过本程序写出的文件"""
+        if os.path.abspath(self.settings.output_dir) != self.input_dir:
+            return False
+        name = os.path.basename(path)
+        stem, ext = os.path.splitext(name)
+        # 多帧图片的输出可能改用 ANIMATED_FORMATS 中的格式
+        return stem.startswith(self.settings.prefix) and any(
+            ext.lower() in (f".{(rendition.format or self.settings.format).lower()}",
+                            *(f".{format.lower()}" for format in ANIMATED_FORMATS))
+            and stem.endswith(self.settings.suffix + rendition.suffix)
+            for rendition in self.settings.get_renditions()
+        )
+
+    def scan(self) -> Dict[str, Signature]:
+        """扫描输入文件夹中的图片
+
+        Returns:
+            Dict[str, Signature]: 路径 -> 签名
+        """
+        found = {}
+        with os.scandir(self.input_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith('.') or not is_image_file(entry.name):
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                if not self._is_own_output(entry.path):
+                    found[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        return found
+
+    def poll_once(self, now: Optional[float] = None) -> int:
+        """扫描一次，提交已经写入完成的新文件
+
+        Args:
+            now: 当前时间（time.monotonic），默认取当前值
+
+        Returns:
+            int: 本次提交的文件数
+        """
+        now = time.monotonic() if now is None else now
+        found = self.scan()
+        self._index.retain(found)
+
+        with self._lock:
+            in_flight = dict(self._in_flight)
+        for path in list(self._candidates):
+            if path not in found:
+                del self._candidates[path]
+        for path, signature in found.items():
+            if self._index.get(path) == signature or in_flight.get(path) == signature:
+                self._candidates.pop(path, None)
+                continue
+            candidate = self._candidates.get(path)
+            if candidate is None or candidate[0] != signature:
+                # 新文件或仍在写入，重新开始计时
+                self._candidates[path] = (signature, now)
+
+        ready = sorted(
+            (since, path) for path, (signature, since) in self._candidates.items()
+            if signature[1] > 0 and now - since >= self.settle_time
+        )
+        submitted = 0
+        for _, path in ready:
+            with self._lock:
+                if len(self._in_flight) >= self.max_backlog:
+                    break
+                if path in self._in_flight:
+                    # 旧版本仍在处理，完成后再处理新版本
+                    continue
+                signature = self._candidates.pop(path)[0]
+                self._in_flight[path] = signature
+                self._counter += 1
+                counter = self._counter
+            future = self._executor.submit(self._export, path, counter)
+            future.add_done_callback(lambda f, p=path, s=signature: self._on_done(f, p, s))
+            submitted += 1
+        return submitted
+
+    def _export(self, path: str, counter: int) -> ExportResult:
+        # 每个线程复用自己的处理器，以保留图层缓存
+        if not hasattr(self._local, 'processor'):
+            self._local.processor = ImageProcessor()
+        return export_file(path, self.settings, self._local.processor, counter)
+
+    def _on_done(self, future: Future, path: str, signature: Signature) -> None:
+        with self._lock:
+            self._in_flight.pop(path, None)
+        if future.cancelled():
+            return
+        try:
+            result = future.result()
+        except Exception as e:
+            result = ExportResult(path, self.settings.output_path_for(path), error=str(e))
+        # 失败的文件也记入索引，文件内容改变后才会重试
+        self._index.mark(path, signature)
+        if self.on_result:
+            self.on_result(result)
+        # 积压队列有了空位，尽快提交等待中的文件
+        self._waker.wake()
+
+    def run(self) -> None:
+        """持续监视，直到 stop() 被调用"""
+        os.makedirs(self.settings.output_dir, exist_ok=True)
+        if self.use_inotify:
+            self._waker = _InotifyWaker.create(self.input_dir) or _Waker()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            while not self._stopped:
+                self.poll_once()
+                self._index.save()
+                if self._stopped:
+                    break
+                # 有文件在等待写入完成时按 settle_time 复查，否则空闲等待
+                self._waker.wait(min(self.settle_time, self.poll_interval)
+                                 if self._candidates else self.poll_interval)
+        finally:
+            self._executor.shutdown(wait=True)
+            self._index.save()
+            self._waker.close()
+
+    def stop(self) -> None:
+        """请求停止，正在处理的文件完成后 run() 返回"""
+        self._stopped = True
+        self._waker.wake()
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取当前状态: 已索引、等待写入完成、处理中的文件数"""
+        with self._lock:
+            in_flight = len(self._in_flight)
+        return {'indexed': len(self._index), 'settling': len(self._candidates),
+                'in_flight': in_flight}
@@ -1,15 +1,35 @@
+import multiprocessing
 import sys
-from PyQt6.QtWidgets import QApplication
-from .ui.main_window import MainWindow
+
+
+def configure_multiprocessing():
+    """设置导出工作进程的启动方式
+
+    界面进程已加载 Qt 并运行着多个线程，直接 fork 出的工作进程会继承整个 Qt 进程，
+    在多线程进程中 fork 也不安全。有 forkserver 时（Linux）工作进程从一个只预加载了批量导出引擎
+    （src.core.batch）的干净服务进程 fork 出来，启动快且不含 Qt；否则（Windows、macOS、打包后的程序）使用 spawn。
+    Qt 只在 main() 中导入，spawn 出的工作进程重新导入本模块时不会加载 PyQt6。
+    """
+    if not getattr(sys, 'frozen', False) and 'forkserver' in multiprocessing.get_all_start_methods():
+        multiprocessing.set_start_method('forkserver', force=True)
+        multiprocessing.set_forkserver_preload(['src.core.batch'])
+    else:
+        multiprocessing.set_start_method('spawn', force=True)
+
 
 def main():
     """应用程序主入口"""
+    configure_multiprocessing()
+
+    from PyQt6.QtWidgets import QApplication
+    from .ui.main_window import MainWindow
+
     app = QApplication(sys.argv)
-    
+
     # 设置应用程序信息
     app.setOrganizationName("YourCompany")
     app.setApplicationName("Photo Watermark Advanced")
-    
+
     # 加载和应用样式表
     try:
         with open("styles/style.qss", "r") as f:
@@ -19,17 +39,8 @@ def main():
 
     main_win = MainWindow()
     main_win.show()
-    
+
     return app.exec()
 
 if __name__ == '__main__':
-    # 为了让这个脚本也能被直接运行（主要用于开发），
-    # 我们需要临时将项目根目录添加到 sys.path
-    import os
-    # 将当前文件路径的上两级目录（即项目根目录）添加到 sys.path
-    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-    
-    # 现在，我们可以像从外部调用一样，使用绝对路径导入
-    from src.ui.main_window import MainWindow
-    
-    sys.exit(main())
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,214 @@
+"""
+本地水印 HTTP 服务（不需要图形界面）
+
+用法:
+    python -m src.server [--host 127.0.0.1] [--port 8765] [--workers N]
+                         [--max-batch 8] [--max-delay-ms 5] [--templates-file templates.json]
+                         [--root 目录]
+
+接口:
+    POST /watermark?template=模板名&format=JPEG&quality=95&profile=balanced
+        请求体为图片字节，返回加好水印的图片
+    POST /watermark?template=模板名&path=相对路径
+        请求体为空，处理 --root 目录下的文件；未指定 --root 时不接受 path 参数
+    GET /health
+        返回 JSON 格式的状态和批处理统计
+
+不指定 template 时使用配置文件中的默认水印。服务只用于本机，默认只监听 127.0.0.1。
+"""
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+
+from .core.encoder import DEFAULT_PROFILE
+from .core.service import BatchingRenderer, WatermarkRequest, WatermarkResponse
+
+MAX_BODY_SIZE = 200 * 1024 * 1024
+_REASONS = {200: 'OK', 400: 'Bad Request', 403: 'Forbidden', 404: 'Not Found',
+            405: 'Method Not Allowed', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+    """读取一个 HTTP/1.1 请求，连接关闭时返回 None"""
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+    lines = head.decode('latin-1').split('\r\n')
+    method, target, _ = lines[0].split(' ', 2)
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length', 0))
+    if length > MAX_BODY_SIZE:
+        raise ValueError('payload too large')
+    body = await reader.readexactly(length) if length else b''
+    return method, target, headers, body
+
+
+def _write_response(writer: asyncio.StreamWriter, status: int, body: bytes,
+                    content_type: str, keep_alive: bool) -> None:
+    """写出 HTTP 响应"""
+    header = (
+        f"HTTP/1.1 {status} {_REASONS.get(status, 'Error')}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    writer.write(header.encode('latin-1'))
+    writer.write(body)
+
+
+def _error(status: int, message: str) -> WatermarkResponse:
+    return WatermarkResponse(json.dumps({'error': message}).encode('utf-8'),
+                             'application/json', message, status)
+
+
+class WatermarkServer:
+    """把 HTTP 请求转换为 WatermarkRequest 并交给 BatchingRenderer
+
+    服务没有身份验证，path 参数只能指向 root 目录内的文件（解析符号链接和 .. 之后），
+    否则本机任何进程都能借服务读取它能访问的任意文件。
+    """
+
+    def __init__(self, renderer: BatchingRenderer, root: Optional[str] = None):
+        """
+        Args:
+            renderer: 批量渲染器
+            root: 允许通过 path 参数读取的目录，None 表示只接受上传的图片
+        """
+        self.renderer = renderer
+        self.root = os.path.realpath(root) if root else None
+
+    def resolve_path(self, path: str) -> Optional[str]:
+        """把 path 参数解析为 root 目录内的真实路径，不在 root 内时返回 None"""
+        if self.root is None:
+            return None
+        try:
+            resolved = os.path.realpath(os.path.join(self.root, path))
+        except ValueError:  # 路径中有空字符等
+            return None
+        if os.path.commonpath([resolved, self.root]) != self.root:
+            return None
+        return resolved
+
+    async def handle(self, method: str, target: str, body: bytes) -> WatermarkResponse:
+        """处理一个请求"""
+        url = urlsplit(target)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if url.path == '/health':
+            payload = dict(self.renderer.stats, status='ok', workers=self.renderer.workers)
+            return WatermarkResponse(json.dumps(payload).encode('utf-8'), 'application/json')
+        if url.path != '/watermark':
+            return _error(404, f"Unknown path: {url.path}")
+        if method != 'POST':
+            return _error(405, "Use POST")
+        if not body and not params.get('path'):
+            return _error(400, "Request body or 'path' parameter is required")
+        try:
+            quality = int(params.get('quality', 95))
+        except ValueError:
+            return _error(400, "Invalid quality")
+        path = None
+        if not body:
+            if self.root is None:
+                return _error(403, "The 'path' parameter is disabled; start the server with --root")
+            path = self.resolve_path(params['path'])
+            if path is None:
+                return _error(403, "Path is outside the served root directory")
+
+        response = await self.renderer.submit(WatermarkRequest(
+            template=params.get('template'),
+            data=body or None,
+            path=path,
+            format=params.get('format', 'JPEG'),
+            quality=quality,
+            profile=params.get('profile', DEFAULT_PROFILE),
+        ))
+        if response.error:
+            return _error(response.status, response.error)
+        return response
+
+    async def serve_connection(self, reader: asyncio.StreamReader,
+                               writer: asyncio.StreamWriter) -> None:
+        """处理一个连接上的所有请求（支持 keep-alive）"""
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except ValueError as e:
+                    _write_response(writer, 413 if 'large' in str(e) else 400,
+                                    b'', 'text/plain', False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                response = await self.handle(method, target, body)
+                _write_response(writer, response.status, response.data,
+                                response.content_type, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host: str, port: int, renderer: BatchingRenderer,
+                root: Optional[str] = None) -> None:
+    """启动服务，收到 SIGINT/SIGTERM 后关闭进程池并退出"""
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            # Windows 上不支持，Ctrl+C 仍会通过 KeyboardInterrupt 退出
+            pass
+
+    await renderer.start()
+    server = WatermarkServer(renderer, root)
+    try:
+        tcp_server = await asyncio.start_server(server.serve_connection, host, port)
+        print(f"Serving on http://{host}:{port} with {renderer.workers} workers", flush=True)
+        async with tcp_server:
+            await stop.wait()
+    finally:
+        await renderer.close()
+
+
+def main(argv=None) -> int:
+    """水印服务主入口"""
+    parser = argparse.ArgumentParser(description="本地水印 HTTP 服务")
+    parser.add_argument('--host', default='127.0.0.1', help="监听地址")
+    parser.add_argument('--port', type=int, default=8765, help="监听端口")
+    parser.add_argument('--workers', type=int, default=None, help="工作进程数")
+    parser.add_argument('--max-batch', type=int, default=8, help="每批最多请求数")
+    parser.add_argument('--max-delay-ms', type=float, default=5.0, help="凑批最长等待时间（毫秒）")
+    parser.add_argument('--templates-file', default='templates.json', help="模板文件")
+    parser.add_argument('--root', default=None,
+                        help="允许通过 path 参数处理的目录，不指定时只接受上传的图片")
+    args = parser.parse_args(argv)
+
+    renderer = BatchingRenderer(workers=args.workers, max_batch=args.max_batch,
+                                max_delay=args.max_delay_ms / 1000.0,
+                                templates_file=args.templates_file)
+    try:
+        asyncio.run(serve(args.host, args.port, renderer, args.root))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
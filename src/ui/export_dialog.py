@@ -1,7 +1,13 @@
 from PyQt6.QtWidgets import (
     QDialog, QFormLayout, QLineEdit, QPushButton, QHBoxLayout,
-    QComboBox, QSpinBox, QDialogButtonBox, QFileDialog
+    QComboBox, QSpinBox, QDialogButtonBox, QFileDialog, QCheckBox
 )
+from PyQt6.QtCore import Qt
+from ..core.batch import Rendition
+from ..core.memory_budget import default_memory_budget
+from ..core.encoder import (DEFAULT_PROFILE, PROFILE_DESCRIPTIONS, get_output_formats,
+                            get_profile_names)
+from ..core.color_management import is_available as color_management_available
 
 class ExportDialog(QDialog):
     """导出设置对话框"""
@@ -34,15 +40,69 @@ class ExportDialog(QDialog):
 
         # 格式选择
         self.format = QComboBox()
-        self.format.addItems(["JPEG", "PNG"])
+        self.format.addItems(get_output_formats())
         layout.addRow("输出格式:", self.format)
 
+        # 多尺寸导出：每张图片只解码一次，从大到小依次输出
+        self.sizes = QLineEdit()
+        self.sizes.setPlaceholderText("原图, 2048, 400")
+        self.sizes.setToolTip("用逗号分隔的最长边像素，“原图”表示原尺寸；留空只导出原尺寸。\n"
+                              "缩小的版本在文件名后缀后再加上 _像素数")
+        layout.addRow("输出尺寸:", self.sizes)
+
+        # 编码档位：速度与文件大小的权衡
+        self.profile = QComboBox()
+        for name in get_profile_names():
+            self.profile.addItem(name)
+            self.profile.setItemData(self.profile.count() - 1, PROFILE_DESCRIPTIONS.get(name, ''),
+                                     Qt.ItemDataRole.ToolTipRole)
+        self.profile.setCurrentText(DEFAULT_PROFILE)
+        layout.addRow("编码档位:", self.profile)
+
+        # 输出方式：逐个写文件，或直接写入一个归档
+        self.archive = QComboBox()
+        self.archive.addItem("文件夹", "")
+        self.archive.addItem("ZIP 压缩包", "zip")
+        self.archive.addItem("TAR 归档", "tar")
+        layout.addRow("输出方式:", self.archive)
+
+        # 色彩管理：带 ICC 配置文件的图片保留配置文件或转换到 sRGB
+        self.color_management = QComboBox()
+        self.color_management.addItem("不处理", "")
+        self.color_management.addItem("保留 ICC 配置文件", "keep")
+        self.color_management.addItem("转换为 sRGB", "srgb")
+        if not color_management_available():
+            self.color_management.setEnabled(False)
+            self.color_management.setToolTip("当前 Pillow 不支持 ICC 色彩管理（缺少 LittleCMS）")
+        layout.addRow("色彩管理:", self.color_management)
+
         # 质量设置
         self.quality = QSpinBox()
         self.quality.setRange(1, 100)
         self.quality.setValue(95)
         layout.addRow("图片质量:", self.quality)
 
+        # 内存预算（0 表示不限制）
+        self.memory_budget = QSpinBox()
+        self.memory_budget.setRange(0, 1024 * 1024)
+        self.memory_budget.setSuffix(" MB")
+        self.memory_budget.setSpecialValueText("不限制")
+        self.memory_budget.setValue((default_memory_budget() or 0) // (1024 * 1024))
+        layout.addRow("内存预算:", self.memory_budget)
+
+        # 多进程导出（水印图层通过共享内存分发给各进程）
+        self.use_processes = QCheckBox("使用多进程")
+        layout.addRow("并行方式:", self.use_processes)
+
+        # 内容相同的图片只处理一次，其余复用输出文件
+        self.skip_duplicates = QCheckBox("跳过重复图片")
+        layout.addRow("重复检测:", self.skip_duplicates)
+
+        # 先处理预计耗时最长的图片，避免最后剩下一张大图让其他线程空等
+        self.schedule_by_size = QCheckBox("大图优先")
+        self.schedule_by_size.setChecked(True)
+        layout.addRow("调度方式:", self.schedule_by_size)
+
         # 按钮
         buttons = QDialogButtonBox(
             QDialogButtonBox.StandardButton.Ok |
@@ -52,6 +112,26 @@ class ExportDialog(QDialog):
         buttons.rejected.connect(self.reject)
         layout.addRow(buttons)
 
+    def get_renditions(self) -> tuple:
+        """解析输出尺寸，无法识别的项会被忽略
+
+        Returns:
+            tuple: Rendition 元组，留空时为空元组（只导出原尺寸）
+        """
+        renditions = []
+        for item in self.sizes.text().replace('，', ',').split(','):
+            item = item.strip().lower()
+            if item in ('原图', '原尺寸', 'full', '0'):
+                size = 0
+            elif item.isdigit():
+                size = int(item)
+            else:
+                continue
+            rendition = Rendition(size, suffix=f"_{size}" if size else '')
+            if rendition not in renditions:
+                renditions.append(rendition)
+        return tuple(renditions)
+
     def browse_output_dir(self):
         """选择输出目录"""
         dir_path = QFileDialog.getExistingDirectory(self, "选择输出目录")
@@ -0,0 +1,110 @@
+"""
+导出进度对话框
+"""
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QLabel, QProgressBar,
+                             QPushButton, QListWidget)
+from .export_worker import ExportWorker
+
+
+class ExportProgressDialog(QDialog):
+    """显示后台导出的进度、吞吐量和剩余时间，并支持取消"""
+
+    def __init__(self, worker: ExportWorker, parent=None):
+        super().__init__(parent)
+        self._worker = worker
+        self._finished = False
+        self._init_ui()
+
+        worker.progress.connect(self._on_progress)
+        worker.finished_summary.connect(self._on_finished)
+
+    def _init_ui(self):
+        """初始化用户界面"""
+        self.setWindowTitle("正在导出")
+        self.setMinimumWidth(420)
+        layout = QVBoxLayout(self)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(0)
+        layout.addWidget(self.progress_bar)
+
+        self.stats_label = QLabel("准备中...")
+        layout.addWidget(self.stats_label)
+
+        # 导出完成后显示失败的文件
+        self.failure_list = QListWidget()
+        self.failure_list.hide()
+        layout.addWidget(self.failure_list)
+
+        self.action_btn = QPushButton("取消")
+        self.action_btn.clicked.connect(self._on_action)
+        layout.addWidget(self.action_btn)
+
+    @staticmethod
+    def _format_seconds(seconds) -> str:
+        """格式化秒数为 时:分:秒"""
+        if seconds is None:
+            return "--:--"
+        seconds = int(seconds)
+        hours, rest = divmod(seconds, 3600)
+        minutes, secs = divmod(rest, 60)
+        if hours:
+            return f"{hours}:{minutes:02d}:{secs:02d}"
+        return f"{minutes:02d}:{secs:02d}"
+
+    def _on_progress(self, stats: dict):
+        """更新进度显示"""
+        total = max(1, stats['total'])
+        self.progress_bar.setValue(int(stats['done'] * 100 / total))
+        self.stats_label.setText(
+            f"{stats['done']}/{stats['total']}  |  "
+            f"{stats['images_per_sec']:.1f} 张/秒  |  "
+            f"{stats['mb_per_sec']:.1f} MB/秒  |  "
+            f"剩余 {self._format_seconds(stats['eta'])}"
+        )
+
+    def _on_finished(self, summary: dict):
+        """显示导出结果汇总"""
+        self._finished = True
+        failures = summary['failures']
+        status = "已取消" if summary['cancelled'] else "完成"
+        self.setWindowTitle(f"导出{status}")
+        duplicates = f"跳过重复 {summary['duplicates']} 张，" if summary.get('duplicates') else ""
+        self.stats_label.setText(
+            f"{status}：成功 {summary['succeeded']} 张，{duplicates}失败 {len(failures)} 张，"
+            f"写入 {summary['bytes_written'] / (1024 * 1024):.1f} MB，"
+            f"用时 {self._format_seconds(summary['elapsed'])}"
+        )
+        schedule = summary.get('schedule')
+        if schedule and schedule['files']:
+            self.stats_label.setText(
+                self.stats_label.text() +
+                f"\n调度：预计 {self._format_seconds(schedule['predicted_makespan'])}，"
+                f"实际 {self._format_seconds(schedule['actual_makespan'])}"
+                f"（单张平均误差 {schedule['mean_error'] * 100:.0f}%）"
+            )
+        if not summary['cancelled']:
+            self.progress_bar.setValue(100)
+        if failures:
+            for path, error in failures:
+                self.failure_list.addItem(f"{path}: {error}" if path else error)
+            self.failure_list.show()
+        self.action_btn.setText("关闭")
+
+    def _on_action(self):
+        """取消导出或关闭对话框"""
+        if self._finished:
+            self.accept()
+        else:
+            self.action_btn.setEnabled(False)
+            self.action_btn.setText("正在取消...")
+            self._worker.cancel()
+            self._worker.finished_summary.connect(lambda _: self.action_btn.setEnabled(True))
+
+    def reject(self):
+        """按 Esc 或关闭窗口时先取消导出"""
+        if self._finished:
+            super().reject()
+        else:
+            self._on_action()
@@ -0,0 +1,96 @@
+"""
+后台导出线程模块
+"""
+from typing import Callable, Iterator, Optional
+from PyQt6.QtCore import QThread, pyqtSignal
+import time
+
+from ..core.batch import ExportResult
+from ..core.scheduler import ScheduleReport
+
+
+class ExportWorker(QThread):
+    """在后台线程中运行批量导出，并汇报进度
+
+    progress 信号携带的字典包含:
+        done, total, images_per_sec, mb_per_sec, eta (秒，未知时为 None)
+    finished_summary 信号携带的字典包含:
+        succeeded, duplicates, failures [(输入路径, 错误信息)], cancelled, elapsed, bytes_written,
+        schedule (ScheduleReport.summary()，未调度时为 None)
+    """
+    progress = pyqtSignal(dict)
+    finished_summary = pyqtSignal(dict)
+
+    def __init__(self, make_results: Callable[[], Iterator[ExportResult]],
+                 total: int, already_done: int = 0, parent=None,
+                 schedule_report: Optional[ScheduleReport] = None):
+        """
+        Args:
+            make_results: 返回导出结果迭代器的函数，在后台线程中调用
+            total: 文件总数
+            already_done: 之前已完成的文件数（继续导出时）
+            schedule_report: 由 iter_export 填写的调度报告
+        """
+        super().__init__(parent)
+        self._make_results = make_results
+        self._total = total
+        self._already_done = already_done
+        self._cancel_requested = False
+        self._schedule_report = schedule_report
+
+    def cancel(self):
+        """请求取消，正在处理的文件完成后停止，不会开始新的文件"""
+        self._cancel_requested = True
+
+    def run(self):
+        start = time.perf_counter()
+        done = self._already_done
+        processed = 0
+        succeeded = 0
+        duplicates = 0
+        bytes_written = 0
+        failures = []
+
+        results = self._make_results()
+        try:
+            for result in results:
+                processed += 1
+                done += 1
+                if result.ok and result.duplicate_of:
+                    duplicates += 1
+                elif result.ok:
+                    succeeded += 1
+                    bytes_written += result.bytes_written
+                else:
+                    failures.append((result.input_path, result.error or "未知错误"))
+
+                elapsed = time.perf_counter() - start
+                rate = processed / elapsed if elapsed > 0 else 0.0
+                remaining = max(0, self._total - done)
+                self.progress.emit({
+                    'done': done,
+                    'total': self._total,
+                    'images_per_sec': rate,
+                    'mb_per_sec': bytes_written / (1024 * 1024) / elapsed if elapsed > 0 else 0.0,
+                    'eta': remaining / rate if rate > 0 else None,
+                })
+
+                if self._cancel_requested:
+                    break
+        except Exception as e:
+            failures.append(("", str(e)))
+        finally:
+            # 关闭生成器会取消所有尚未开始的任务
+            close = getattr(results, 'close', None)
+            if close:
+                close()
+
+        self.finished_summary.emit({
+            'succeeded': succeeded,
+            'duplicates': duplicates,
+            'failures': failures,
+            'cancelled': self._cancel_requested,
+            'elapsed': time.perf_counter() - start,
+            'bytes_written': bytes_written,
+            'schedule': self._schedule_report.summary() if self._schedule_report else None,
+        })
@@ -8,10 +8,19 @@ from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                            QListWidgetItem)
 from .template_dialog import TemplateDialog
 from .export_dialog import ExportDialog
-from PyQt6.QtCore import Qt, QSize
-from PyQt6.QtGui import QPixmap, QIcon, QDragEnterEvent, QDropEvent
+from .export_worker import ExportWorker
+from .export_progress_dialog import ExportProgressDialog
+from PyQt6.QtCore import Qt, QSize, QTimer
+from PyQt6.QtGui import QPixmap, QIcon, QImageReader, QDragEnterEvent, QDropEvent
+from collections import deque
 import os
+import time
 from ..core.image_processor import ImageProcessor
+from ..core.batch import ExportSettings, iter_export, resume_export
+from ..core.journal import ExportJournal
+from ..core.scheduler import CostModel, ScheduleReport
+from ..core.metadata_index import MetadataIndex
+from ..core.session import SESSION_EXTENSION, LazySettings, load_session, save_session
 from .watermark_editor import WatermarkEditor
 from .preview_panel import PreviewPanel
 
@@ -19,10 +28,21 @@ from .preview_panel import PreviewPanel
 class MainWindow(QMainWindow):
     """主窗口类"""
 
+    PREFETCH_NEIGHBORS = 2  # 切换图片时在后台预解码前后各几张
+    THUMBNAIL_SIZE = 60  # 列表缩略图的最长边
+    ORDER_ROLE = Qt.ItemDataRole.UserRole.value + 1  # 列表项的添加顺序
+    THUMBNAIL_TICK = 0.03  # 打开会话后每次空闲时读取缩略图的时间（秒），避免界面卡顿
+
     def __init__(self):
         super().__init__()
         self._current_file = None
-        self.image_settings = {}  # 用于存储每个图片的设置
+        self.image_settings = LazySettings()  # 用于存储每个图片的设置，从会话加载的设置在读取时才解析
+        self.metadata_index = MetadataIndex.load()  # 文件头元数据，跨会话保存
+        self._cost_model = CostModel.load()
+        self._added_count = 0
+        self._pending_thumbnails = deque()  # 打开会话后尚未读取缩略图的列表项
+        self._thumbnail_timer = QTimer(self)
+        self._thumbnail_timer.timeout.connect(self._load_pending_thumbnails)
         self._init_ui()
 
     def _init_ui(self):
@@ -48,11 +68,32 @@ class MainWindow(QMainWindow):
         add_image_btn = QPushButton('添加图片')
         add_image_btn.clicked.connect(self.add_images)
         left_layout.addWidget(add_image_btn)
+
+        # 排序和筛选（只使用元数据索引，不解码图片）
+        list_tools_layout = QHBoxLayout()
+        self.sort_combo = QComboBox()
+        for label, key in (("添加顺序", ''), ("文件名", 'name'), ("文件大小", 'file_size'),
+                           ("像素数", 'pixels'), ("修改时间", 'mtime')):
+            self.sort_combo.addItem(label, key)
+        self.sort_combo.currentIndexChanged.connect(self._apply_sort)
+        list_tools_layout.addWidget(self.sort_combo)
+        self.filter_combo = QComboBox()
+        for label, key in (("全部", ''), ("横向", 'landscape'), ("纵向", 'portrait'),
+                           ("多帧", 'multi_frame')):
+            self.filter_combo.addItem(label, key)
+        self.filter_combo.currentIndexChanged.connect(self._apply_filter)
+        list_tools_layout.addWidget(self.filter_combo)
+        left_layout.addLayout(list_tools_layout)
         
         # 图片列表
         self.image_list = QListWidget()
         self.image_list.setIconSize(QSize(80, 80)) # 增大了缩略图尺寸
+        self.image_list.setUniformItemSizes(True)  # 几万张图片时不逐项计算布局
         left_layout.addWidget(self.image_list)
+
+        # 列表汇总：张数、像素数和预计导出耗时
+        self.list_summary = QLabel()
+        left_layout.addWidget(self.list_summary)
         
         # 工具按钮布局
         tool_btn_layout = QHBoxLayout()
@@ -66,8 +107,23 @@ class MainWindow(QMainWindow):
         export_btn = QPushButton('导出处理')
         export_btn.clicked.connect(self.export_images)
         tool_btn_layout.addWidget(export_btn)
+
+        # 继续导出按钮（从上次中断处继续）
+        resume_btn = QPushButton('继续导出')
+        resume_btn.clicked.connect(self.resume_export)
+        tool_btn_layout.addWidget(resume_btn)
         
         left_layout.addLayout(tool_btn_layout)
+
+        # 会话按钮：保存和恢复图片列表及每张图片的设置
+        session_btn_layout = QHBoxLayout()
+        save_session_btn = QPushButton('保存会话')
+        save_session_btn.clicked.connect(self.save_session)
+        session_btn_layout.addWidget(save_session_btn)
+        open_session_btn = QPushButton('打开会话')
+        open_session_btn.clicked.connect(self.open_session)
+        session_btn_layout.addWidget(open_session_btn)
+        left_layout.addLayout(session_btn_layout)
         
         # --- 中间面板 (预览) ---
         self.preview_panel = PreviewPanel()
@@ -101,51 +157,165 @@ class MainWindow(QMainWindow):
             
     def dropEvent(self, event: QDropEvent):
         """拖放事件"""
+        file_paths = []
         for url in event.mimeData().urls():
             file_path = url.toLocalFile()
             if os.path.isfile(file_path) and ImageProcessor.is_supported_format(file_path):
-                self.add_image_from_path(file_path)
+                file_paths.append(file_path)
+        self.add_images_from_paths(file_paths)
 
     def add_image_from_path(self, file_path: str):
         """从路径添加图片"""
+        self.add_images_from_paths([file_path])
+
+    def add_images_from_paths(self, file_paths: list):
+        """从路径添加多张图片
+
+        只读取文件头（并行）获得尺寸等信息，缩略图按缩小后的尺寸读取，不完整解码图片。
+        """
         try:
-            # 创建缩略图
-            pixmap = QPixmap(file_path)
-            if pixmap.isNull():
-                QMessageBox.warning(self, "警告", f"无法加载图片: {file_path}")
-                return
-                
-            icon = QIcon(pixmap.scaled(
-                60, 60,
-                Qt.AspectRatioMode.KeepAspectRatio,
-                Qt.TransformationMode.SmoothTransformation
-            ))
-            
-            # 添加到列表
-            item = QListWidgetItem(
-                icon,
-                os.path.basename(file_path)
-            )
-            item.setData(Qt.ItemDataRole.UserRole, file_path)
-            self.image_list.addItem(item)
-            
+            listed = set(self._all_paths())
+            new_items = []
+            for file_path, metadata in zip(file_paths, self.metadata_index.update(file_paths)):
+                if metadata is None:
+                    QMessageBox.warning(self, "警告", f"无法加载图片: {file_path}")
+                    continue
+                if file_path in listed:
+                    continue
+                listed.add(file_path)
+
+                item = QListWidgetItem(
+                    self._thumbnail_icon(file_path, metadata),
+                    os.path.basename(file_path)
+                )
+                item.setToolTip(self._describe_metadata(metadata))
+                item.setData(Qt.ItemDataRole.UserRole, file_path)
+                item.setData(self.ORDER_ROLE, self._added_count)
+                self._added_count += 1
+                new_items.append(item)
+
+            # 列表已按当前方式排好序，新图片直接插入到各自的位置
+            self._insert_sorted(new_items)
+            self._apply_filter()
             # 果是第一张图片，则选中
-            if self.image_list.count() == 1:
+            if self.image_list.currentRow() < 0 and self.image_list.count() > 0:
                 self.image_list.setCurrentRow(0)
         except Exception as e:
             QMessageBox.critical(self, "错误", f"添加图片时出错：\\n{str(e)}")
 
+    def _thumbnail_icon(self, file_path: str, metadata) -> QIcon:
+        """读取缩略图，JPEG 会在解码时直接按比例缩小"""
+        reader = QImageReader(file_path)
+        reader.setAutoTransform(True)
+        scale = min(1.0, self.THUMBNAIL_SIZE / max(metadata.width, metadata.height, 1))
+        reader.setScaledSize(QSize(max(1, round(metadata.width * scale)),
+                                   max(1, round(metadata.height * scale))))
+        image = reader.read()
+        return QIcon(QPixmap.fromImage(image)) if not image.isNull() else QIcon()
+
+    @staticmethod
+    def _describe_metadata(metadata) -> str:
+        """列表项的提示文本"""
+        width, height = metadata.display_size
+        text = f"{width} × {height}  {metadata.format} {metadata.mode}"
+        if metadata.frames > 1:
+            text += f"  {metadata.frames} 帧"
+        return f"{text}\n{metadata.file_size / (1024 * 1024):.1f} MB"
+
+    def _all_paths(self) -> list:
+        """图片列表中所有文件的路径（包括被筛选隐藏的），按列表顺序"""
+        return [self.image_list.item(i).data(Qt.ItemDataRole.UserRole)
+                for i in range(self.image_list.count())]
+
+    def _sorted_paths(self, paths: list) -> list:
+        """按所选方式排序路径：名称按升序，大小、像素数和时间从大到小，未排序时按添加顺序"""
+        key = self.sort_combo.currentData()
+        if not key:
+            return paths
+        return self.metadata_index.sort_paths(paths, key, reverse=key != 'name')
+
+    def _insert_sorted(self, new_items: list):
+        """把新列表项插入到当前排序下的位置，已有的列表项不移动
+
+        现有列表已按同一方式（稳定地）排好序，把新路径接在末尾整体排序一次后，
+        按名次从小到大插入，每一项插入时排在它前面的项都已就位。
+        """
+        if not new_items:
+            return
+        paths = [item.data(Qt.ItemDataRole.UserRole) for item in new_items]
+        rank = {path: row for row, path in enumerate(self._sorted_paths(self._all_paths() + paths))}
+        self.image_list.setUpdatesEnabled(False)
+        try:
+            for path, item in sorted(zip(paths, new_items), key=lambda pair: rank[pair[0]]):
+                self.image_list.insertItem(rank[path], item)
+        finally:
+            self.image_list.setUpdatesEnabled(True)
+
+    def _apply_sort(self):
+        """排序方式改变时重新排列图片列表，保持当前选中的图片
+
+        排序只在索引的整列上计算一次；列表项从末尾依次取下（不移动其余项），再按新顺序放回。
+        """
+        key = self.sort_combo.currentData()
+        self.image_list.blockSignals(True)
+        self.image_list.setUpdatesEnabled(False)
+        try:
+            count = self.image_list.count()
+            items = [self.image_list.takeItem(row) for row in range(count - 1, -1, -1)]
+            items.reverse()
+            if key:
+                by_path = {item.data(Qt.ItemDataRole.UserRole): item for item in items}
+                items = [by_path[path] for path in self._sorted_paths(list(by_path))]
+            else:
+                items.sort(key=lambda item: item.data(self.ORDER_ROLE))
+            for item in items:
+                self.image_list.addItem(item)
+            current = next((item for item in items
+                            if item.data(Qt.ItemDataRole.UserRole) == self._current_file), None)
+            if current is not None:
+                self.image_list.setCurrentItem(current)
+        finally:
+            self.image_list.setUpdatesEnabled(True)
+            self.image_list.blockSignals(False)
+
+    def _apply_filter(self):
+        """隐藏不符合筛选条件的图片，隐藏的图片不会被导出"""
+        key = self.filter_combo.currentData()
+        paths = [self.image_list.item(i).data(Qt.ItemDataRole.UserRole)
+                 for i in range(self.image_list.count())]
+        if key == 'multi_frame':
+            visible = set(self.metadata_index.filter_paths(paths, multi_frame=True))
+        elif key:
+            visible = set(self.metadata_index.filter_paths(paths, orientation=key))
+        else:
+            visible = set(paths)
+        for i, path in enumerate(paths):
+            self.image_list.item(i).setHidden(path not in visible)
+        self._update_list_summary()
+
+    def _update_list_summary(self):
+        """根据元数据索引汇总列表中的图片并估算导出耗时"""
+        paths = self._image_paths()
+        if not paths:
+            self.list_summary.clear()
+            return
+        estimate = self.metadata_index.estimate(paths, self._cost_model, os.cpu_count() or 1)
+        self.list_summary.setText(
+            f"{estimate['files']} 张 · {estimate['pixels'] / 1e6:.0f} 百万像素 · "
+            f"{estimate['file_size'] / (1024 * 1024):.0f} MB\n"
+            f"预计导出约 {estimate['makespan']:.0f} 秒，"
+            f"单张峰值内存 {estimate['peak_memory'] / (1024 * 1024):.0f} MB"
+        )
+
     def add_images(self):
         """添加图片"""
         try:
             file_dialog = QFileDialog()
             file_dialog.setFileMode(QFileDialog.FileMode.ExistingFiles)
-            file_dialog.setNameFilter("Images (*.png *.jpg *.jpeg *.bmp *.tiff)")
+            file_dialog.setNameFilter("Images (*.png *.jpg *.jpeg *.bmp *.tiff *.tif *.gif)")
             
             if file_dialog.exec():
-                filenames = file_dialog.selectedFiles()
-                for filename in filenames:
-                    self.add_image_from_path(filename)
+                self.add_images_from_paths(file_dialog.selectedFiles())
         except Exception as e:
             QMessageBox.critical(self, "错误", f"添加图片时出错：\\n{str(e)}")
                 
@@ -183,6 +353,8 @@ class MainWindow(QMainWindow):
             self.watermark_editor.scale_spin.setValue(int(settings['scale'] * 100))
         if settings.get('position') is not None:
             self.watermark_editor.position = settings['position']
+        if settings.get('layers') is not None:
+            self.watermark_editor.set_layers(settings['layers'])
         
         # 更新预览
         self._on_watermark_changed(self.watermark_editor.get_settings())
@@ -201,51 +373,98 @@ class MainWindow(QMainWindow):
             suffix = dialog.suffix.text()
             format = dialog.format.currentText()
             quality = dialog.quality.value()
+            profile = dialog.profile.currentText()
+            memory_budget = dialog.memory_budget.value() * 1024 * 1024 or None
+            processes = dialog.use_processes.isChecked()
+            dedupe = dialog.skip_duplicates.isChecked()
+            archive = dialog.archive.currentData()
+            color_management = dialog.color_management.currentData()
+            schedule = dialog.schedule_by_size.isChecked()
+            renditions = dialog.get_renditions()
             
             if not output_dir:
                 QMessageBox.warning(self, "警告", "请选择输出目录！")
                 return
                 
             # 处理所有图片
-            processor = ImageProcessor()
-            settings = self.watermark_editor.get_settings()
-            
-            # 应用所有设置到处理器
-            processor.set_watermark_position(settings.get('position', (0, 0)))
-            processor.set_watermark_opacity(settings.get('opacity', 255))
-            processor.set_watermark_rotation(settings.get('rotation', 0))
-            processor.set_watermark_scale(settings.get('scale', 1.0))
-
-            if settings.get('text'):
-                processor.set_watermark_text(settings['text'])
-                if settings.get('font_name'):
-                    processor.set_watermark_font(
-                        settings['font_name'],
-                        settings['font_size']
-                    )
-                processor.set_watermark_color(settings['color'])
-            
-            for i in range(self.image_list.count()):
-                item = self.image_list.item(i)
-                input_path = item.data(Qt.ItemDataRole.UserRole)
-                
-                # 生成输出文件名
-                filename = os.path.basename(input_path)
-                name, ext = os.path.splitext(filename)
-                output_filename = f"{prefix}{name}{suffix}.{format.lower()}"
-                output_path = os.path.join(output_dir, output_filename)
-                
-                # 处理图片
-                processor.load_image(input_path)
-                
-                if settings.get('text'):  # 文本水印
-                    processor.add_text_watermark()
-                elif settings.get('image_path'):  # 图片水印
-                    processor.add_image_watermark(settings['image_path'])
-                    
-                processor.save_image(output_path, quality=quality, format=format)
-                
-            QMessageBox.information(self, "完成", "图片处理完成！")
+            export_settings = ExportSettings.from_dict(
+                self.watermark_editor.get_settings(),
+                output_dir,
+                prefix=prefix,
+                suffix=suffix,
+                format=format,
+                quality=quality,
+                profile=profile,
+                archive=archive,
+                renditions=renditions,
+                color_management=color_management
+            )
+            input_paths = self._image_paths()
+            # 归档无法追加，写入归档时不记录导出日志
+            journal = None if archive else ExportJournal.for_output_dir(output_dir)
+            schedule_report = ScheduleReport() if schedule else None
+            self._run_export(
+                lambda: iter_export(input_paths, export_settings,
+                                    memory_budget=memory_budget,
+                                    journal=journal,
+                                    processes=processes,
+                                    dedupe=dedupe,
+                                    schedule=schedule,
+                                    schedule_report=schedule_report,
+                                    metadata_index=self.metadata_index),
+                len(input_paths),
+                schedule_report=schedule_report
+            )
+
+    def resume_export(self):
+        """根据输出目录中的导出日志，从上次中断处继续导出"""
+        if self.image_list.count() == 0:
+            QMessageBox.warning(self, "警告", "请先添加需要处理的图片！")
+            return
+
+        output_dir = QFileDialog.getExistingDirectory(self, "选择上次导出的输出目录")
+        if not output_dir:
+            return
+        journal = ExportJournal.for_output_dir(output_dir)
+        start_record = journal.get_start_record()
+        if start_record is None:
+            QMessageBox.warning(self, "警告", "该目录中没有可继续的导出记录！")
+            return
+
+        input_paths = self._image_paths()
+        completed = journal.completed_inputs(start_record['settings_hash'])
+        already_done = sum(1 for path in input_paths if path in completed)
+        self._run_export(
+            lambda: resume_export(output_dir, input_paths),
+            len(input_paths),
+            already_done
+        )
+
+    def _image_paths(self) -> list:
+        """获取图片列表中显示的文件路径（被筛选隐藏的图片不包括在内）"""
+        return [
+            self.image_list.item(i).data(Qt.ItemDataRole.UserRole)
+            for i in range(self.image_list.count())
+            if not self.image_list.item(i).isHidden()
+        ]
+
+    def _run_export(self, make_results, total: int, already_done: int = 0,
+                    schedule_report: ScheduleReport = None):
+        """在后台线程中运行导出，并显示进度对话框直到用户关闭
+
+        Args:
+            make_results: 返回导出结果迭代器的函数
+            total: 文件总数
+            already_done: 之前已完成的文件数
+            schedule_report: 调度报告，导出结束后汇总预计与实际耗时
+        """
+        worker = ExportWorker(make_results, total, already_done, self,
+                              schedule_report=schedule_report)
+        progress_dialog = ExportProgressDialog(worker, self)
+        worker.start()
+        progress_dialog.exec()
+        worker.wait()
+        worker.deleteLater()
 
     def _on_file_selected(self):
         """当文件列表中的选择项改变时调用"""
@@ -263,6 +482,7 @@ class MainWindow(QMainWindow):
         new_file_path = selected_items[0].data(Qt.ItemDataRole.UserRole)
         self._current_file = new_file_path
         self.preview_panel.load_image(new_file_path)
+        self._prefetch_neighbors(self.image_list.row(selected_items[0]))
 
         # 3. 加载新图片的设置
         if new_file_path in self.image_settings:
@@ -282,6 +502,15 @@ class MainWindow(QMainWindow):
         self._on_watermark_changed(self.watermark_editor.get_settings())
 
 
+    def _prefetch_neighbors(self, row: int):
+        """预解码当前图片前后的图片，先下一张，再上一张，依次向外"""
+        paths = []
+        for distance in range(1, self.PREFETCH_NEIGHBORS + 1):
+            for neighbor in (row + distance, row - distance):
+                if 0 <= neighbor < self.image_list.count():
+                    paths.append(self.image_list.item(neighbor).data(Qt.ItemDataRole.UserRole))
+        self.preview_panel.prefetch_images(paths)
+
     def _on_watermark_changed(self, settings: dict):
         """当水印设置改变时调用"""
         if self._current_file:
@@ -290,6 +519,97 @@ class MainWindow(QMainWindow):
             # 保存当前设置
             self.image_settings[self._current_file] = settings
 
+    def closeEvent(self, event):
+        """关闭窗口时保存元数据索引"""
+        self.metadata_index.prune()
+        if self.metadata_index.dirty:
+            self.metadata_index.save()
+        super().closeEvent(event)
+
+    def save_session(self):
+        """把图片列表（按添加顺序）和每张图片的设置保存为会话文件"""
+        session_path, _ = QFileDialog.getSaveFileName(
+            self, "保存会话", "", f"会话文件 (*{SESSION_EXTENSION})")
+        if not session_path:
+            return
+        if not session_path.endswith(SESSION_EXTENSION):
+            session_path += SESSION_EXTENSION
+
+        # 当前图片的设置可能还没有写回
+        if self._current_file:
+            self.image_settings[self._current_file] = self.watermark_editor.get_settings()
+        items = sorted((self.image_list.item(i) for i in range(self.image_list.count())),
+                       key=lambda item: item.data(self.ORDER_ROLE))
+        paths = [item.data(Qt.ItemDataRole.UserRole) for item in items]
+        if not save_session(session_path, paths, self.image_settings, self._current_file):
+            QMessageBox.warning(self, "警告", f"无法保存会话: {session_path}")
+
+    def open_session(self):
+        """打开会话文件，替换当前的图片列表和设置
+
+        列表项先只显示文件名，缩略图和文件头信息在之后的空闲时间分批读取，
+        每张图片的设置在第一次选中时才解析，大会话打开后窗口立即可用。
+        """
+        session_path, _ = QFileDialog.getOpenFileName(
+            self, "打开会话", "", f"会话文件 (*{SESSION_EXTENSION})")
+        if not session_path:
+            return
+        session = load_session(session_path)
+        if session is None:
+            QMessageBox.warning(self, "警告", f"无法打开会话: {session_path}")
+            return
+
+        self._thumbnail_timer.stop()
+        self._pending_thumbnails.clear()
+        self._current_file = None
+        self.image_settings = session.settings
+        self.image_list.blockSignals(True)
+        self.image_list.setUpdatesEnabled(False)
+        try:
+            self.image_list.clear()
+            # 会话按添加顺序保存，恢复为不排序、不筛选
+            for combo in (self.sort_combo, self.filter_combo):
+                combo.blockSignals(True)
+                combo.setCurrentIndex(0)
+                combo.blockSignals(False)
+            current_item = None
+            for path in session.paths:
+                item = QListWidgetItem(os.path.basename(path))
+                item.setData(Qt.ItemDataRole.UserRole, path)
+                item.setData(self.ORDER_ROLE, self._added_count)
+                self._added_count += 1
+                self.image_list.addItem(item)
+                self._pending_thumbnails.append(item)
+                if path == session.current:
+                    current_item = item
+        finally:
+            self.image_list.setUpdatesEnabled(True)
+            self.image_list.blockSignals(False)
+
+        self.list_summary.setText(f"{self.image_list.count()} 张 · 正在读取图片信息…")
+        if current_item is not None:
+            self.image_list.setCurrentItem(current_item)
+            self.image_list.scrollToItem(current_item)
+        elif self.image_list.count() > 0:
+            self.image_list.setCurrentRow(0)
+        self._thumbnail_timer.start(0)
+
+    def _load_pending_thumbnails(self):
+        """在 THUMBNAIL_TICK 内读取一批缩略图和文件头信息，全部读完后更新列表汇总"""
+        deadline = time.perf_counter() + self.THUMBNAIL_TICK
+        while self._pending_thumbnails and time.perf_counter() < deadline:
+            item = self._pending_thumbnails.popleft()
+            file_path = item.data(Qt.ItemDataRole.UserRole)
+            metadata = self.metadata_index.get(file_path)
+            if metadata is None:
+                item.setToolTip(f"无法加载图片: {file_path}")
+                continue
+            item.setIcon(self._thumbnail_icon(file_path, metadata))
+            item.setToolTip(self._describe_metadata(metadata))
+        if not self._pending_thumbnails:
+            self._thumbnail_timer.stop()
+            self._update_list_summary()
+
     def _open_files(self):
         """打开一个或多个图片文件"""
         # This method is not fully implemented or connected
@@ -6,6 +6,8 @@ from PyQt6.QtCore import Qt, QPoint, pyqtSignal
 from PyQt6.QtGui import QPixmap, QPainter, QMouseEvent
 from PIL.ImageQt import ImageQt
 from ..core.image_processor import ImageProcessor
+from ..core.preview_pyramid import PreviewPyramid
+from ..core.image_cache import DecodedImageCache
 
 class PreviewPanel(QWidget):
     """预览面板类"""
@@ -23,6 +25,10 @@ class PreviewPanel(QWidget):
         self._drag_start_pos = QPoint()
         self._watermark_start_pos_rel = (0, 0)
         self._current_settings = {} # 缓存当前水印设置
+        self._pyramid = PreviewPyramid()
+        self._level_pixmap = None # 缓存当前显示层的 QPixmap
+        self._level_pixmap_key = None # (金字塔版本, 层号)
+        self._image_cache = DecodedImageCache() # 最近解码的图片，按内存预算淘汰
 
     def _init_ui(self):
         """初始化用户界面"""
@@ -41,8 +47,22 @@ class PreviewPanel(QWidget):
         Args:
             image_path: 图片路径
         """
-        if self._image_processor.load_image(image_path):
+        try:
+            image = self._image_cache.get_or_load(image_path)
+        except Exception as e:
+            print(f"Error loading image: {e}")
+            return
+        if self._image_processor.set_image(image, image_path):
+            self._pyramid.set_image(self._image_processor.get_image())
             self._update_preview()
+
+    def prefetch_images(self, image_paths: list):
+        """在后台预先解码即将浏览的图片
+
+        Args:
+            image_paths: 图片路径列表，靠前的先解码
+        """
+        self._image_cache.prefetch(image_paths)
             
     def update_watermark(self, settings: dict, from_drag: bool = False):
         """更新水印设置
@@ -54,45 +74,36 @@ class PreviewPanel(QWidget):
         if not from_drag:
             self._current_settings = settings.copy()
 
-        if not self._image_processor._image:
+        if not self._image_processor.has_image():
             return
-            
-        # 应用所有设置
-        self._image_processor.set_watermark_position(settings.get('position', (0, 0)))
-        self._image_processor.set_watermark_opacity(settings.get('opacity', 255))
-        self._image_processor.set_watermark_rotation(settings.get('rotation', 0))
-        self._image_processor.set_watermark_scale(settings.get('scale', 1.0))
-
-        if settings.get('text'):  # 文本水印
-            self._image_processor.set_watermark_text(settings['text'])
-            if settings.get('font_name'):
-                self._image_processor.set_watermark_font(
-                    settings['font_name'],
-                    settings['font_size']
-                )
-            self._image_processor.set_watermark_color(settings['color'])
-            self._image_processor.add_text_watermark()
-        elif settings.get('image_path'):  # 图片水印
-            self._image_processor.add_image_watermark(settings['image_path'])
-        else:
-            # 如果没有水印，恢复到原始图片
-            if self._image_processor._original_image:
-                self._image_processor._image = self._image_processor._original_image.copy()
+
+        # 应用所有设置（包括已固定的图层），没有水印时恢复到原始图片；
+        # 结果图原地更新，只有新旧水印覆盖的区域发生变化
+        self._image_processor.apply_settings(settings)
+        self._pyramid.update_image(
+            self._image_processor.get_image(),
+            self._image_processor.get_last_update_bbox()
+        )
 
         # 更新预览
         self._update_preview()
         
     def _update_preview(self):
         """更新预览显示"""
-        if not self._image_processor._image:
+        if not self._image_processor.has_image():
             return
             
-        # 转换PIL图片为QPixmap
-        qim = ImageQt(self._image_processor._image)
-        pixmap = QPixmap.fromImage(qim)
+        # 选择最接近预览区域的金字塔层，只有该层变化时才重新转换
+        label_size = self.preview_label.size()
+        level = self._pyramid.level_for_size(label_size.width(), label_size.height())
+        key = (self._pyramid.version, level)
+        if key != self._level_pixmap_key:
+            qim = ImageQt(self._pyramid.get_level(level))
+            self._level_pixmap = QPixmap.fromImage(qim)
+            self._level_pixmap_key = key
         
-        # 缩放图片以适应预览区域
-        scaled_pixmap = pixmap.scaled(
+        # 只做最后一小步缩放以适应预览区域
+        scaled_pixmap = self._level_pixmap.scaled(
             self.preview_label.size(),
             Qt.AspectRatioMode.KeepAspectRatio,
             Qt.TransformationMode.SmoothTransformation
@@ -161,8 +172,9 @@ class PreviewPanel(QWidget):
             wm_bbox = self._image_processor.get_watermark_bounding_box()
             if not wm_bbox: 
                 # 如果没有 bbox，可能是因为水印还没有被渲染，我们可以尝试从当前图层获取
-                if self._image_processor._current_watermark_layer:
-                    wm_w, wm_h = self._image_processor._current_watermark_layer.size
+                watermark_layer = self._image_processor.get_watermark_layer()
+                if watermark_layer:
+                    wm_w, wm_h = watermark_layer.size
                 else:
                     return # 如果完全没有水印信息，则无法继续
             else:
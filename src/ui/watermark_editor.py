@@ -3,7 +3,8 @@
 """
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QGroupBox, QGridLayout,
                              QPushButton, QSlider, QLabel, QLineEdit,
-                             QColorDialog, QFontDialog, QComboBox, QHBoxLayout, QSpinBox)
+                             QColorDialog, QFontDialog, QComboBox, QHBoxLayout, QSpinBox,
+                             QCheckBox, QDoubleSpinBox)
 from PyQt6.QtCore import pyqtSignal, Qt
 from PyQt6.QtGui import QFont, QColor
 from typing import Tuple
@@ -16,6 +17,7 @@ class WatermarkEditor(QWidget):
         super().__init__(parent)
         self._current_position_relative = (0.05, 0.05)
         self._color = QColor("black")  # 存储当前颜色
+        self._layers = []  # 已固定的水印图层（从下到上）
         self._init_ui()
 
     def _init_ui(self):
@@ -32,6 +34,9 @@ class WatermarkEditor(QWidget):
         text_input_layout = QHBoxLayout()
         text_label = QLabel("水印文本:")
         self.text_input = QLineEdit()
+        self.text_input.setToolTip(
+            "可使用变量: {filename} {stem} {counter} {counter:04d} {exif:DateTimeOriginal}"
+        )
         self.text_input.textChanged.connect(self._on_settings_changed)
         text_input_layout.addWidget(text_label)
         text_input_layout.addWidget(self.text_input)
@@ -64,8 +69,13 @@ class WatermarkEditor(QWidget):
         self.color_button.setStyleSheet(f"background-color: {self._color.name()};")
         self.color_button.clicked.connect(self._choose_color)
         
+        self.auto_color_check = QCheckBox("自动颜色")
+        self.auto_color_check.setToolTip("按水印下方背景的明暗自动选择浅色或深色，背景杂乱时加描边")
+        self.auto_color_check.toggled.connect(self._on_settings_changed)
+
         color_layout.addWidget(color_label)
         color_layout.addWidget(self.color_button)
+        color_layout.addWidget(self.auto_color_check)
         color_layout.addStretch()
         text_layout.addLayout(color_layout)
         
@@ -118,6 +128,36 @@ class WatermarkEditor(QWidget):
         scale_layout.addWidget(self.scale_slider)
         common_layout.addLayout(scale_layout)
 
+        # 相对大小：水印宽度为图片宽度的百分比，不同分辨率的图片上水印比例一致
+        relative_layout = QHBoxLayout()
+        self.relative_check = QCheckBox("水印宽度占图片宽度:")
+        self.relative_check.setToolTip("文本水印按文字宽度自动选择字号，图片水印自动缩放")
+        self.relative_check.toggled.connect(self._on_settings_changed)
+        self.relative_spin = QDoubleSpinBox()
+        self.relative_spin.setRange(0.5, 100.0)
+        self.relative_spin.setSingleStep(0.5)
+        self.relative_spin.setSuffix(" %")
+        self.relative_spin.setValue(20.0)
+        self.relative_spin.valueChanged.connect(self._on_settings_changed)
+        relative_layout.addWidget(self.relative_check)
+        relative_layout.addWidget(self.relative_spin)
+        common_layout.addLayout(relative_layout)
+
+        # 平铺：水印按间距重复铺满整张图片
+        tile_layout = QHBoxLayout()
+        self.tile_check = QCheckBox("平铺水印")
+        self.tile_check.toggled.connect(self._on_settings_changed)
+        tile_spacing_label = QLabel("间距:")
+        self.tile_spacing_spin = QSpinBox()
+        self.tile_spacing_spin.setRange(0, 1000)
+        self.tile_spacing_spin.setSuffix(" px")
+        self.tile_spacing_spin.setValue(50)
+        self.tile_spacing_spin.valueChanged.connect(self._on_settings_changed)
+        tile_layout.addWidget(self.tile_check)
+        tile_layout.addWidget(tile_spacing_label)
+        tile_layout.addWidget(self.tile_spacing_spin)
+        common_layout.addLayout(tile_layout)
+
         layout.addWidget(common_group)
 
         # 位置设置
@@ -134,6 +174,22 @@ class WatermarkEditor(QWidget):
             self.position_buttons.append(btn)
         layout.addWidget(position_group)
 
+        # 图层设置
+        layer_group = QGroupBox("图层")
+        layer_layout = QVBoxLayout(layer_group)
+        self.layer_count_label = QLabel()
+        layer_layout.addWidget(self.layer_count_label)
+        layer_btn_layout = QHBoxLayout()
+        pin_layer_btn = QPushButton("固定为图层")
+        pin_layer_btn.clicked.connect(self._pin_current_layer)
+        clear_layers_btn = QPushButton("清除图层")
+        clear_layers_btn.clicked.connect(self._clear_layers)
+        layer_btn_layout.addWidget(pin_layer_btn)
+        layer_btn_layout.addWidget(clear_layers_btn)
+        layer_layout.addLayout(layer_btn_layout)
+        layout.addWidget(layer_group)
+        self._update_layer_label()
+
         layout.addStretch()
         self._update_position_buttons()
 
@@ -170,6 +226,36 @@ class WatermarkEditor(QWidget):
         # 拖拽结束后，我们仍然需要发出信号，以确保所有状态同步
         self._on_settings_changed()
 
+    def _pin_current_layer(self):
+        """将当前编辑的水印固定为一个图层，之后可以继续编辑新的水印"""
+        settings = self.get_settings()
+        settings.pop('layers')
+        if settings['text']:
+            settings['type'] = 'text'
+        elif settings['image_path']:
+            settings['type'] = 'image'
+        else:
+            return
+        self._layers.append(settings)
+        self._update_layer_label()
+        self._on_settings_changed()
+
+    def _clear_layers(self):
+        """清除所有已固定的图层"""
+        self._layers = []
+        self._update_layer_label()
+        self._on_settings_changed()
+
+    def set_layers(self, layers: list):
+        """设置已固定的图层，由外部调用（如加载模板）"""
+        self._layers = [dict(layer) for layer in layers]
+        self._update_layer_label()
+        self._on_settings_changed()
+
+    def _update_layer_label(self):
+        """更新已固定图层数量的显示"""
+        self.layer_count_label.setText(f"已固定图层: {len(self._layers)}")
+
     def _update_position_buttons(self):
         """根据当前相对位置更新九宫格按钮的选中状态"""
         # 取消所有按钮的选中状态
@@ -200,11 +286,16 @@ class WatermarkEditor(QWidget):
             "font_name": self.font_combo.currentText(),
             "font_size": self.size_spin.value(),
             "color": (self._color.red(), self._color.green(), self._color.blue()),
+            "auto_color": self.auto_color_check.isChecked(),
             "opacity": self.opacity_slider.value(),
             "rotation": self.rotation_slider.value(),
             "scale": self.scale_slider.value() / 100.0,
             "position": self._current_position_relative,
+            "relative_size": self.relative_spin.value() / 100.0 if self.relative_check.isChecked() else None,
+            "tile": self.tile_check.isChecked(),
+            "tile_spacing": self.tile_spacing_spin.value(),
             "image_path": self.image_path_label.text() if self.image_path_label.text() != "未选择图片" else None,
+            "layers": [dict(layer) for layer in self._layers],
         }
 
     def set_settings(self, settings: dict):
@@ -216,10 +307,18 @@ class WatermarkEditor(QWidget):
         color_tuple = settings.get('color', (0, 0, 0))
         self._color = QColor(*color_tuple)
         self.color_button.setStyleSheet(f"background-color: {self._color.name()};")
+        self.auto_color_check.setChecked(bool(settings.get('auto_color', False)))
         
         self.opacity_slider.setValue(settings.get('opacity', 255))
         self.rotation_slider.setValue(settings.get('rotation', 0))
         self.scale_slider.setValue(int(settings.get('scale', 1.0) * 100))
+
+        relative_size = settings.get('relative_size')
+        if relative_size:
+            self.relative_spin.setValue(relative_size * 100.0)
+        self.relative_check.setChecked(bool(relative_size))
+        self.tile_check.setChecked(bool(settings.get('tile', False)))
+        self.tile_spacing_spin.setValue(int(settings.get('tile_spacing', 50)))
         
         image_path = settings.get('image_path')
         if image_path:
@@ -229,6 +328,9 @@ class WatermarkEditor(QWidget):
             
         self._current_position_relative = settings.get('position', (0.05, 0.05))
         self._update_position_buttons()
+
+        self._layers = [dict(layer) for layer in settings.get('layers') or []]
+        self._update_layer_label()
         
         # 更新设置后，发出信号以刷新预览
         self._on_settings_changed()
\ No newline at end of file
@@ -10,7 +10,7 @@ def get_supported_formats() -> List[str]:
     Returns:
         List[str]: 支持的文件扩展名列表
     """
-    return ['.jpg', '.jpeg', '.png', '.bmp', '.tiff']
+    return ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif', '.gif']
 
 def is_image_file(filename: str) -> bool:
     """检查文件是否为支持的图片格式
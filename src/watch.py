@@ -0,0 +1,90 @@
+"""
+监视文件夹命令行入口（不需要图形界面）
+
+用法:
+    python -m src.watch 输入目录 输出目录 [--template 模板名] [--format JPEG] [--quality 95]
+                        [--profile balanced] [--color keep|srgb] [--workers N] [--backlog N]
+                        [--settle 秒] [--interval 秒] [--no-inotify]
+
+不指定模板时使用配置文件中的默认水印。按 Ctrl+C 停止，正在处理的文件会先完成。
+"""
+import argparse
+import signal
+import sys
+import time
+
+from .core.batch import ExportResult, ExportSettings
+from .core.color_management import COLOR_MODES
+from .core.config_manager import ConfigManager
+from .core.encoder import DEFAULT_PROFILE, get_output_formats, get_profile_names
+from .core.template_manager import TemplateManager
+from .core.watcher import FolderWatcher
+
+
+def _print_result(result: ExportResult) -> None:
+    """输出单个文件的处理结果"""
+    stamp = time.strftime('%H:%M:%S')
+    if result.ok:
+        print(f"[{stamp}] {result.input_path} -> {result.output_path} "
+              f"({result.timings.get('total', 0.0):.2f}s)", flush=True)
+    else:
+        print(f"[{stamp}] Error: {result.input_path}: {result.error}", flush=True)
+
+
+def main(argv=None) -> int:
+    """监视文件夹主入口"""
+    parser = argparse.ArgumentParser(description="监视文件夹，自动为新图片添加水印")
+    parser.add_argument('input_dir', help="监视的输入目录")
+    parser.add_argument('output_dir', help="输出目录")
+    parser.add_argument('--template', help="使用的水印模板名称")
+    parser.add_argument('--templates-file', default='templates.json', help="模板文件")
+    parser.add_argument('--format', default='JPEG', choices=get_output_formats(), help="输出格式")
+    parser.add_argument('--quality', type=int, default=95, help="图片质量 (1-100)")
+    parser.add_argument('--profile', default=DEFAULT_PROFILE, choices=get_profile_names(),
+                        help="编码档位")
+    parser.add_argument('--color', default='', choices=COLOR_MODES,
+                        help="色彩管理: keep 保留 ICC 配置文件，srgb 转换到 sRGB")
+    parser.add_argument('--prefix', default='', help="文件名前缀")
+    parser.add_argument('--suffix', default='_watermarked', help="文件名后缀")
+    parser.add_argument('--workers', type=int, default=None, help="工作线程数")
+    parser.add_argument('--backlog', type=int, default=None, help="最多同时排队处理的文件数")
+    parser.add_argument('--settle', type=float, default=2.0, help="文件保持不变多少秒后开始处理")
+    parser.add_argument('--interval', type=float, default=5.0, help="轮询间隔（秒）")
+    parser.add_argument('--no-inotify', action='store_true', help="只使用轮询")
+    args = parser.parse_args(argv)
+
+    if args.template:
+        watermark = TemplateManager(args.templates_file).get_template(args.template)
+        if watermark is None:
+            print(f"Error: template not found: {args.template}")
+            return 1
+    else:
+        watermark = ConfigManager().get_value('watermark', {})
+
+    settings = ExportSettings.from_dict(
+        watermark, args.output_dir,
+        prefix=args.prefix, suffix=args.suffix, format=args.format,
+        quality=args.quality, profile=args.profile,
+        color_management=args.color,
+    )
+    watcher = FolderWatcher(
+        args.input_dir, settings,
+        workers=args.workers,
+        max_backlog=args.backlog,
+        settle_time=args.settle,
+        poll_interval=args.interval,
+        use_inotify=not args.no_inotify,
+        on_result=_print_result,
+    )
+    signal.signal(signal.SIGINT, lambda *_: watcher.stop())
+    if hasattr(signal, 'SIGTERM'):
+        signal.signal(signal.SIGTERM, lambda *_: watcher.stop())
+
+    print(f"Watching {watcher.input_dir} -> {args.output_dir} (Ctrl+C to stop)", flush=True)
+    watcher.run()
+    print("Stopped.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,39 @@
+"""
+测试公共设置：把项目根目录加入导入路径，并提供生成测试图片的夹具
+"""
+import os
+import sys
+
+import pytest
+from PIL import Image
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def input_dir(tmp_path):
+    directory = tmp_path / 'in'
+    directory.mkdir()
+    return directory
+
+
+@pytest.fixture
+def output_dir(tmp_path):
+    directory = tmp_path / 'out'
+    directory.mkdir()
+    return directory
+
+
+@pytest.fixture
+def make_images(input_dir):
+    """make_images(count, size=(64, 48), extension='.png') -> 输入目录中新生成的图片路径列表"""
+    def make(count, size=(64, 48), extension='.png'):
+        paths = []
+        for i in range(count):
+            path = str(input_dir / f"image_{i:02d}{extension}")
+            Image.new('RGB', size, ((i * 20) % 256, 80, 160)).save(path)
+            paths.append(path)
+        return paths
+    return make
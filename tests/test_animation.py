@@ -0,0 +1,72 @@
+"""
+多帧图片测试：每帧加水印，帧顺序、帧时长、处置方式和循环次数保持不变
+"""
+import os
+
+import pytest
+from PIL import Image, ImageSequence
+
+from src.core.batch import ExportSettings, iter_export
+
+FRAMES = 20  # 超过一个合成块，覆盖分块并行后的顺序
+DURATIONS = [40 + 10 * (i % 7) for i in range(FRAMES)]
+DISPOSALS = [1 + i % 2 for i in range(FRAMES)]
+
+
+def _colors():
+    return [(i * 12, 255 - i * 12, 90) for i in range(FRAMES)]
+
+
+def _make_gif(path):
+    frames = []
+    for color in _colors():
+        frame = Image.new('RGB', (64, 48), color)
+        # 调色板中有白色，白色水印在 GIF 输出中才可见
+        frame.paste((255, 255, 255), (60, 44, 64, 48))
+        frames.append(frame)
+    frames[0].save(path, save_all=True, append_images=frames[1:], duration=DURATIONS,
+                   disposal=DISPOSALS, loop=3)
+
+
+def _read(path):
+    with Image.open(path) as image:
+        loop = image.info.get('loop')
+        frames = []
+        for frame in ImageSequence.Iterator(image):
+            pixel = frame.convert('RGB').getpixel((0, 0))  # WebP 读入帧后才有帧时长
+            frames.append((frame.info.get('duration'), getattr(frame, 'disposal_method', None),
+                           pixel))
+    return loop, frames
+
+
+@pytest.mark.parametrize('format', ['GIF', 'WEBP', 'PNG'])
+def test_frame_timing_is_preserved(input_dir, output_dir, format):
+    source = str(input_dir / 'clip.gif')
+    _make_gif(source)
+    settings = ExportSettings.from_dict({'text': 'wm', 'font_size': 14, 'position': (0.5, 0.5)},
+                                        str(output_dir), format=format)
+    result, = iter_export([source], settings, workers=2)
+    assert result.ok, result.error
+    assert os.path.splitext(result.output_path)[1].lower() == {'GIF': '.gif', 'WEBP': '.webp',
+                                                                'PNG': '.png'}[format]
+
+    loop, frames = _read(result.output_path)
+    assert loop == 3
+    assert [duration for duration, _, _ in frames] == DURATIONS
+    if format == 'GIF':
+        assert [disposal for _, disposal, _ in frames] == DISPOSALS
+    # 帧按原顺序写出（角上的像素没有被水印覆盖）
+    for (_, _, pixel), color in zip(frames, _colors()):
+        assert all(abs(a - b) <= 4 for a, b in zip(pixel, color)), (pixel, color)
+
+
+def test_every_frame_is_watermarked(input_dir, output_dir):
+    source = str(input_dir / 'clip.gif')
+    _make_gif(source)
+    settings = ExportSettings.from_dict({'text': 'WATERMARK', 'font_size': 16, 'position': (0.5, 0.5),
+                                         'color': (255, 255, 255)}, str(output_dir), format='GIF')
+    result, = iter_export([source], settings, workers=1)
+    assert result.ok, result.error
+    with Image.open(source) as original, Image.open(result.output_path) as output:
+        for before, after in zip(ImageSequence.Iterator(original), ImageSequence.Iterator(output)):
+            assert before.convert('RGB').tobytes() != after.convert('RGB').tobytes()
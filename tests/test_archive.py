@@ -0,0 +1,120 @@
+"""
+归档输出测试：编码结果直接写入 ZIP/TAR，排队数据量受限，失败时不留下不完整的归档
+"""
+import io
+import os
+import tarfile
+import threading
+import time
+import zipfile
+
+import pytest
+from PIL import Image
+
+from src.core.archive import ArchiveWriter
+from src.core.batch import ExportSettings, iter_export
+
+
+def _read_entries(path, kind):
+    if kind == 'zip':
+        with zipfile.ZipFile(path) as archive:
+            return {name: archive.read(name) for name in archive.namelist()}
+    with tarfile.open(path) as archive:
+        return {member.name: archive.extractfile(member).read() for member in archive.getmembers()}
+
+
+@pytest.mark.parametrize('kind', ['zip', 'tar'])
+def test_export_to_archive_matches_file_export(make_images, tmp_path, kind):
+    paths = make_images(5)
+    watermark = {'text': 'wm', 'font_size': 12}
+    files_dir, archive_dir = tmp_path / 'files', tmp_path / 'archive'
+    files_dir.mkdir()
+    archive_dir.mkdir()
+
+    file_settings = ExportSettings.from_dict(watermark, str(files_dir), format='PNG')
+    assert all(result.ok for result in iter_export(paths, file_settings, workers=2))
+    settings = ExportSettings.from_dict(watermark, str(archive_dir), format='PNG', archive=kind)
+    results = list(iter_export(paths, settings, workers=2))
+    assert all(result.ok for result in results), [result.error for result in results]
+
+    # 输出目录中只有归档，条目与逐个写出的文件内容相同
+    assert os.listdir(archive_dir) == [os.path.basename(settings.archive_path())]
+    entries = _read_entries(settings.archive_path(), kind)
+    assert sorted(entries) == sorted(os.listdir(files_dir))
+    for name, data in entries.items():
+        assert data == (files_dir / name).read_bytes()
+    for result in results:
+        assert os.path.dirname(result.output_path) == settings.archive_path()
+
+
+def test_duplicate_names_and_compression(tmp_path):
+    writer = ArchiveWriter(str(tmp_path / 'out.zip'))
+    assert writer.add('a.jpeg', b'x' * 1000) == 'a.jpeg'
+    assert writer.add('a.jpeg', b'y' * 1000) == 'a (2).jpeg'
+    assert writer.add('a.jpeg', b'z' * 1000) == 'a (3).jpeg'
+    assert writer.add('notes.txt', b'n' * 1000) == 'notes.txt'
+    assert writer.close()
+
+    with zipfile.ZipFile(tmp_path / 'out.zip') as archive:
+        # 已经压缩过的图片格式直接存储
+        assert archive.getinfo('a (2).jpeg').compress_type == zipfile.ZIP_STORED
+        assert archive.getinfo('notes.txt').compress_type == zipfile.ZIP_DEFLATED
+        assert archive.read('a (3).jpeg') == b'z' * 1000
+
+
+def test_pending_bytes_are_bounded(tmp_path, monkeypatch):
+    limit = 4096
+    peak = []
+    write_entry = ArchiveWriter._write_entry
+
+    def slow_write(self, name, data):
+        peak.append(self._pending_bytes)
+        time.sleep(0.005)
+        write_entry(self, name, data)
+
+    monkeypatch.setattr(ArchiveWriter, '_write_entry', slow_write)
+    writer = ArchiveWriter(str(tmp_path / 'out.tar'), max_pending_bytes=limit)
+    chunk = bytes(1000)
+
+    def produce(worker):
+        for i in range(10):
+            writer.add(f'{worker}_{i}.bin', chunk)
+
+    threads = [threading.Thread(target=produce, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert writer.close()
+
+    assert max(peak) <= limit
+    assert len(_read_entries(tmp_path / 'out.tar', 'tar')) == 40
+    # 单个超过上限的条目不会一直阻塞
+    writer = ArchiveWriter(str(tmp_path / 'big.zip'), max_pending_bytes=limit)
+    writer.add('big.bin', bytes(limit * 4))
+    assert writer.close()
+
+
+def test_write_error_leaves_no_archive(tmp_path, monkeypatch):
+    def failing_write(self, name, data):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(ArchiveWriter, '_write_entry', failing_write)
+    writer = ArchiveWriter(str(tmp_path / 'out.zip'))
+    writer.add('a.png', b'data')
+    assert not writer.close()
+    assert 'disk full' in writer.get_error()
+    assert os.listdir(tmp_path) == []
+    with pytest.raises(OSError):
+        writer.add('b.png', b'data')
+
+
+def test_entries_are_images(make_images, output_dir):
+    paths = make_images(2, size=(80, 60))
+    settings = ExportSettings.from_dict({'text': 'wm'}, str(output_dir), format='JPEG',
+                                        archive='zip')
+    assert all(result.ok for result in iter_export(paths, settings, workers=1))
+    for data in _read_entries(settings.archive_path(), 'zip').values():
+        with Image.open(io.BytesIO(data)) as image:
+            assert image.format == 'JPEG'
+            assert image.size == (80, 60)
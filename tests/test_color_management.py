@@ -0,0 +1,109 @@
+"""
+色彩管理测试：同一配置文件的转换只构建一次，转换后嵌入 sRGB 配置文件
+"""
+import threading
+
+import pytest
+from PIL import Image, ImageCms
+
+from src.core import color_management
+from src.core.color_management import TransformCache, is_available, manage_color
+from src.core.image_processor import ImageProcessor
+
+pytestmark = pytest.mark.skipif(not is_available(), reason='Pillow 没有 LittleCMS')
+
+COLOR = (40, 200, 60)
+
+
+def _srgb_profile():
+    return ImageCms.ImageCmsProfile(ImageCms.createProfile('sRGB')).tobytes()
+
+
+def _wide_gamut_profile():
+    """改了名称和绿色原色的 sRGB 配置文件，转换到 sRGB 时像素会变化"""
+    data = bytearray(_srgb_profile())
+    data = data.replace('sRGB'.encode('utf-16-be'), 'Wide'.encode('utf-16-be'))
+    count = int.from_bytes(data[128:132], 'big')
+    for entry in range(132, 132 + 12 * count, 12):
+        if data[entry:entry + 4] == b'gXYZ':
+            offset = int.from_bytes(data[entry + 4:entry + 8], 'big')
+            data[offset + 8:offset + 12] = int(0.2 * 65536).to_bytes(4, 'big')
+    return bytes(data)
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = TransformCache(max_size=2)
+    monkeypatch.setattr(color_management, '_transform_cache', cache)
+    return cache
+
+
+def test_transform_built_once_per_profile(cache):
+    profile = _wide_gamut_profile()
+    images = [Image.new('RGB', (8, 8), COLOR) for _ in range(5)]
+    for image in images:
+        converted, embedded = manage_color(image, profile, 'srgb', in_place=True)
+        assert converted is image  # 刚解码的图片原地转换
+        assert embedded == cache.srgb_profile()
+        assert image.getpixel((0, 0)) != COLOR
+    assert cache.builds == 1
+
+
+
+def test_cache_is_bounded_and_shared_between_threads(cache):
+    profile = _wide_gamut_profile()
+    first = cache.get(profile, 'RGB', intent='perceptual')
+    cache.get(profile, 'RGB', intent='relative')
+    cache.get(profile, 'RGBA', intent='perceptual')
+    assert len(cache._transforms) == 2
+    # 最久未用的转换被淘汰，再次使用时重新构建
+    builds = cache.builds
+    assert cache.get(profile, 'RGB', intent='perceptual') is not first
+    assert cache.builds == builds + 1
+
+    results = []
+    barrier = threading.Barrier(4)
+
+    def get():
+        barrier.wait()
+        results.append(cache.get(profile, 'RGB', intent='saturation'))
+
+    threads = [threading.Thread(target=get) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(result is results[0] for result in results)
+
+
+def test_no_conversion_when_not_needed(cache):
+    image = Image.new('RGB', (8, 8), COLOR)
+    wide, srgb = _wide_gamut_profile(), _srgb_profile()
+    assert manage_color(image, wide, 'keep') == (image, wide)
+    assert manage_color(image, srgb, 'srgb') == (image, srgb)
+    assert manage_color(image, None, 'srgb') == (image, None)
+    assert manage_color(image, wide, '') == (image, None)
+    assert manage_color(image, b'not a profile', 'srgb') == (image, None)
+    assert image.getpixel((0, 0)) == COLOR
+    assert cache.builds == 0
+
+
+def test_processor_converts_and_embeds_srgb(cache, input_dir, tmp_path):
+    profile = _wide_gamut_profile()
+    paths = []
+    for i in range(4):
+        path = str(input_dir / f'photo_{i}.png')
+        Image.new('RGB', (32, 24), COLOR).save(path, icc_profile=profile)
+        paths.append(path)
+
+    processor = ImageProcessor()
+    processor.set_color_management('srgb')
+    for path in paths:
+        assert processor.load_image(path)
+    assert cache.builds == 1
+
+    output = str(tmp_path / 'out.png')
+    assert processor.save_image(output, 'PNG')
+    with Image.open(output) as saved:
+        assert saved.info.get('icc_profile') == cache.srgb_profile()
+        assert saved.convert('RGB').getpixel((0, 0)) != COLOR
@@ -0,0 +1,47 @@
+"""
+核心模块在没有 PyQt6 时可以导入
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# 在子解释器中安装一个拒绝导入 PyQt6 的查找器，模拟没有安装 PyQt6 的环境
+_SCRIPT = """
+import importlib, pkgutil, sys
+
+
+class BlockQt:
+    def find_spec(self, name, path=None, target=None):
+        if name == 'PyQt6' or name.startswith('PyQt6.'):
+            raise ImportError(f"blocked: {name}")
+        return None
+
+
+sys.meta_path.insert(0, BlockQt())
+import src.core
+from src.core import *  # noqa: F401,F403
+for info in pkgutil.iter_modules(src.core.__path__):
+    importlib.import_module('src.core.' + info.name)
+import src.main, src.watch, src.server  # noqa: E401
+loaded = sorted(name for name in sys.modules if name.split('.')[0] == 'PyQt6')
+assert not loaded, loaded
+print('ok')
+"""
+
+
+def test_core_imports_without_pyqt6():
+    completed = subprocess.run([sys.executable, '-c', _SCRIPT], cwd=ROOT,
+                               capture_output=True, text=True)
+    assert completed.returncode == 0, completed.stderr
+    assert completed.stdout.strip() == 'ok'
+
+
+def test_blocker_rejects_pyqt6():
+    # 确认查找器确实生效：导入 PyQt6 应当失败
+    script = _SCRIPT.split('import src.core')[0] + "import PyQt6.QtWidgets\n"
+    completed = subprocess.run([sys.executable, '-c', script], cwd=ROOT,
+                               capture_output=True, text=True)
+    assert completed.returncode != 0
+    assert 'blocked: PyQt6' in completed.stderr
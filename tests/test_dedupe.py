@@ -0,0 +1,86 @@
+"""
+重复输入检测测试：内容相同的文件只处理一次，其余文件复用输出
+"""
+import os
+import pathlib
+import shutil
+
+from src.core import batch, dedupe
+from src.core.batch import ExportSettings, iter_export
+from src.core.dedupe import find_duplicates, link_or_copy
+
+
+def test_find_duplicates_compares_content(tmp_path, monkeypatch):
+    full_hashes = []
+    full_hash = dedupe._full_hash
+    monkeypatch.setattr(dedupe, '_full_hash', lambda path: full_hashes.append(path) or full_hash(path))
+
+    data = os.urandom(3 * dedupe.BLOCK_SIZE)
+    middle = bytearray(data)
+    middle[len(data) // 2] ^= 0xFF  # 首尾数据块相同，只有中间不同
+    edge = bytearray(data)
+    edge[0] ^= 0xFF
+    files = {'a.jpg': data, 'b.jpg': data, 'middle.jpg': bytes(middle),
+             'edge.jpg': bytes(edge), 'short.jpg': data[:-1], 'c.jpg': data}
+    for name, content in files.items():
+        (tmp_path / name).write_bytes(content)
+    paths = [str(tmp_path / name) for name in files]
+
+    duplicates = find_duplicates(paths + [paths[1], str(tmp_path / 'missing.jpg')])
+    assert duplicates == {paths[1]: paths[0], paths[5]: paths[0]}
+    # 大小或首尾数据块不同的文件不计算完整哈希
+    assert sorted(map(os.path.basename, full_hashes)) == ['a.jpg', 'b.jpg', 'c.jpg', 'middle.jpg']
+
+
+def test_link_or_copy_replaces_target(tmp_path, monkeypatch):
+    source = tmp_path / 'source.png'
+    source.write_bytes(b'new')
+    target = tmp_path / 'target.png'
+    target.write_bytes(b'old')
+    link_or_copy(str(source), str(target))
+    assert os.path.samefile(source, target)
+
+    # 不支持硬链接时复制
+    def no_link(src, dst):
+        raise OSError('cross-device link')
+
+    monkeypatch.setattr(os, 'link', no_link)
+    copied = tmp_path / 'copied.png'
+    link_or_copy(str(source), str(copied))
+    assert copied.read_bytes() == b'new'
+    assert not os.path.samefile(source, copied)
+    assert sorted(os.listdir(tmp_path)) == ['copied.png', 'source.png', 'target.png']
+
+
+def test_export_processes_each_content_once(make_images, input_dir, output_dir, monkeypatch):
+    paths = make_images(3)
+    copies = [str(input_dir / 'copy_a.png'), str(input_dir / 'copy_b.png')]
+    shutil.copyfile(paths[0], copies[0])
+    shutil.copyfile(paths[1], copies[1])
+
+    exported = []
+    export_file = batch.export_file
+    monkeypatch.setattr(batch, 'export_file',
+                        lambda path, *args: exported.append(path) or export_file(path, *args))
+    settings = ExportSettings.from_dict({'text': 'wm'}, str(output_dir), format='PNG')
+    results = {result.input_path: result
+               for result in iter_export(paths + copies, settings, workers=2, dedupe=True)}
+
+    assert sorted(exported) == sorted(paths)
+    assert set(results) == set(paths + copies)
+    assert all(result.ok for result in results.values())
+    assert results[copies[0]].duplicate_of == paths[0]
+    assert results[copies[1]].duplicate_of == paths[1]
+    assert os.path.samefile(results[copies[0]].output_path, results[paths[0]].output_path)
+    assert results[paths[2]].duplicate_of is None
+
+
+def test_dynamic_text_disables_dedupe(make_images, input_dir, output_dir):
+    paths = make_images(1)
+    copy = str(input_dir / 'copy.png')
+    shutil.copyfile(paths[0], copy)
+    settings = ExportSettings.from_dict({'text': '{stem}'}, str(output_dir), format='PNG')
+    results = list(iter_export(paths + [copy], settings, workers=1, dedupe=True))
+    assert all(result.ok and result.duplicate_of is None for result in results)
+    first, second = (pathlib.Path(result.output_path).read_bytes() for result in results)
+    assert first != second
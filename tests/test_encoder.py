@@ -0,0 +1,45 @@
+"""
+编码档位测试：各档位在速度、大小和画质之间的取舍确实不同
+"""
+import io
+
+from PIL import Image, JpegImagePlugin
+
+from src.core.encoder import ENCODER_PROFILES, get_encoder_options, get_profile_names
+
+
+def _photo():
+    gradient = Image.linear_gradient('L').resize((256, 192))
+    return Image.merge('RGB', (gradient, gradient.rotate(90), gradient.effect_spread(4)))
+
+
+def _encode(format, profile, quality=85):
+    buffer = io.BytesIO()
+    _photo().save(buffer, format=format, **get_encoder_options(format, profile, quality))
+    return buffer.getvalue()
+
+
+def test_profiles_differ_for_every_format():
+    for format, profiles in ENCODER_PROFILES.items():
+        assert list(profiles) == get_profile_names()
+        options = [profiles[name] for name in get_profile_names()]
+        assert len({tuple(sorted(option.items())) for option in options}) == 3, format
+
+
+def test_fast_skips_slow_jpeg_paths():
+    options = get_encoder_options('jpg', 'fast')
+    assert not options['optimize'] and not options['progressive']
+
+
+def test_jpeg_balanced_keeps_chroma_smallest_is_smallest():
+    balanced = Image.open(io.BytesIO(_encode('JPEG', 'balanced')))
+    smallest = Image.open(io.BytesIO(_encode('JPEG', 'smallest')))
+    assert JpegImagePlugin.get_sampling(balanced) == 0  # 4:4:4
+    assert JpegImagePlugin.get_sampling(smallest) == 2  # 4:2:0
+    assert len(_encode('JPEG', 'smallest')) < len(_encode('JPEG', 'balanced'))
+    assert len(_encode('PNG', 'smallest')) <= len(_encode('PNG', 'fast'))
+
+
+def test_unknown_profile_falls_back_to_balanced():
+    assert get_encoder_options('JPEG', 'nope', 70) == get_encoder_options('JPEG', 'balanced', 70)
+    assert get_encoder_options('PNG', 'fast', 70) == {'compress_level': 1, 'optimize': False}
@@ -0,0 +1,49 @@
+"""
+水印图层测试：多个图层一次合成，平铺图层铺满整张图片
+"""
+from PIL import Image, ImageChops
+
+from src.core.image_processor import ImageProcessor
+
+TEXT = {'type': 'text', 'text': 'WM', 'font_name': '', 'font_size': 12, 'color': (255, 0, 0)}
+
+
+def _changed_box(processor, original):
+    return ImageChops.difference(processor.get_image(), original).getbbox()
+
+
+def test_tile_defaults_are_documented():
+    defaults = ImageProcessor.DEFAULT_WATERMARK_SETTINGS
+    assert defaults['tile'] is False
+    assert defaults['tile_spacing'] > 0
+
+
+def test_tiled_layer_covers_whole_image():
+    original = Image.new('RGB', (400, 300), (255, 255, 255))
+    processor = ImageProcessor()
+    processor.set_image(original)
+
+    processor.set_layers([dict(TEXT, position=(0.0, 0.0))])
+    assert processor.apply_layers()
+    left, top, right, bottom = _changed_box(processor, original)
+    assert right < 100 and bottom < 100
+
+    processor.set_layers([dict(TEXT, tile=True, tile_spacing=20)])
+    assert processor.apply_layers()
+    left, top, right, bottom = _changed_box(processor, original)
+    assert left < 50 and top < 50 and right > 350 and bottom > 250
+
+
+def test_layers_compose_in_order():
+    original = Image.new('RGB', (200, 100), (255, 255, 255))
+    processor = ImageProcessor()
+    processor.set_image(original)
+    processor.apply_settings({'text': 'top', 'font_name': '', 'font_size': 20, 'color': (0, 0, 255),
+                              'position': (0.95, 0.95),
+                              'layers': [dict(TEXT, position=(0.05, 0.05))]})
+    image = processor.get_image()
+    assert len(processor.get_layers()) == 2
+    assert ImageChops.difference(image.crop((0, 0, 100, 50)),
+                                 original.crop((0, 0, 100, 50))).getbbox()
+    assert ImageChops.difference(image.crop((100, 50, 200, 100)),
+                                 original.crop((100, 50, 200, 100))).getbbox()
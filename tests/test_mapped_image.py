@@ -0,0 +1,70 @@
+"""
+内存映射输入测试：合成水印只读取水印覆盖的区域，整张图片在编码时才读入
+"""
+from PIL import Image
+
+from src.core.image_processor import ImageProcessor
+from src.core.mapped_image import MappedImage, is_mappable
+
+SETTINGS = {'text': 'mapped', 'font_size': 14, 'color': (255, 0, 0), 'position': (0.9, 0.9)}
+
+
+def _gradient(size):
+    image = Image.linear_gradient('L').resize(size)
+    return Image.merge('RGB', (image, image.transpose(Image.Transpose.FLIP_LEFT_RIGHT), image))
+
+
+def test_full_raster_read_only_when_encoding(tmp_path, monkeypatch):
+    source = tmp_path / 'scan.tif'
+    _gradient((320, 240)).save(source)
+    assert is_mappable(str(source))
+
+    copies = []
+    copy = MappedImage.copy
+    monkeypatch.setattr(MappedImage, 'copy', lambda self: copies.append(self) or copy(self))
+    crops = []
+    crop = MappedImage.crop
+    monkeypatch.setattr(MappedImage, 'crop', lambda self, box: crops.append(box) or crop(self, box))
+
+    processor = ImageProcessor()
+    assert processor.load_image(str(source))
+    assert processor.apply_settings(SETTINGS)
+    assert not copies
+    # 只裁剪了水印所在的区域
+    left, top, right, bottom = crops[-1]
+    assert (right - left) * (bottom - top) < 320 * 240 // 4
+
+    output = tmp_path / 'out.png'
+    assert processor.save_image(str(output))
+    assert len(copies) == 1
+
+    # 与普通解码路径的结果一致
+    reference = ImageProcessor()
+    reference.set_image(_gradient((320, 240)))
+    reference.apply_settings(SETTINGS)
+    with Image.open(output) as saved:
+        assert saved.tobytes() == reference.get_image().tobytes()
+
+
+def test_recomposite_before_encoding_restores_old_region(tmp_path):
+    source = tmp_path / 'scan.bmp'
+    _gradient((200, 120)).save(source)
+    processor = ImageProcessor()
+    processor.load_image(str(source))
+    processor.apply_settings(SETTINGS)
+    processor.apply_settings(dict(SETTINGS, position=(0.0, 0.0)))
+
+    reference = ImageProcessor()
+    reference.set_image(_gradient((200, 120)))
+    reference.apply_settings(dict(SETTINGS, position=(0.0, 0.0)))
+    assert processor.get_image().tobytes() == reference.get_image().tobytes()
+
+    processor.apply_settings({'text': ''})
+    assert processor.get_image().tobytes() == _gradient((200, 120)).tobytes()
+
+
+def test_load_error_is_returned_not_printed(tmp_path, capsys):
+    processor = ImageProcessor()
+    assert not processor.load_image(str(tmp_path / 'missing.tif'))
+    assert processor.get_last_error().startswith('Error loading image')
+    assert capsys.readouterr().out == ''
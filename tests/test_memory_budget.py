@@ -0,0 +1,34 @@
+"""
+内存预算准入测试
+"""
+import threading
+
+from src.core import batch
+from src.core.batch import ExportSettings, iter_export
+from src.core.memory_budget import MemoryGovernor
+
+
+class _SlowReleaseGovernor(MemoryGovernor):
+    """任务结束后稍晚才释放预算，并统计非阻塞尝试的次数"""
+
+    attempts = 0
+
+    def try_acquire(self, cost):
+        type(self).attempts += 1
+        return super().try_acquire(cost)
+
+    def release(self, cost):
+        threading.Timer(0.05, super().release, (cost,)).start()
+
+
+def test_waits_for_budget_without_spinning(make_images, output_dir, monkeypatch):
+    paths = make_images(4)
+    monkeypatch.setattr(batch, 'MemoryGovernor', _SlowReleaseGovernor)
+    settings = ExportSettings.from_dict({'text': 'wm', 'font_size': 12}, str(output_dir))
+
+    # 预算只够一个任务，每个任务都要等上一个任务释放预算
+    results = list(iter_export(paths, settings, workers=2, memory_budget=1))
+
+    assert sorted(result.input_path for result in results) == paths
+    assert all(result.error is None for result in results)
+    assert _SlowReleaseGovernor.attempts < 20
@@ -0,0 +1,79 @@
+"""
+元数据索引测试：只读文件头、按列排序筛选、紧凑保存
+"""
+import os
+import zipfile
+
+from PIL import Image, ImageFile
+
+from src.core.metadata_index import MetadataIndex, probe_metadata
+
+
+def _make(directory, name, size, **save_options):
+    path = str(directory / name)
+    Image.new('RGB', size, (90, 120, 150)).save(path, **save_options)
+    return path
+
+
+def test_probe_reads_header_only(tmp_path, monkeypatch):
+    path = _make(tmp_path, 'photo.jpg', (300, 200))
+    def fail_load(self):
+        raise AssertionError("pixels decoded")
+    monkeypatch.setattr(ImageFile.ImageFile, 'load', fail_load)
+    metadata = probe_metadata(path)
+    assert (metadata.width, metadata.height, metadata.format) == (300, 200, 'JPEG')
+    assert metadata.file_size == os.path.getsize(path)
+
+
+def test_sort_and_filter(tmp_path):
+    small = _make(tmp_path, 'b_small.png', (40, 30))
+    tall = _make(tmp_path, 'a_tall.png', (50, 200))
+    large = _make(tmp_path, 'c_large.png', (400, 300))
+    paths = [small, tall, large]
+    index = MetadataIndex()
+    index.update(paths)
+
+    assert index.sort_paths(paths, 'name') == [tall, small, large]
+    assert index.sort_paths(paths, 'pixels', reverse=True) == [large, tall, small]
+    assert index.filter_paths(paths, orientation='portrait') == [tall]
+    assert index.filter_paths(paths, orientation='landscape', min_pixels=10000) == [large]
+
+
+def test_save_load_round_trip(tmp_path):
+    directory = tmp_path / '照片'
+    directory.mkdir()
+    paths = [_make(directory, f"{'长' * i}{i}.png", (10 + i, 20)) for i in range(5)]
+    paths.append(_make(tmp_path, 'scan.tif', (30, 40)))
+    index = MetadataIndex()
+    index.update(paths)
+    index_file = str(tmp_path / 'index.npz')
+    assert index.save(index_file)
+
+    loaded = MetadataIndex.load(index_file)
+    assert len(loaded) == len(paths)
+    for path in paths:
+        assert loaded.get(path, refresh=False) == index.get(path, refresh=False)
+
+
+def test_paths_are_not_padded(tmp_path):
+    paths = [_make(tmp_path, 'a.png', (8, 8))]
+    paths.append(_make(tmp_path, 'x' * 200 + '.png', (8, 8)))
+    index = MetadataIndex()
+    index.update(paths)
+    index_file = str(tmp_path / 'index.npz')
+    index.save(index_file)
+    with zipfile.ZipFile(index_file) as archive:
+        names = archive.namelist()
+        blob_size = archive.getinfo('paths_blob.npy').file_size
+    assert 'paths.npy' not in names
+    # 定长 unicode 数组每行按最长路径补齐，每个字符 4 字节
+    assert blob_size < sum(len(path.encode()) for path in paths) + 200
+
+
+def test_modified_file_is_reprobed(tmp_path):
+    path = _make(tmp_path, 'photo.png', (10, 10))
+    index = MetadataIndex()
+    index.update([path])
+    _make(tmp_path, 'photo.png', (64, 32))
+    os.utime(path, ns=(0, 12345))
+    assert index.get(path).width == 64
@@ -0,0 +1,29 @@
+"""
+相对大小测试：relative_size 是水印宽度占图片宽度的比例
+"""
+import pytest
+from PIL import Image
+
+from src.core.image_processor import ImageProcessor
+
+
+@pytest.mark.parametrize('text', ['©', '© 2024 Example Studio'])
+@pytest.mark.parametrize('image_width', [800, 3000])
+def test_text_width_follows_image_width(text, image_width):
+    processor = ImageProcessor()
+    processor.set_image(Image.new('RGB', (image_width, image_width // 2), (255, 255, 255)))
+    layer = processor._normalize_layer({'type': 'text', 'text': text, 'font_name': '',
+                                        'relative_size': 0.25})
+    resolved = processor._resolve_relative_size(layer, image_width)
+
+    width = processor._load_font('', resolved['font_size']).getlength(text)
+    # 字号量化到档位，相邻档位相差约 19%
+    assert 0.25 * image_width / 1.1 <= width <= 0.25 * image_width * 1.1
+
+
+def test_same_bucket_for_similar_widths():
+    processor = ImageProcessor()
+    layer = processor._normalize_layer({'type': 'text', 'text': 'Studio', 'font_name': '',
+                                        'relative_size': 0.2})
+    assert (processor._resolve_relative_size(layer, 4000)['font_size']
+            == processor._resolve_relative_size(layer, 4050)['font_size'])
@@ -0,0 +1,173 @@
+"""
+导出中断后继续导出的回归测试
+"""
+import os
+import random
+import threading
+
+from PIL import Image
+
+from src.core.atomic_file import temp_path_for
+from src.core.batch import ExportSettings, iter_export, resume_export
+from src.core.image_processor import ImageProcessor
+from src.core.journal import ExportJournal
+
+
+def test_resume_after_interrupt(make_images, output_dir):
+    paths = make_images(6)
+    settings = ExportSettings.from_dict({'text': 'wm', 'font_size': 12}, str(output_dir),
+                                        format='PNG')
+
+    # 导出两张后中断：关闭生成器会取消尚未开始的任务
+    journal = ExportJournal.for_output_dir(str(output_dir))
+    results = iter_export(paths, settings, workers=1, max_in_flight=1, journal=journal)
+    first = [next(results), next(results)]
+    results.close()
+    assert all(result.ok for result in first)
+
+    resumed = list(resume_export(str(output_dir), paths, workers=1))
+    assert all(result.ok for result in resumed), [result.error for result in resumed]
+
+    done = {result.input_path for result in first} | {result.input_path for result in resumed}
+    assert done == set(paths)
+    # 已完成的文件不会被重新导出
+    assert not {result.input_path for result in first} & {result.input_path for result in resumed}
+    for path in paths:
+        assert os.path.exists(settings.output_path_for(path))
+
+
+def test_journal_drops_partial_last_line(tmp_path):
+    journal = ExportJournal(str(tmp_path / 'journal.jsonl'))
+    digest = journal.start({'output_dir': str(tmp_path)})
+    journal.record(digest, 'a.png', 'out/a.png')
+    journal.close()
+    # 模拟崩溃时写了一半的记录
+    with open(journal.journal_path, 'a', encoding='utf-8') as f:
+        f.write('{"type": "done", "settings_hash": "')
+
+    reopened = ExportJournal(journal.journal_path)
+    reopened.record(digest, 'b.png', 'out/b.png')
+    reopened.close()
+    assert reopened.completed_inputs(digest) == {'a.png', 'b.png'}
+
+
+def test_output_synced_before_journal_record(make_images, output_dir, monkeypatch):
+    import src.core.atomic_file as atomic_file
+
+    events = []
+    fsync_path = atomic_file.fsync_path
+    record = ExportJournal.record
+
+    def tracking_fsync(path):
+        events.append(('fsync', os.path.basename(path)))
+        fsync_path(path)
+
+    def tracking_record(self, settings_hash, input_path, output_path, error=None):
+        events.append(('record', os.path.basename(input_path)))
+        record(self, settings_hash, input_path, output_path, error)
+
+    monkeypatch.setattr(atomic_file, 'fsync_path', tracking_fsync)
+    monkeypatch.setattr(ExportJournal, 'record', tracking_record)
+
+    paths = make_images(3)
+    settings = ExportSettings.from_dict({'text': 'wm'}, str(output_dir), format='PNG')
+    journal = ExportJournal.for_output_dir(str(output_dir))
+    assert all(result.ok for result in iter_export(paths, settings, workers=1, journal=journal))
+
+    for path in paths:
+        name = os.path.basename(path)
+        recorded = events.index(('record', name))
+        synced = [i for i, (kind, target) in enumerate(events)
+                  if kind == 'fsync' and os.path.splitext(name)[0] in target]
+        assert synced and synced[0] < recorded
+
+
+def test_completed_inputs_after_truncation_at_any_offset(tmp_path):
+    journal = ExportJournal(str(tmp_path / 'journal.jsonl'))
+    digest = journal.start({'output_dir': str(tmp_path)})
+    inputs = [f'照片_{i}.png' for i in range(12)]
+    for i, name in enumerate(inputs):
+        journal.record(digest, name, f'out/{name}', error='decode' if i % 4 == 3 else None)
+    journal.close()
+    with open(journal.journal_path, 'rb') as f:
+        content = f.read()
+
+    # 每条记录在文件中的结束位置（不含换行符）
+    ends = [i for i, byte in enumerate(content) if byte == ord('\n')][1:]
+    done = [(end, name) for end, name, i in zip(ends, inputs, range(len(inputs))) if i % 4 != 3]
+
+    truncated = ExportJournal(str(tmp_path / 'truncated.jsonl'))
+    rng = random.Random(30)
+    # 另外覆盖恰好截在换行符前后的位置
+    offsets = rng.sample(range(len(content) + 1), 120) + [0, len(content)]
+    offsets += ends + [end + 1 for end in ends]
+    for offset in offsets:
+        with open(truncated.journal_path, 'wb') as f:
+            f.write(content[:offset])
+        # 截断处之前完整写入的完成记录都在，之后的都不在
+        expected = {name for end, name in done if end <= offset}
+        assert truncated.completed_inputs(digest) == expected, offset
+
+        # 继续追加的记录不会被残缺的最后一行吞掉
+        truncated.record(digest, 'extra.png', 'out/extra.png')
+        truncated.close()
+        assert truncated.completed_inputs(digest) == expected | {'extra.png'}, offset
+
+
+def test_record_is_synced_before_returning(tmp_path, monkeypatch):
+    synced = []
+    fsync = os.fsync
+    monkeypatch.setattr(os, 'fsync', lambda fd: synced.append(fd) or fsync(fd))
+
+    journal = ExportJournal(str(tmp_path / 'journal.jsonl'))
+    digest = journal.start({'output_dir': str(tmp_path)})
+    for i in range(3):
+        before = len(synced)
+        journal.record(digest, f'{i}.png', f'out/{i}.png')
+        assert len(synced) == before + 1
+    journal.close()
+
+
+def test_failed_save_keeps_existing_output_and_leaves_no_temp_file(tmp_path, monkeypatch):
+    output = tmp_path / 'photo.png'
+    output.write_bytes(b'previous export')
+    processor = ImageProcessor()
+    processor.set_image(Image.new('RGB', (40, 30)))
+
+    def failing_encode(self, fp, format, quality=95, profile=None):
+        with open(fp, 'wb') as f:
+            f.write(b'partial')
+        raise OSError('disk full')
+
+    monkeypatch.setattr(ImageProcessor, 'encode_image', failing_encode)
+    assert not processor.save_image(str(output), 'PNG')
+    assert 'disk full' in processor.get_last_error()
+    assert output.read_bytes() == b'previous export'
+    assert os.listdir(tmp_path) == ['photo.png']
+
+    monkeypatch.undo()
+    assert processor.save_image(str(output), 'PNG')
+    with Image.open(output) as saved:
+        assert saved.size == (40, 30)
+    assert os.listdir(tmp_path) == ['photo.png']
+
+
+def test_temp_files_are_hidden_and_unique_per_thread(tmp_path):
+    target = str(tmp_path / 'photo.jpg')
+    names = set()
+    # 所有线程同时存活，线程号才各不相同
+    barrier = threading.Barrier(4)
+
+    def collect():
+        names.add(temp_path_for(target))
+        barrier.wait()
+
+    threads = [threading.Thread(target=collect) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(names) == 4
+    for name in names:
+        assert os.path.dirname(name) == str(tmp_path)
+        assert os.path.basename(name).startswith('.photo.jpg.')
@@ -0,0 +1,100 @@
+"""
+LPT 调度测试：按预计耗时从长到短提交，{counter} 仍按原列表顺序编号
+"""
+import os
+
+import pytest
+from PIL import Image
+
+from src.core.batch import ExportSettings, iter_export
+from src.core.scheduler import (CostModel, ScheduleReport, plan_lpt, probe_job,
+                                simulate_makespan)
+
+
+def test_lpt_shortens_makespan():
+    durations = [1.0] * 8 + [8.0]
+    assert simulate_makespan(durations, 4) == 10.0
+    assert simulate_makespan(sorted(durations, reverse=True), 4) == 8.0
+    assert simulate_makespan([], 4) == 0.0
+    assert simulate_makespan([2.0, 3.0], 0) == 5.0
+
+
+def test_plan_orders_by_predicted_cost(input_dir):
+    sizes = {'small.png': (40, 30), 'large.png': (400, 300), 'medium.png': (200, 150),
+             'same_small.png': (40, 30)}
+    paths = []
+    for name, size in sizes.items():
+        path = str(input_dir / name)
+        Image.new('RGB', size).save(path)
+        paths.append(path)
+    broken = str(input_dir / 'broken.png')
+    with open(broken, 'wb') as f:
+        f.write(b'not an image')
+    paths.append(broken)
+
+    planned = plan_lpt(((path, index) for index, path in enumerate(paths, 1)), CostModel())
+    names = [os.path.basename(job.path) for job in planned]
+    # 耗时相同的任务保持原顺序，无法识别的文件只按文件大小估算
+    assert names == ['large.png', 'medium.png', 'small.png', 'same_small.png', 'broken.png']
+    assert [job.counter for job in planned] == [2, 3, 1, 4, 5]
+    assert all(a.predicted >= b.predicted for a, b in zip(planned, planned[1:]))
+    assert (planned[0].width, planned[0].height) == (400, 300)
+    assert (planned[-1].width, planned[-1].height) == (0, 0)
+
+
+def test_mappable_input_has_no_decode_cost(input_dir):
+    bmp, png = str(input_dir / 'scan.bmp'), str(input_dir / 'scan.png')
+    Image.new('RGB', (300, 200), (10, 20, 30)).save(bmp)
+    Image.effect_noise((300, 200), 64).convert('RGB').save(png)
+    model = CostModel()
+    assert probe_job(bmp, 1, model).data_size == 0
+    assert probe_job(png, 2, model).data_size == os.path.getsize(png)
+    assert probe_job(bmp, 1, model).predicted < probe_job(png, 2, model).predicted
+
+
+def test_calibrate_recovers_coefficients(tmp_path):
+    truth = {'load': (0.01, 0.05, 0.002), 'watermark': (0.0, 0.0, 0.001), 'save': (0.02, 0.0, 0.005)}
+    reference = CostModel(truth)
+    samples = []
+    for width, height, size in [(1000, 800, 200_000), (4000, 3000, 3_000_000),
+                                (2000, 2000, 900_000), (6000, 4000, 0), (500, 500, 80_000)]:
+        samples.append((width, height, size, reference.predict_stages(width, height, size)))
+    model = CostModel.calibrate(samples)
+    for stage in truth:
+        assert model.coefficients[stage] == pytest.approx(truth[stage], abs=1e-6)
+
+    # 样本不足时使用默认系数，保存后读回相同
+    assert CostModel.calibrate(samples[:2]).coefficients == CostModel().coefficients
+    path = str(tmp_path / 'cost_model.json')
+    assert model.save(path)
+    assert CostModel.load(path).coefficients == model.coefficients
+    with open(path, 'w') as f:
+        f.write('{')
+    assert CostModel.load(path).coefficients == CostModel().coefficients
+
+
+def test_scheduled_export_keeps_counter_order(make_images, input_dir, tmp_path):
+    paths = make_images(3, size=(40, 30))
+    large = str(input_dir / 'image_99.png')
+    Image.new('RGB', (400, 300), (60, 80, 160)).save(large)
+    paths.append(large)
+    watermark = {'text': '#{counter}', 'font_size': 10}
+    plain_dir, scheduled_dir = tmp_path / 'plain', tmp_path / 'scheduled'
+    plain_dir.mkdir()
+    scheduled_dir.mkdir()
+
+    plain = ExportSettings.from_dict(watermark, str(plain_dir), format='PNG')
+    assert all(result.ok for result in iter_export(paths, plain, workers=1))
+    settings = ExportSettings.from_dict(watermark, str(scheduled_dir), format='PNG')
+    report = ScheduleReport()
+    results = list(iter_export(paths, settings, workers=1, max_in_flight=1, schedule=True,
+                               schedule_report=report))
+
+    assert results[0].input_path == large
+    assert all(result.ok and result.predicted > 0 for result in results)
+    for path in paths:
+        name = os.path.basename(settings.output_path_for(path))
+        assert (scheduled_dir / name).read_bytes() == (plain_dir / name).read_bytes()
+    summary = report.summary()
+    assert summary['files'] == 4
+    assert summary['predicted_makespan'] <= summary['unscheduled_makespan']
@@ -0,0 +1,120 @@
+"""
+水印服务请求处理测试
+"""
+import asyncio
+import io
+import os
+import signal
+
+from PIL import Image
+
+from src.core import service
+from src.core.image_processor import ImageProcessor
+from src.core.service import BatchingRenderer, WatermarkRequest, WatermarkResponse, render_batch
+from src.server import WatermarkServer
+
+SETTINGS = {'text': '{stem} {exif:Model}', 'font_size': 16, 'position': (0.5, 0.5)}
+
+
+class _Templates:
+    def get(self, name):
+        return SETTINGS
+
+
+def _use_fresh_worker(monkeypatch):
+    monkeypatch.setattr(service, '_worker_processor', ImageProcessor())
+    monkeypatch.setattr(service, '_worker_templates', _Templates())
+
+
+def _png_bytes():
+    buffer = io.BytesIO()
+    Image.new('RGB', (160, 80), (30, 90, 150)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def test_upload_does_not_reuse_previous_path(tmp_path, monkeypatch):
+    path = tmp_path / 'holiday_photo.png'
+    path.write_bytes(_png_bytes())
+    upload = WatermarkRequest(data=_png_bytes(), format='PNG')
+
+    _use_fresh_worker(monkeypatch)
+    from_path, after_path = render_batch([WatermarkRequest(path=str(path), format='PNG'), upload])
+    _use_fresh_worker(monkeypatch)
+    fresh, = render_batch([upload])
+
+    assert from_path.status == after_path.status == fresh.status == 200
+    assert from_path.data != fresh.data
+    assert after_path.data == fresh.data
+
+
+def test_unknown_format_is_bad_request(monkeypatch):
+    _use_fresh_worker(monkeypatch)
+    unknown, missing = render_batch([WatermarkRequest(data=_png_bytes(), format='XYZ'),
+                                     WatermarkRequest(data=_png_bytes(), format=None)])
+    assert unknown.status == 400
+    assert 'XYZ' in unknown.error
+    assert missing.status == 400
+
+
+class _RecordingRenderer:
+    """记录提交的请求，不启动进程池"""
+
+    def __init__(self):
+        self.requests = []
+
+    async def submit(self, request):
+        self.requests.append(request)
+        return WatermarkResponse(b'ok', 'image/jpeg')
+
+
+def _post(server, query, body=b''):
+    return asyncio.run(server.handle('POST', f'/watermark?{query}', body))
+
+
+def test_path_parameter_is_disabled_without_root():
+    renderer = _RecordingRenderer()
+    response = _post(WatermarkServer(renderer), 'path=/etc/passwd')
+    assert response.status == 403
+    assert not renderer.requests
+
+
+def test_path_parameter_is_confined_to_root(tmp_path):
+    root = tmp_path / 'photos'
+    root.mkdir()
+    (root / 'a.png').write_bytes(_png_bytes())
+    secret = tmp_path / 'secret.txt'
+    secret.write_text('secret')
+    (root / 'link.png').symlink_to(secret)
+    renderer = _RecordingRenderer()
+    server = WatermarkServer(renderer, str(root))
+
+    for query in ('path=../secret.txt', f'path={secret}', 'path=link.png',
+                  'path=sub/../../secret.txt', 'path=a.png%00'):
+        assert _post(server, query).status == 403, query
+    assert not renderer.requests
+
+    assert _post(server, 'path=a.png').status == 200
+    assert renderer.requests[-1].path == os.path.realpath(root / 'a.png')
+
+
+def test_pool_recovers_after_worker_crash(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    upload = WatermarkRequest(data=_png_bytes(), format='PNG')
+
+    async def scenario():
+        renderer = BatchingRenderer(workers=1, max_delay=0)
+        await renderer.start()
+        try:
+            for process in list(renderer._executor._processes.values()):
+                os.kill(process.pid, signal.SIGKILL)
+                process.join()
+            crashed = await renderer.submit(upload)
+            recovered = await renderer.submit(upload)
+            return crashed, recovered, renderer.stats['pool_restarts']
+        finally:
+            await renderer.close()
+
+    crashed, recovered, restarts = asyncio.run(scenario())
+    assert crashed.status == 500
+    assert recovered.status == 200 and recovered.data
+    assert restarts == 1
@@ -0,0 +1,59 @@
+"""
+会话保存与恢复测试：设置读回后与保存前完全相同（包括元组）
+"""
+from src.core.batch import _freeze
+from src.core.session import LazySettings, load_session, save_session
+
+
+def _settings(i):
+    settings = {
+        'text': '© Studio',
+        'font_size': 24,
+        'color': (255, 255, 255),
+        'position': (0.9, 0.9),
+        'opacity': 0.5,
+        'layers': [{'type': 'text', 'text': f'#{i}', 'color': (0, 0, 0, 128),
+                    'position': (0.1, 0.1), 'shadow': None}],
+        'tags': ['client', 'draft'],
+    }
+    if i % 3 == 0:
+        settings['position'] = (0.5, 0.5)
+    if i % 5 == 0:
+        settings['color'] = [255, 0, 0]  # 列表读回后仍是列表
+    if i % 7 == 0:
+        del settings['opacity']
+    return settings
+
+
+def test_settings_round_trip(tmp_path):
+    paths = [str(tmp_path / 'photos' / f'{i:03d}.jpg') for i in range(40)]
+    settings = {path: _settings(i) for i, path in enumerate(paths) if i != 11}
+    session_path = str(tmp_path / 'work.wmsession')
+    assert save_session(session_path, paths, settings, current=paths[3])
+
+    session = load_session(session_path)
+    assert isinstance(session.settings, LazySettings)
+    assert session.paths == paths
+    assert session.current == paths[3]
+    assert set(session.settings) == set(settings)
+    for path, original in settings.items():
+        restored = session.settings[path]
+        assert restored == original
+        assert _freeze(restored) == _freeze(original)
+        assert type(restored['color']) is type(original['color'])
+        assert isinstance(restored['layers'][0]['position'], tuple)
+
+    # 读回的设置互不共享，修改一张图片不影响其他图片
+    session.settings[paths[1]]['layers'][0]['text'] = 'changed'
+    assert session.settings[paths[2]]['layers'][0]['text'] == '#2'
+
+
+def test_version_1_session_still_loads(tmp_path):
+    session_path = tmp_path / 'old.wmsession'
+    session_path.write_text('WMSESSION 1\n'
+                            '{"base":{"color":[1,2,3]},"keys":["color"],"values":[],'
+                            '"dirs":["/photos"],"current":0}\n'
+                            '[0,"a.jpg"]\n', encoding='utf-8')
+    session = load_session(str(session_path))
+    assert session.current == '/photos/a.jpg'
+    assert session.settings['/photos/a.jpg'] == {'color': [1, 2, 3]}
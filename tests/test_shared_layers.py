@@ -0,0 +1,73 @@
+"""
+共享内存图层生命周期测试
+"""
+from multiprocessing import shared_memory
+
+from PIL import Image
+
+from src.core import shared_layers
+from src.core.shared_layers import SharedLayerStore, attach_layers, detach_all, detach_except
+
+
+def _exists(handle):
+    try:
+        segment = shared_memory.SharedMemory(name=handle.name)
+    except FileNotFoundError:
+        return False
+    segment.close()
+    return True
+
+
+def test_retired_segment_released_after_last_task():
+    with SharedLayerStore() as store:
+        old = store.publish(Image.new('RGBA', (8, 8)), ('tile', 'a', 0))
+        store.retain([old])
+        store.retain([old])
+        store.retire([old])
+        assert _exists(old)
+        store.release([old])
+        assert _exists(old)
+        store.release([old])
+        assert not _exists(old)
+        assert len(store) == 0
+
+
+def test_unreferenced_segment_released_on_retire():
+    with SharedLayerStore() as store:
+        kept = store.publish(Image.new('RGBA', (8, 8)), ('layer', 0))
+        old = store.publish(Image.new('RGBA', (8, 8)), ('tile', 'a', 0))
+        store.retain([kept])
+        store.release([kept])
+        store.retire([old])
+        assert not _exists(old)
+        assert _exists(kept)
+    assert not _exists(kept)
+
+
+def test_worker_detaches_stale_handles():
+    with SharedLayerStore() as store:
+        old = store.publish(Image.new('RGBA', (8, 8)), ('tile', 'a', 0))
+        new = store.publish(Image.new('RGBA', (16, 16)), ('tile', 'a', 0))
+        layers = attach_layers((old,))
+        assert old.name in shared_layers._attached
+        layers = attach_layers((new,))
+        detach_except((new,))
+        assert old.name not in shared_layers._attached
+        assert new.name in shared_layers._attached
+        assert layers[('tile', 'a', 0)].size == (16, 16)
+        del layers
+        detach_all()
+        assert not shared_layers._attached
+        assert not shared_layers._closing
+
+
+def test_detach_retries_segment_still_in_use():
+    with SharedLayerStore() as store:
+        old = store.publish(Image.new('RGBA', (8, 8)), ('tile', 'a', 0))
+        image = attach_layers((old,))[('tile', 'a', 0)]
+        detach_all()
+        # 图片视图仍被引用，共享内存留到下次释放时再关闭
+        assert len(shared_layers._closing) == 1
+        del image
+        detach_all()
+        assert not shared_layers._closing
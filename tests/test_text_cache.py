@@ -0,0 +1,37 @@
+"""
+文本水印缓存容量测试
+"""
+from PIL import Image, ImageFont
+
+from src.core.image_processor import ImageProcessor
+from src.core.text_tokens import TokenTextRenderer, parse_template
+
+
+def test_static_runs_are_bounded(monkeypatch):
+    monkeypatch.setattr(TokenTextRenderer, 'RUN_CACHE_SIZE', 4)
+    renderer = TokenTextRenderer()
+    font = ImageFont.load_default()
+    for i in range(10):
+        renderer.render(parse_template(f"Client {i} {{counter}}"), (str(i),), font,
+                        (255, 255, 255, 255), ('default', 10))
+    assert len(renderer._static_runs) == 4
+    assert len(renderer._dynamic_runs) == 4
+
+    # 最近用过的固定片段不会被淘汰
+    renderer.render(parse_template("Client 6 {counter}"), ('0',), font,
+                    (255, 255, 255, 255), ('default', 10))
+    renderer.render(parse_template("new {counter}"), ('0',), font,
+                    (255, 255, 255, 255), ('default', 10))
+    keys = [key[0] for key in renderer._static_runs]
+    assert 'Client 6 ' in keys
+    assert 'Client 7 ' not in keys
+
+
+def test_parsed_texts_are_bounded(monkeypatch):
+    monkeypatch.setattr(ImageProcessor, 'PARSED_TEXT_CACHE_SIZE', 3)
+    processor = ImageProcessor()
+    processor.set_image(Image.new('RGB', (120, 60)))
+    for i in range(8):
+        processor.apply_settings({'text': f"#{i} {{counter}}", 'font_size': 12})
+    assert len(processor._parsed_texts) <= 3
+    assert "#7 {counter}" in processor._parsed_texts